@@ -1,8 +1,10 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+import fitz  # PyMuPDF
 from PIL import Image
 import shutil
 import json
@@ -10,11 +12,26 @@ from pathlib import Path
 from datetime import datetime
 from typing import List, Optional
 from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import asynccontextmanager
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
 import os
-import gc
+import re
+import time
+import uuid
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
 
 
-app = FastAPI(title="PDF OCR Lines Manager", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Al arrancar, termina los borrados que quedaron en la papelera"""
+    reanudar_borrados()
+    yield
+
+app = FastAPI(title="PDF OCR Lines Manager", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,51 +51,347 @@ PROJECTS_PATH.mkdir(exist_ok=True)
 
 current_project = None
 
-def process_image(image_data):
+# Logging estructurado: LOG_FORMAT (json|texto), LOG_LEVEL y LOG_LEVELS
+# ("backend.paginas=DEBUG,..."); el detalle por página queda en WARNING
+NIVELES_LOG_DEFAULT = {"backend.paginas": "WARNING"}
+_ATRIBUTOS_RECORD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los `extra` como campos"""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created).astimezone().isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update({k: v for k, v in vars(record).items() if k not in _ATRIBUTOS_RECORD})
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+def configurar_logging():
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    raiz = logging.getLogger()
+    raiz.handlers[:] = [handler]
+    raiz.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    niveles = dict(NIVELES_LOG_DEFAULT)
+    for par in os.getenv("LOG_LEVELS", "").split(","):
+        if "=" in par:
+            nombre, nivel = par.split("=", 1)
+            niveles[nombre.strip()] = nivel.strip().upper()
+    for nombre, nivel in niveles.items():
+        logging.getLogger(nombre).setLevel(nivel)
+
+configurar_logging()
+logger = logging.getLogger("backend")
+logger_paginas = logging.getLogger("backend.paginas")
+
+# Métricas Prometheus (GET /metrics); la memoria del proceso la agrega
+# el colector por defecto (process_resident_memory_bytes)
+ETAPA_SEGUNDOS = Histogram(
+    "backend_etapa_segundos",
+    "Duración por etapa del backend",
+    ["etapa"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+PAGINAS_PROCESADAS = Counter("backend_paginas_procesadas_total", "Páginas convertidas a imagen")
+PAGINAS_FALLIDAS = Counter("backend_paginas_fallidas_total", "Páginas con error al convertir")
+UPLOADS_EN_CURSO = Gauge("backend_uploads_en_curso", "PDFs en conversión en este momento")
+
+# Rasterización: cada worker corre su propio pdftoppm sobre un rango de
+# páginas y genera las vistas previas de ese rango mientras los demás
+# workers siguen rasterizando
+PAGINAS_POR_RANGO = 8
+# Memoria estimada por worker (pdftoppm + una página a 150 DPI + reducción)
+MB_POR_WORKER = 300
+MAX_WORKERS_RASTER = int(os.getenv("MAX_WORKERS_RASTER", "0"))  # 0 = automático
+
+def guardar_baja_calidad(original_file_path: Path, baja_file_path: Path):
+    """Versión reducida (800 px de ancho) para el frontend (más rápida de cargar)"""
+    max_width = 800
+    with Image.open(original_file_path) as temp_img:
+        width_percent = max_width / temp_img.width if temp_img.width > 0 else 1
+        new_height = max(1, int(temp_img.height * width_percent)) if temp_img.height > 0 else 800
+        img_baja = temp_img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+    img_baja.save(str(baja_file_path), "JPEG", quality=55)
+    img_baja.close()
+
+def rasterizar_rango(tarea):
     """
-    Procesa una imagen individual: guarda original y versión reducida
+    Rasteriza un rango de páginas y genera sus vistas previas
     Esta función se ejecuta en procesos separados (sin bloqueos de GIL)
     
+    pdftoppm escribe los JPEG originales directo en disco (sin pasar por
+    PIL), así el proceso solo tiene en memoria la página que está reduciendo.
+    
     Args:
-        image_data: tuple (page_num, img_original, originales_path, baja_calidad_path)
+        tarea: tuple (pdf_path, primera, ultima, originales_path, baja_calidad_path, dpi)
     
     Returns:
-        tuple (filename, success, error_msg)
+        tuple (segundos_rasterizacion, [(filename, success, error_msg, segundos_encode), ...])
     """
+    pdf_path, primera, ultima, originales_path_str, baja_calidad_path_str, dpi = tarea
+    originales_path = Path(originales_path_str)
+    baja_calidad_path = Path(baja_calidad_path_str)
+    temporal = originales_path / f".rango_{primera:04d}"
+    
+    inicio = time.perf_counter()
     try:
-        page_num, img_original, originales_path_str, baja_calidad_path_str = image_data
-        
-        originales_path = Path(originales_path_str)
-        baja_calidad_path = Path(baja_calidad_path_str)
-        
+        temporal.mkdir(exist_ok=True)
+        rutas = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            fmt='jpeg',
+            jpegopt={"quality": 98, "progressive": False, "optimize": False},
+            first_page=primera,
+            last_page=ultima,
+            output_folder=str(temporal),
+            paths_only=True,
+        )
+    except Exception as e:
+        shutil.rmtree(temporal, ignore_errors=True)
+        error = f"Páginas {primera}-{ultima}: {e}"
+        return (time.perf_counter() - inicio, [(None, False, error, 0.0)] * (ultima - primera + 1))
+    segundos_rasterizacion = time.perf_counter() - inicio
+    
+    paginas = []
+    for page_num, ruta in enumerate(sorted(rutas), start=primera):
+        inicio = time.perf_counter()
         original_filename = f"img_{page_num:03d}.jpg"
-        
-        # Guardar original en alta calidad (98% JPEG quality)
-        original_file_path = originales_path / original_filename
-        img_original.save(str(original_file_path), "JPEG", quality=98)
-        
-        # Liberar memoria de la imagen original inmediatamente
-        img_original.close()
-        
-        # Crear versión de baja calidad para frontend (más rápida de cargar)
-        max_width = 800
-        width_percent = max_width / img_original.width if img_original.width > 0 else 1
-        new_height = max(1, int(img_original.height * width_percent)) if img_original.height > 0 else 800
-        
-        # Cargar imagen desde disco (ya guardada) para procesamiento de baja calidad
-        temp_img = Image.open(original_file_path)
-        img_baja = temp_img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-        
-        baja_file_path = baja_calidad_path / original_filename
-        img_baja.save(str(baja_file_path), "JPEG", quality=55)
-        
-        img_baja.close()
-        temp_img.close()
-        
-        return (original_filename, True, None)
+        try:
+            original_file_path = originales_path / original_filename
+            os.replace(ruta, original_file_path)
+            guardar_baja_calidad(original_file_path, baja_calidad_path / original_filename)
+            paginas.append((original_filename, True, None, time.perf_counter() - inicio))
+        except Exception as e:
+            paginas.append((None, False, f"{original_filename}: {e}", time.perf_counter() - inicio))
     
-    except Exception as e:
-        return (None, False, str(e))
+    shutil.rmtree(temporal, ignore_errors=True)
+    return (segundos_rasterizacion, paginas)
+
+def memoria_disponible_mb() -> Optional[int]:
+    """Memoria libre (MB) considerando el límite del cgroup si corre en contenedor"""
+    disponibles = []
+    try:
+        disponibles.append(os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 2**20)
+    except (ValueError, OSError, AttributeError):
+        pass
+    try:
+        limite = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limite != "max":
+            uso = int(Path("/sys/fs/cgroup/memory.current").read_text())
+            disponibles.append((int(limite) - uso) // 2**20)
+    except (OSError, ValueError):
+        pass
+    return min(disponibles) if disponibles else None
+
+def workers_rasterizacion(total_rangos: int) -> int:
+    """Procesos de rasterización según núcleos, memoria libre y rangos a convertir"""
+    if MAX_WORKERS_RASTER > 0:
+        return max(1, min(MAX_WORKERS_RASTER, total_rangos))
+    
+    nucleos = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    memoria = memoria_disponible_mb()
+    por_memoria = max(1, memoria // MB_POR_WORKER) if memoria is not None else nucleos
+    return max(1, min(nucleos, por_memoria, total_rangos))
+
+def dividir_rangos(paginas: List[int], tamano: int = PAGINAS_POR_RANGO):
+    """Rangos contiguos de a lo más `tamano` páginas: [1..20] -> [(1, 8), (9, 16), (17, 20)]"""
+    rangos = []
+    for primera, ultima in rangos_contiguos(paginas):
+        for inicio in range(primera, ultima + 1, tamano):
+            rangos.append((inicio, min(inicio + tamano - 1, ultima)))
+    return rangos
+
+# Texto nativo (PDFs digitales): páginas con al menos este número de
+# palabras en su capa de texto se extraen sin OCR
+DPI_RASTER = 150
+MIN_PALABRAS_NATIVAS = 5
+# Un escaneo (imagen que cubre la página) solo cuenta como nativo si sus
+# palabras cubren esta fracción del área; un sello o encabezado agregado o
+# una capa OCR parcial quedan muy por debajo (una tabla digital de 40
+# renglones cubre ~11%)
+IMAGEN_PAGINA_MIN = 0.8
+MIN_COBERTURA_NATIVA = 0.03
+# Hueco máximo entre palabras de una misma frase, relativo a la altura
+HUECO_FRASE = 0.8
+
+def frases_de_palabras(palabras, escala):
+    """
+    Une las palabras de PyMuPDF en frases (como las cajas de PaddleOCR)
+
+    Dos palabras seguidas de la misma línea del PDF se unen si el hueco
+    entre ellas es menor a HUECO_FRASE veces la altura del texto; un hueco
+    mayor suele ser un cambio de columna.
+
+    Returns:
+        dict con rec_texts, rec_boxes (a `escala`) y rec_scores
+    """
+    textos, cajas = [], []
+    actual = None
+    for x0, y0, x1, y1, texto, bloque, linea, _ in sorted(
+        palabras, key=lambda w: (w[5], w[6], w[7])
+    ):
+        misma_linea = actual is not None and actual["clave"] == (bloque, linea)
+        if misma_linea and x0 - actual["caja"][2] <= HUECO_FRASE * (y1 - y0):
+            actual["texto"] += " " + texto
+            caja = actual["caja"]
+            actual["caja"] = [caja[0], min(caja[1], y0), max(caja[2], x1), max(caja[3], y1)]
+            continue
+        if actual is not None:
+            textos.append(actual["texto"])
+            cajas.append(actual["caja"])
+        actual = {"clave": (bloque, linea), "texto": texto, "caja": [x0, y0, x1, y1]}
+    if actual is not None:
+        textos.append(actual["texto"])
+        cajas.append(actual["caja"])
+
+    return {
+        "rec_texts": textos,
+        "rec_boxes": [[round(v * escala, 2) for v in caja] for caja in cajas],
+        "rec_scores": [1.0] * len(textos),
+    }
+
+def cobertura_palabras(page, palabras) -> float:
+    """Fracción del área de la página cubierta por las cajas de las palabras"""
+    area = page.rect.width * page.rect.height
+    if area <= 0:
+        return 0.0
+    return sum((w[2] - w[0]) * (w[3] - w[1]) for w in palabras) / area
+
+def tiene_imagen_de_pagina(page) -> bool:
+    """¿Hay una imagen que cubra casi toda la página (página escaneada)?"""
+    area = page.rect.width * page.rect.height
+    return any(
+        fitz.Rect(info["bbox"]).get_area() >= IMAGEN_PAGINA_MIN * area
+        for info in page.get_image_info()
+    )
+
+def es_pagina_nativa(page, palabras) -> bool:
+    """
+    La capa de texto reemplaza al OCR solo si la página es digital (sin
+    imagen de página completa) o si sus palabras cubren una parte real de
+    la página (PDF escaneado con capa OCR completa)
+    """
+    if len(palabras) < MIN_PALABRAS_NATIVAS:
+        return False
+    if not tiene_imagen_de_pagina(page):
+        return True
+    return cobertura_palabras(page, palabras) >= MIN_COBERTURA_NATIVA
+
+def extraer_texto_nativo(pdf_path, destino: Path, dpi: int = DPI_RASTER):
+    """
+    Extrae la capa de texto de un PDF digital página por página
+
+    Guarda `destino/img_XXX.jpg.json` (mismo formato que el OCR grabado de
+    Paddle) para cada página con texto, en coordenadas de la imagen
+    rasterizada a `dpi`. Las páginas escaneadas se omiten y van al OCR.
+
+    Returns:
+        Lista de imágenes con texto nativo
+    """
+    escala = dpi / 72
+    nativas = []
+    with fitz.open(str(pdf_path)) as doc:
+        for page_num, page in enumerate(doc, start=1):
+            palabras = page.get_text("words")
+            if not es_pagina_nativa(page, palabras):
+                continue
+
+            # Llevar las coordenadas a la página tal como se rasteriza (rotación)
+            if page.rotation:
+                matriz = page.rotation_matrix
+                palabras = [
+                    (*fitz.Rect(w[:4]).transform(matriz), *w[4:]) for w in palabras
+                ]
+
+            filename = f"img_{page_num:03d}.jpg"
+            destino.mkdir(parents=True, exist_ok=True)
+            with open(destino / f"{filename}.json", "w") as f:
+                json.dump(frases_de_palabras(palabras, escala), f, ensure_ascii=False, separators=(",", ":"))
+            nativas.append(filename)
+    return nativas
+
+# Subidas por partes (reanudables)
+PARCIALES_PATH = UPLOADS_PATH / "parciales"
+CHUNK_SIZE_DEFAULT = 8 * 1024 * 1024
+CHUNK_SIZE_MAX = 64 * 1024 * 1024
+BLOQUE_COPIA = 1024 * 1024
+
+# Hash incremental por subida: (sha256 del prefijo contiguo, siguiente chunk)
+# Si el servidor se reinicia se recalcula desde disco al continuar
+_hash_subidas = {}
+
+class UploadInit(BaseModel):
+    filename: str
+    size: int
+    chunk_size: Optional[int] = None
+
+class UploadComplete(BaseModel):
+    sha256: Optional[str] = None
+    reutilizar: bool = True
+
+def carpeta_subida(upload_id: str) -> Path:
+    """Carpeta de una subida parcial (valida el id para no salir de uploads/)"""
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        raise HTTPException(400, "upload_id inválido")
+    carpeta = PARCIALES_PATH / upload_id
+    if not (carpeta / "meta.json").exists():
+        raise HTTPException(404, f"Subida '{upload_id}' no existe")
+    return carpeta
+
+def leer_meta_subida(carpeta: Path) -> dict:
+    with open(carpeta / "meta.json") as f:
+        return json.load(f)
+
+def chunks_recibidos(carpeta: Path) -> set:
+    return {int(p.name) for p in (carpeta / "recibidos").iterdir()}
+
+def largo_chunk(meta: dict, index: int) -> int:
+    return min(meta["chunk_size"], meta["size"] - index * meta["chunk_size"])
+
+def avanzar_hash(upload_id: str, carpeta: Path, meta: dict, streamed=None):
+    """
+    Extiende el hash con los chunks contiguos ya recibidos
+
+    Args:
+        streamed: (index, hasher) de un chunk recién escrito que se hasheó
+            mientras llegaba; si es el siguiente se adopta sin releerlo
+    """
+    hasher, siguiente = _hash_subidas.get(upload_id, (None, 0))
+    if hasher is None:
+        hasher = hashlib.sha256()
+    recibidos = chunks_recibidos(carpeta)
+
+    with open(carpeta / "data.part", "rb") as f:
+        while siguiente in recibidos:
+            if streamed is not None and streamed[0] == siguiente:
+                hasher = streamed[1]
+            else:
+                f.seek(siguiente * meta["chunk_size"])
+                restante = largo_chunk(meta, siguiente)
+                while restante > 0:
+                    bloque = f.read(min(BLOQUE_COPIA, restante))
+                    hasher.update(bloque)
+                    restante -= len(bloque)
+            siguiente += 1
+
+    _hash_subidas[upload_id] = (hasher, siguiente)
+    return hasher, siguiente
+
+class LinesPatch(BaseModel):
+    # null borra las líneas de la página
+    lines: dict[str, Optional[List[float]]]
+    line_gap: Optional[float] = None
+    base_version: Optional[int] = None
 
 class LinesData(BaseModel):
     lines: dict
@@ -91,6 +404,11 @@ class ProjectInfo(BaseModel):
     total_images: Optional[int] = None
     images: Optional[List[str]] = None
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas Prometheus (etapas, páginas, uploads en curso y memoria)"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
     """Verificar estado de la API"""
@@ -101,116 +419,811 @@ async def health_check():
     }
 
 @app.post("/api/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...), reutilizar: bool = True):
     """
     Sube un PDF y lo convierte a imágenes (alta y baja calidad)
     Crea carpetas: originales (300dpi) y baja_calidad (reducidas)
+
+    Si el mismo PDF ya se subió (mismo SHA-256) se reutiliza ese proyecto,
+    salvo con `reutilizar=false`
     """
-    global current_project
-    
     if not file.filename.endswith('.pdf'):
         raise HTTPException(400, "Solo se aceptan archivos PDF")
     
+    UPLOADS_EN_CURSO.inc()
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        project_name = f"proyecto_{timestamp}"
-        project_path = PROJECTS_PATH / project_name
-        
-        print(f"Procesando PDF: {file.filename} como proyecto '{project_name}'")
-        
-        # Crear estructura de carpetas
-        baja_calidad_path = project_path / "baja_calidad"
-        originales_path = project_path / "originales"
-        procesadas_path = project_path / "procesadas"
-        
-        baja_calidad_path.mkdir(parents=True, exist_ok=True)
-        originales_path.mkdir(parents=True, exist_ok=True)
-        procesadas_path.mkdir(parents=True, exist_ok=True)
+        project_name = nuevo_nombre_proyecto()
         
-        # Guardar archivo PDF original
+        # Guardar archivo PDF original calculando su hash en el mismo paso
         pdf_path = UPLOADS_PATH / f"{project_name}.pdf"
+        inicio = time.perf_counter()
+        hasher = hashlib.sha256()
         with open(pdf_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            while bloque := await file.read(BLOQUE_COPIA):
+                hasher.update(bloque)
+                buffer.write(bloque)
+        ETAPA_SEGUNDOS.labels(etapa="recepcion_pdf").observe(time.perf_counter() - inicio)
         
-        # Convertir PDF a imágenes con alta calidad (150 DPI - balance calidad/velocidad)
-        print(f"Convirtiendo PDF a imágenes (150 DPI)...")
+        return await crear_proyecto_en_hilo(
+            project_name, pdf_path, file.filename, hasher.hexdigest(), reutilizar=reutilizar
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error procesando PDF: {str(e)}")
+    finally:
+        UPLOADS_EN_CURSO.dec()
+
+@app.post("/api/upload/init")
+async def upload_init(data: UploadInit):
+    """
+    Inicia una subida por partes
+
+    El cliente envía cada parte con PUT /api/upload/{upload_id}/chunk/{index}
+    (en cualquier orden, reintentando las que fallen) y cierra con
+    POST /api/upload/{upload_id}/complete.
+    """
+    if not data.filename.endswith('.pdf'):
+        raise HTTPException(400, "Solo se aceptan archivos PDF")
+    if data.size <= 0:
+        raise HTTPException(400, "size debe ser mayor a 0")
+
+    chunk_size = data.chunk_size or CHUNK_SIZE_DEFAULT
+    if not 0 < chunk_size <= CHUNK_SIZE_MAX:
+        raise HTTPException(400, f"chunk_size debe estar entre 1 y {CHUNK_SIZE_MAX}")
+
+    upload_id = uuid.uuid4().hex
+    carpeta = PARCIALES_PATH / upload_id
+    (carpeta / "recibidos").mkdir(parents=True)
+
+    # Archivo del tamaño final: cada chunk se escribe en su offset
+    with open(carpeta / "data.part", "wb") as f:
+        f.truncate(data.size)
+
+    meta = {
+        "upload_id": upload_id,
+        "filename": data.filename,
+        "size": data.size,
+        "chunk_size": chunk_size,
+        "total_chunks": -(-data.size // chunk_size),
+        "created_at": datetime.now().isoformat(),
+    }
+    with open(carpeta / "meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+
+    logger.info("Subida por partes iniciada", extra={"upload_id": upload_id, "pdf": data.filename, "bytes": data.size})
+    return meta
+
+@app.get("/api/upload/{upload_id}")
+async def upload_status(upload_id: str):
+    """Estado de una subida por partes: qué chunks faltan para reanudarla"""
+    carpeta = carpeta_subida(upload_id)
+    meta = leer_meta_subida(carpeta)
+    recibidos = chunks_recibidos(carpeta)
+    return {
+        **meta,
+        "received": sorted(recibidos),
+        "missing": [i for i in range(meta["total_chunks"]) if i not in recibidos],
+        "bytes_received": sum(largo_chunk(meta, i) for i in recibidos),
+    }
+
+@app.put("/api/upload/{upload_id}/chunk/{index}")
+async def upload_chunk(upload_id: str, index: int, request: Request):
+    """
+    Recibe una parte y la escribe directo en su offset del archivo final
+
+    Header opcional X-Chunk-Sha256 para verificar la parte. Reenviar una
+    parte ya recibida la sobrescribe.
+    """
+    carpeta = carpeta_subida(upload_id)
+    meta = leer_meta_subida(carpeta)
+    if not 0 <= index < meta["total_chunks"]:
+        raise HTTPException(400, f"index fuera de rango (0..{meta['total_chunks'] - 1})")
+
+    esperado = largo_chunk(meta, index)
+    marcador = carpeta / "recibidos" / str(index)
+    marcador.unlink(missing_ok=True)
+
+    # Reenviar un chunk ya hasheado invalida el hash incremental: se
+    # descarta y avanzar_hash lo reconstruye desde el disco
+    if index < _hash_subidas.get(upload_id, (None, 0))[1]:
+        _hash_subidas.pop(upload_id, None)
+
+    # Si es el siguiente chunk del hash global se hashea mientras llega
+    hasher_global, siguiente = _hash_subidas.get(upload_id, (None, 0))
+    streamed = None
+    if index == siguiente:
+        streamed = (index, hasher_global.copy() if hasher_global else hashlib.sha256())
+    hasher_chunk = hashlib.sha256()
+
+    escritos = 0
+    with open(carpeta / "data.part", "r+b") as f:
+        f.seek(index * meta["chunk_size"])
+        async for bloque in request.stream():
+            if escritos + len(bloque) > esperado:
+                raise HTTPException(400, f"El chunk {index} excede {esperado} bytes")
+            f.write(bloque)
+            hasher_chunk.update(bloque)
+            if streamed is not None:
+                streamed[1].update(bloque)
+            escritos += len(bloque)
+
+    if escritos != esperado:
+        raise HTTPException(400, f"Chunk {index} incompleto: {escritos} de {esperado} bytes")
+
+    sha_cliente = request.headers.get("x-chunk-sha256")
+    if sha_cliente and sha_cliente.lower() != hasher_chunk.hexdigest():
+        raise HTTPException(400, f"Hash del chunk {index} no coincide")
+
+    marcador.touch()
+    _, siguiente = avanzar_hash(upload_id, carpeta, meta, streamed)
+
+    return {"upload_id": upload_id, "index": index, "bytes": escritos, "hashed_chunks": siguiente}
+
+@app.post("/api/upload/{upload_id}/complete")
+async def upload_complete(upload_id: str, data: Optional[UploadComplete] = None):
+    """
+    Cierra una subida por partes: verifica que no falten partes, compara el
+    hash (si el cliente lo envía) y procesa el PDF igual que /api/upload
+    """
+    carpeta = carpeta_subida(upload_id)
+    meta = leer_meta_subida(carpeta)
+    faltantes = [i for i in range(meta["total_chunks"]) if i not in chunks_recibidos(carpeta)]
+    if faltantes:
+        raise HTTPException(409, f"Faltan {len(faltantes)} chunks: {faltantes[:20]}")
+
+    hasher, _ = avanzar_hash(upload_id, carpeta, meta)
+    sha256 = hasher.hexdigest()
+    if data and data.sha256 and data.sha256.lower() != sha256:
+        raise HTTPException(400, "El hash del archivo no coincide; reenvía los chunks")
+
+    UPLOADS_EN_CURSO.inc()
+    try:
+        project_name = nuevo_nombre_proyecto()
+        pdf_path = UPLOADS_PATH / f"{project_name}.pdf"
+        os.replace(carpeta / "data.part", pdf_path)
+        shutil.rmtree(carpeta, ignore_errors=True)
+        _hash_subidas.pop(upload_id, None)
+
+        return await crear_proyecto_en_hilo(
+            project_name, pdf_path, meta["filename"], sha256,
+            reutilizar=data.reutilizar if data else True,
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error procesando PDF: {str(e)}")
+    finally:
+        UPLOADS_EN_CURSO.dec()
+
+# Huellas del PDF y de cada página (para reutilizar subidas repetidas).
+# Archivo propio porque Paddle reescribe status.json al procesar
+HUELLAS_JSON = "huellas.json"
+
+def huellas_paginas(pdf_path) -> List[str]:
+    """
+    SHA-256 del contenido de cada página del PDF
+
+    Se hashea lo que define cómo se rasteriza la página (tamaño, rotación,
+    content stream, imágenes, XObjects y fuentes), no el archivo completo:
+    una página igual en una versión revisada del PDF da la misma huella
+    aunque el resto del archivo cambie.
+    """
+    huellas = []
+    with fitz.open(str(pdf_path)) as doc:
+        for page in doc:
+            h = hashlib.sha256(f"{DPI_RASTER}|{tuple(page.rect)}|{page.rotation}".encode())
+            h.update(page.read_contents())
+            for xref, *_ in page.get_images(full=True):
+                h.update(doc.xref_stream_raw(xref) or b"")
+            for xref, *_ in page.get_xobjects():
+                h.update(doc.xref_stream_raw(xref) or b"")
+            for font in sorted(page.get_fonts(full=True), key=lambda f: f[4]):
+                h.update(f"{font[3]}|{font[4]}".encode())
+            huellas.append(h.hexdigest())
+    return huellas
+
+def leer_huellas(project_path: Path) -> dict:
+    """huellas.json del proyecto (o el hash de status.json en proyectos anteriores)"""
+    for nombre in (HUELLAS_JSON, "status.json"):
+        path = project_path / nombre
+        if path.exists():
+            try:
+                with open(path) as f:
+                    datos = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if datos.get("pdf_sha256"):
+                return datos
+    return {}
+
+def buscar_pdf_duplicado(pdf_sha256: str, excluir: str) -> Optional[str]:
+    """Proyecto existente (con sus imágenes) creado desde el mismo PDF"""
+    for project_dir in sorted(PROJECTS_PATH.iterdir(), reverse=True):
+        if project_dir.name == excluir or not (project_dir / "originales").exists():
+            continue
+        if leer_huellas(project_dir).get("pdf_sha256") == pdf_sha256:
+            return project_dir.name
+    return None
+
+def indice_paginas(excluir: str) -> dict:
+    """{huella: (proyecto, imagen)} de las páginas ya rasterizadas en otros proyectos"""
+    indice = {}
+    for project_dir in sorted(PROJECTS_PATH.iterdir()):
+        if project_dir.name == excluir:
+            continue
+        for imagen, huella in leer_huellas(project_dir).get("paginas", {}).items():
+            if huella not in indice and (project_dir / "originales" / imagen).exists():
+                indice[huella] = (project_dir.name, imagen)
+    return indice
+
+def enlazar_o_copiar(origen: Path, destino: Path):
+    """Hardlink (sin duplicar bytes) o copia si el sistema de archivos no lo permite"""
+    try:
+        os.link(origen, destino)
+    except OSError:
+        shutil.copy2(origen, destino)
+
+def rangos_contiguos(paginas: List[int]):
+    """[1, 2, 3, 7, 8] -> [(1, 3), (7, 8)]"""
+    rangos = []
+    for pagina in paginas:
+        if rangos and rangos[-1][1] == pagina - 1:
+            rangos[-1][1] = pagina
+        else:
+            rangos.append([pagina, pagina])
+    return [tuple(r) for r in rangos]
+
+def respuesta_duplicado(project_name: str, pdf_path: Path, original: str):
+    """Respuesta de /api/upload cuando el PDF ya existe en otro proyecto"""
+    global current_project
+
+    pdf_path.unlink(missing_ok=True)
+    images = imagenes_proyecto(PROJECTS_PATH / original)
+    current_project = original
+    registrar_acceso(original)
+    logger.info("PDF ya subido, se reutiliza el proyecto", extra={"project": original})
+    return {
+        "status": "success",
+        "project": original,
+        "total_pages": len(images),
+        "images": images,
+        "duplicate_of": original,
+        "message": f"PDF ya subido: se reutiliza {original} ({len(images)} páginas)"
+    }
+
+def nuevo_nombre_proyecto():
+    """proyecto_<timestamp>, con sufijo si ya existe uno en el mismo segundo"""
+    base = f"proyecto_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    nombre, n = base, 1
+    while (PROJECTS_PATH / nombre).exists() or (UPLOADS_PATH / f"{nombre}.pdf").exists():
+        n += 1
+        nombre = f"{base}_{n}"
+    return nombre
+
+# Proyectos que se están rasterizando (la cuota no los toca)
+_proyectos_en_creacion = set()
+
+async def crear_proyecto_en_hilo(project_name: str, *args, **kwargs):
+    """
+    crear_proyecto_desde_pdf fuera del event loop (rasterizar y aplicar la
+    cuota tardan); mientras corre, el proyecto queda protegido de la cuota
+    que aplique otra subida
+    """
+    _proyectos_en_creacion.add(project_name)
+    try:
+        return await run_in_threadpool(crear_proyecto_desde_pdf, project_name, *args, **kwargs)
+    finally:
+        _proyectos_en_creacion.discard(project_name)
+
+def crear_proyecto_desde_pdf(
+    project_name: str, pdf_path: Path, pdf_filename: str, pdf_sha256: str, reutilizar: bool = True
+):
+    """
+    Rasteriza un PDF ya guardado en uploads/ y crea la carpeta del proyecto
+
+    Las páginas idénticas a una ya rasterizada en otro proyecto (misma
+    huella) se enlazan en lugar de volver a convertirse; Paddle reutiliza
+    además su OCR.
+
+    Args:
+        project_name: Nombre del proyecto (proyecto_<timestamp>)
+        pdf_path: PDF completo en disco
+        pdf_filename: Nombre original del archivo subido
+        pdf_sha256: Hash del contenido del PDF
+        reutilizar: Si el mismo PDF ya tiene proyecto, devolver ese proyecto
+
+    Returns:
+        Respuesta de /api/upload
+    """
+    global current_project
+    
+    if reutilizar:
+        original = buscar_pdf_duplicado(pdf_sha256, excluir=project_name)
+        if original:
+            return respuesta_duplicado(project_name, pdf_path, original)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    project_path = PROJECTS_PATH / project_name
+    
+    logger.info("Procesando PDF", extra={"pdf": pdf_filename, "project": project_name})
+    
+    # Crear estructura de carpetas
+    baja_calidad_path = project_path / "baja_calidad"
+    originales_path = project_path / "originales"
+    procesadas_path = project_path / "procesadas"
+    
+    baja_calidad_path.mkdir(parents=True, exist_ok=True)
+    originales_path.mkdir(parents=True, exist_ok=True)
+    procesadas_path.mkdir(parents=True, exist_ok=True)
+    
+    # Páginas ya rasterizadas en otros proyectos: se enlazan sus imágenes
+    inicio = time.perf_counter()
+    try:
+        huellas = huellas_paginas(pdf_path)
+    except Exception as e:
+        logger.warning("No se pudieron calcular las huellas de página", extra={"error": str(e)})
+        huellas = []
+    
+    conocidas = indice_paginas(excluir=project_name) if huellas else {}
+    reutilizadas = {}
+    for page_num, huella in enumerate(huellas, start=1):
+        if huella not in conocidas:
+            continue
+        origen_project, origen_imagen = conocidas[huella]
+        filename = f"img_{page_num:03d}.jpg"
+        origen_path = PROJECTS_PATH / origen_project
+        enlazar_o_copiar(origen_path / "originales" / origen_imagen, originales_path / filename)
+        if (origen_path / "baja_calidad" / origen_imagen).exists():
+            enlazar_o_copiar(origen_path / "baja_calidad" / origen_imagen, baja_calidad_path / filename)
+        else:
+            guardar_baja_calidad(originales_path / filename, baja_calidad_path / filename)
+        reutilizadas[filename] = {"project": origen_project, "imagen": origen_imagen}
+    ETAPA_SEGUNDOS.labels(etapa="deduplicacion").observe(time.perf_counter() - inicio)
+    if reutilizadas:
+        logger.info(
+            "Páginas reutilizadas de otros proyectos",
+            extra={"project": project_name, "paginas": len(reutilizadas), "total": len(huellas)},
+        )
+    
+    # Convertir PDF a imágenes con alta calidad (150 DPI - balance calidad/velocidad)
+    # Solo las páginas nuevas, en rangos repartidos entre varios pdftoppm
+    try:
+        total_paginas = len(huellas) or pdfinfo_from_path(str(pdf_path))["Pages"]
+    except Exception as e:
+        logger.exception("Error al leer el PDF", extra={"project": project_name})
+        raise HTTPException(500, f"Error convirtiendo PDF: {str(e)}")
+    
+    pendientes = [n for n in range(1, total_paginas + 1) if f"img_{n:03d}.jpg" not in reutilizadas]
+    rangos = dividir_rangos(pendientes)
+    num_workers = workers_rasterizacion(len(rangos))
+    
+    logger.debug(
+        "Rasterizando por rangos",
+        extra={"paginas": len(pendientes), "rangos": len(rangos), "workers": num_workers},
+    )
+    
+    image_list = list(reutilizadas)
+    inicio_rasterizacion = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            executor.submit(
+                rasterizar_rango,
+                (str(pdf_path), primera, ultima, str(originales_path), str(baja_calidad_path), DPI_RASTER),
+            ): (primera, ultima)
+            for primera, ultima in rangos
+        }
         
+        # Capa de texto de PDFs digitales (el OCR de esas páginas se omite),
+        # mientras los workers rasterizan
+        inicio = time.perf_counter()
         try:
-            # Usar 150 DPI en lugar de 300 (más rápido, sigue siendo alta calidad)
-            images = convert_from_path(pdf_path, dpi=150, fmt='jpeg')
-            print(f"✓ PDF convertido a {len(images)} imágenes")
+            paginas_nativas = extraer_texto_nativo(pdf_path, project_path / "texto_nativo")
         except Exception as e:
-            print(f"✗ Error al convertir PDF: {str(e)}")
-            raise HTTPException(500, f"Error convirtiendo PDF: {str(e)}")
-        
-        image_list = []
-        
-        # Preparar datos para procesamiento en lotes
-        num_workers = min(os.cpu_count() or 4, 4)  # Limitar a máximo 4 para no saturar memoria
-        batch_size = max(5, os.cpu_count() or 4)  # Procesar en lotes pequeños
-        
-        print(f"Total: {len(images)} imágenes")
-        print(f"Procesando en lotes de {batch_size} con {num_workers} workers...")
+            logger.warning("No se pudo leer la capa de texto", extra={"error": str(e)})
+            paginas_nativas = []
+        ETAPA_SEGUNDOS.labels(etapa="texto_nativo").observe(time.perf_counter() - inicio)
+        if paginas_nativas:
+            logger.info(
+                "Texto nativo extraído",
+                extra={"project": project_name, "paginas": len(paginas_nativas)},
+            )
         
-        # Procesar en lotes para no saturar memoria
-        for batch_start in range(0, len(images), batch_size):
-            batch_end = min(batch_start + batch_size, len(images))
-            batch = images[batch_start:batch_end]
+        for future in as_completed(futures):
+            primera, ultima = futures[future]
+            try:
+                segundos, paginas = future.result()
+            except Exception as e:
+                PAGINAS_FALLIDAS.inc(ultima - primera + 1)
+                logger.warning("Error ejecutando tarea", extra={"rango": [primera, ultima], "error": str(e)})
+                continue
             
-            print(f"\n📦 Procesando lote: imágenes {batch_start + 1} a {batch_end}...")
-            
-            # Preparar datos del lote actual
-            batch_data = [
-                (page_num, img, str(originales_path), str(baja_calidad_path))
-                for page_num, img in enumerate(batch, start=batch_start + 1)
-            ]
-            
-            # Procesar lote en paralelo
-            with ProcessPoolExecutor(max_workers=num_workers) as executor:
-                futures = {
-                    executor.submit(process_image, img_data): page_num 
-                    for page_num, img_data in enumerate(batch_data, start=1)
-                }
-                
-                for future in as_completed(futures):
-                    try:
-                        filename, success, error = future.result()
-                        if success:
-                            image_list.append(filename)
-                            print(f"  ✓ {filename}")
-                        else:
-                            print(f"  ✗ Error: {error}")
-                    except Exception as e:
-                        print(f"  ✗ Error ejecutando tarea: {str(e)}")
-            
-            # Liberar memoria del lote procesado
-            del batch
-            import gc
-            gc.collect()
-            print(f"✅ Lote completado. Memoria liberada.")
-        
-        # Guardar estado del proyecto
-        status_path = project_path / "status.json"
-        with open(status_path, "w") as f:
-            json.dump({
-                "status": "idle",
-                "created_at": timestamp,
-                "pdf_filename": file.filename,
-                "total_pages": len(image_list)
-            }, f, indent=2)
-        
-        current_project = project_name
-        
-        return {
-            "status": "success",
+            ETAPA_SEGUNDOS.labels(etapa="rasterizacion").observe(segundos)
+            for filename, success, error, segundos_encode in paginas:
+                if success:
+                    ETAPA_SEGUNDOS.labels(etapa="encode").observe(segundos_encode)
+                    PAGINAS_PROCESADAS.inc()
+                    image_list.append(filename)
+                    logger_paginas.debug("Imagen guardada: %s", filename)
+                else:
+                    PAGINAS_FALLIDAS.inc()
+                    logger.warning("Error guardando imagen", extra={"error": error})
+            logger_paginas.debug("Rango completado: páginas %s a %s", primera, ultima)
+    
+    if pendientes and len(image_list) == len(reutilizadas):
+        raise HTTPException(500, "Error convirtiendo PDF: no se pudo rasterizar ninguna página")
+    
+    logger.info(
+        "PDF convertido",
+        extra={
             "project": project_name,
+            "paginas": len(image_list) - len(reutilizadas),
+            "segundos": round(time.perf_counter() - inicio_rasterizacion, 2),
+        },
+    )
+    
+    image_list.sort()
+    
+    with open(project_path / HUELLAS_JSON, "w") as f:
+        json.dump({
+            "pdf_sha256": pdf_sha256,
+            "paginas": {f"img_{n:03d}.jpg": h for n, h in enumerate(huellas, start=1)},
+            "reutilizadas": reutilizadas
+        }, f, indent=2)
+    
+    # Guardar estado del proyecto
+    status_path = project_path / "status.json"
+    with open(status_path, "w") as f:
+        json.dump({
+            "status": "idle",
+            "created_at": timestamp,
+            "pdf_filename": pdf_filename,
+            "pdf_sha256": pdf_sha256,
             "total_pages": len(image_list),
-            "images": image_list,
-            "message": f"PDF procesado: {len(image_list)} páginas"
-        }
+            "native_text_pages": len(paginas_nativas),
+            "reused_pages": len(reutilizadas)
+        }, f, indent=2)
     
-    except Exception as e:
-        raise HTTPException(500, f"Error procesando PDF: {str(e)}")
+    current_project = project_name
+    registrar_acceso(project_name)
+    
+    # Mantener el almacenamiento bajo la cuota (sin tocar el proyecto nuevo)
+    if STORAGE_QUOTA_GB:
+        try:
+            aplicar_cuota(excluir={project_name})
+        except Exception as e:
+            logger.warning("Error aplicando la cuota de almacenamiento", extra={"error": str(e)})
+    
+    return {
+        "status": "success",
+        "project": project_name,
+        "total_pages": len(image_list),
+        "images": image_list,
+        "native_text_pages": len(paginas_nativas),
+        "reused_pages": len(reutilizadas),
+        "message": f"PDF procesado: {len(image_list)} páginas"
+    }
+
+
+# Almacenamiento: uso en disco por proyecto, cuota y desalojo LRU.
+# Solo se desalojan artefactos regenerables; el PDF, las originales, las
+# líneas y los tokens OCR se conservan siempre
+STORAGE_QUOTA_GB = float(os.getenv("STORAGE_QUOTA_GB", "0"))  # 0 = sin cuota
+# En orden de desalojo: lo más barato de regenerar primero
+ARTEFACTOS_REGENERABLES = (
+    "baja_calidad",        # se regenera desde originales/ al pedir la imagen
+    "procesadas",
+    "deteccion",
+    "lineas_overlay",
+    "ocr_reutilizado",
+    "resultado.xlsx",
+    "profiling.prof",
+    "profiling_top.txt",
+)
+ULTIMO_ACCESO = ".ultimo_acceso"
+# Segundos entre actualizaciones de la marca de acceso de un proyecto
+INTERVALO_ACCESO = 60
+_ultimos_accesos = {}
+
+def registrar_acceso(project_name: str):
+    """Actualiza la marca de último acceso (mtime de .ultimo_acceso) del proyecto"""
+    ahora = time.time()
+    if ahora - _ultimos_accesos.get(project_name, 0) < INTERVALO_ACCESO:
+        return
+    _ultimos_accesos[project_name] = ahora
+    marca = PROJECTS_PATH / project_name / ULTIMO_ACCESO
+    if marca.parent.exists():
+        marca.touch()
+
+def ultimo_acceso(project_path: Path) -> float:
+    """Timestamp del último acceso (o de la creación si nunca se abrió)"""
+    for nombre in (ULTIMO_ACCESO, "status.json"):
+        path = project_path / nombre
+        if path.exists():
+            return path.stat().st_mtime
+    return project_path.stat().st_mtime
+
+def archivos_de(path: Path):
+    """Archivos (os.DirEntry) bajo `path`, recursivo"""
+    if path.is_file():
+        yield path
+        return
+    pendientes = [path]
+    while pendientes:
+        with os.scandir(pendientes.pop()) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    pendientes.append(entrada.path)
+                elif entrada.is_file(follow_symlinks=False):
+                    yield entrada
+
+def uso_proyecto(project_path: Path, vistos: Optional[set] = None) -> dict:
+    """
+    Bytes en disco de un proyecto por componente
+
+    Args:
+        project_path: Carpeta del proyecto
+        vistos: Inodos ya contados; los hardlinks compartidos con otro
+            proyecto (páginas reutilizadas) se cuentan una sola vez
+
+    Returns:
+        {"bytes", "regenerable_bytes", "componentes": {nombre: bytes}}
+    """
+    componentes = {}
+    pdf_path = UPLOADS_PATH / f"{project_path.name}.pdf"
+    fuentes = [("pdf", pdf_path)] if pdf_path.exists() else []
+    fuentes += [(p.name, p) for p in project_path.iterdir()]
+    
+    for nombre, path in fuentes:
+        total = 0
+        for archivo in archivos_de(path):
+            st = archivo.stat(follow_symlinks=False)
+            if vistos is not None:
+                if (st.st_dev, st.st_ino) in vistos:
+                    continue
+                vistos.add((st.st_dev, st.st_ino))
+            total += st.st_size
+        componentes[nombre] = total
+    
+    return {
+        "bytes": sum(componentes.values()),
+        "regenerable_bytes": sum(componentes.get(n, 0) for n in ARTEFACTOS_REGENERABLES),
+        "componentes": componentes,
+    }
+
+def proyecto_ocupado(project_path: Path) -> bool:
+    """Proyecto activo en el frontend, creándose o procesándose en Paddle"""
+    if project_path.name == current_project or project_path.name in _proyectos_en_creacion:
+        return True
+    try:
+        with open(project_path / "status.json") as f:
+            return json.load(f).get("status") == "processing"
+    except (OSError, json.JSONDecodeError):
+        return False
+
+def uso_almacenamiento() -> dict:
+    """Uso total y por proyecto (del último acceso más reciente al más antiguo)"""
+    vistos = set()
+    proyectos = []
+    if PROJECTS_PATH.exists():
+        for project_dir in PROJECTS_PATH.iterdir():
+            if not project_dir.is_dir():
+                continue
+            uso = uso_proyecto(project_dir, vistos)
+            proyectos.append({
+                "name": project_dir.name,
+                "last_access": datetime.fromtimestamp(ultimo_acceso(project_dir)).isoformat(),
+                **uso,
+            })
+    
+    parciales = sum(a.stat().st_size for a in archivos_de(PARCIALES_PATH)) if PARCIALES_PATH.exists() else 0
+    papelera = sum(a.stat().st_size for a in archivos_de(PAPELERA_PATH)) if PAPELERA_PATH.exists() else 0
+    usado = sum(p["bytes"] for p in proyectos) + parciales + papelera
+    cuota = int(STORAGE_QUOTA_GB * 2**30) or None
+    return {
+        "quota_bytes": cuota,
+        "used_bytes": usado,
+        "partial_uploads_bytes": parciales,
+        "pending_delete_bytes": papelera,
+        "regenerable_bytes": sum(p["regenerable_bytes"] for p in proyectos),
+        "over_quota": bool(cuota and usado > cuota),
+        "projects": sorted(proyectos, key=lambda p: p["last_access"], reverse=True),
+    }
+
+_lock_cuota = threading.Lock()
+
+def aplicar_cuota(cuota_bytes: Optional[int] = None, excluir=()) -> dict:
+    """
+    Desaloja artefactos regenerables, del proyecto usado hace más tiempo al
+    más reciente, hasta quedar bajo la cuota
+
+    Args:
+        cuota_bytes: Límite en bytes (None = STORAGE_QUOTA_GB)
+        excluir: Proyectos que no se tocan (además del activo y los que
+            se están procesando)
+
+    Returns:
+        {"used_bytes", "freed_bytes", "evicted": [{project, artefacto, bytes}]}
+    """
+    cuota = cuota_bytes if cuota_bytes is not None else int(STORAGE_QUOTA_GB * 2**30)
+    # Una sola pasada a la vez (varias subidas pueden terminar juntas)
+    with _lock_cuota:
+        uso = uso_almacenamiento()
+        usado = uso["used_bytes"]
+        desalojados = []
+        
+        if cuota:
+            for proyecto in reversed(uso["projects"]):
+                if usado <= cuota:
+                    break
+                project_path = PROJECTS_PATH / proyecto["name"]
+                if proyecto["name"] in excluir or proyecto_ocupado(project_path):
+                    continue
+                for artefacto in ARTEFACTOS_REGENERABLES:
+                    liberados = proyecto["componentes"].get(artefacto, 0)
+                    path = project_path / artefacto
+                    if usado <= cuota or not path.exists():
+                        continue
+                    if path.is_dir():
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        path.unlink(missing_ok=True)
+                    usado -= liberados
+                    desalojados.append({"project": proyecto["name"], "artefacto": artefacto, "bytes": liberados})
+    
+    liberados = sum(d["bytes"] for d in desalojados)
+    if desalojados:
+        logger.info(
+            "Artefactos desalojados por cuota",
+            extra={"artefactos": len(desalojados), "bytes": liberados, "cuota": cuota},
+        )
+    if cuota and usado > cuota:
+        logger.warning(
+            "Almacenamiento sobre la cuota sin más artefactos regenerables",
+            extra={"usado": usado, "cuota": cuota},
+        )
+    return {"used_bytes": usado, "freed_bytes": liberados, "evicted": desalojados}
+
+# Borrado diferido: el proyecto se mueve a la papelera (rename, instantáneo)
+# y un hilo libera el disco sin bloquear el event loop
+PAPELERA_PATH = STORAGE_PATH / "papelera"
+# Índice de búsqueda del servicio Paddle (comparte storage/)
+BUSQUEDA_DB = STORAGE_PATH / "busqueda.sqlite"
+_cola_borrado = queue.Queue()
+_hilo_borrado = None
+_lock_borrado = threading.Lock()
+
+class CleanupRequest(BaseModel):
+    projects: Optional[List[str]] = None
+    older_than_days: Optional[float] = None
+    dry_run: bool = False
+
+def purgar_busqueda(project: str) -> int:
+    """
+    Quita del índice de búsqueda las filas de un proyecto eliminado
+
+    Returns:
+        Filas borradas (0 si el índice no existe)
+    """
+    if not BUSQUEDA_DB.exists():
+        return 0
+    conn = sqlite3.connect(str(BUSQUEDA_DB), timeout=30)
+    try:
+        with conn:
+            return conn.execute("DELETE FROM filas WHERE project = ?", (project,)).rowcount
+    finally:
+        conn.close()
+
+def _worker_borrado():
+    """Borra del disco lo que llega a la cola, uno a la vez"""
+    while True:
+        path, project = _cola_borrado.get()
+        inicio = time.perf_counter()
+        try:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+            filas = purgar_busqueda(project) if project else 0
+            logger.info(
+                "Espacio liberado",
+                extra={
+                    "path": path.name,
+                    "filas_busqueda": filas,
+                    "segundos": round(time.perf_counter() - inicio, 2),
+                },
+            )
+        except Exception as e:
+            logger.warning("Error liberando espacio", extra={"path": str(path), "error": str(e)})
+        finally:
+            _cola_borrado.task_done()
+
+def encolar_borrado(path: Path, project: Optional[str] = None):
+    """
+    Encola un borrado, arrancando el hilo de borrado si no está corriendo
+
+    Args:
+        path: Carpeta o archivo a borrar
+        project: Proyecto cuyas filas se quitan del índice de búsqueda
+    """
+    global _hilo_borrado
+    with _lock_borrado:
+        if _hilo_borrado is None or not _hilo_borrado.is_alive():
+            _hilo_borrado = threading.Thread(target=_worker_borrado, name="borrado", daemon=True)
+            _hilo_borrado.start()
+    _cola_borrado.put((path, project))
+
+def mover_a_papelera(path: Path, extras=()):
+    """
+    Oculta un proyecto (o subida parcial) al instante y encola su borrado
+
+    Args:
+        path: Carpeta a eliminar
+        extras: Archivos asociados (p. ej. el PDF en uploads/) que se van con ella
+    """
+    global current_project
+    
+    es_proyecto = path.parent == PROJECTS_PATH
+    destino = PAPELERA_PATH / f"{path.name}.{uuid.uuid4().hex[:8]}"
+    destino.mkdir(parents=True)
+    path.rename(destino / path.name)
+    for extra in extras:
+        if extra.exists():
+            extra.rename(destino / extra.name)
+    
+    if current_project == path.name:
+        current_project = None
+    _ultimos_accesos.pop(path.name, None)
+    encolar_borrado(destino, path.name if es_proyecto else None)
+
+def candidatos_limpieza(data: CleanupRequest):
+    """
+    Proyectos y subidas parciales a limpiar según la petición
+
+    Returns:
+        (proyectos, omitidos [{project, reason}], subidas parciales)
+    """
+    proyectos, omitidos = [], []
+    nombres = set(data.projects or [])
+    limite = time.time() - data.older_than_days * 86400 if data.older_than_days is not None else None
+    
+    if PROJECTS_PATH.exists():
+        for project_dir in sorted(PROJECTS_PATH.iterdir()):
+            if not project_dir.is_dir():
+                continue
+            viejo = limite is not None and ultimo_acceso(project_dir) < limite
+            if project_dir.name not in nombres and not viejo:
+                continue
+            if proyecto_ocupado(project_dir):
+                omitidos.append({"project": project_dir.name, "reason": "activo o procesando"})
+            else:
+                proyectos.append(project_dir)
+    
+    encontrados = {p.name for p in proyectos} | {o["project"] for o in omitidos}
+    omitidos += [{"project": n, "reason": "no existe"} for n in sorted(nombres - encontrados)]
+    
+    parciales = []
+    if limite is not None and PARCIALES_PATH.exists():
+        parciales = [p for p in PARCIALES_PATH.iterdir() if p.stat().st_mtime < limite]
+    return proyectos, omitidos, parciales
+
+def asegurar_baja_calidad(project_path: Path, filename: str) -> Path:
+    """Ruta de la vista previa, regenerándola desde originales/ si fue desalojada"""
+    baja_path = project_path / "baja_calidad" / filename
+    original_path = project_path / "originales" / filename
+    if not baja_path.exists() and original_path.exists():
+        baja_path.parent.mkdir(exist_ok=True)
+        guardar_baja_calidad(original_path, baja_path)
+    return baja_path
+
+def imagenes_proyecto(project_path: Path) -> List[str]:
+    """Imágenes del proyecto (originales/ es la fuente, baja_calidad/ puede no estar)"""
+    for carpeta in ("originales", "baja_calidad"):
+        if (project_path / carpeta).exists():
+            return sorted(f.name for f in (project_path / carpeta).glob("*.jpg"))
+    return []
 
 @app.get("/api/images/{filename}")
 async def get_image(filename: str, quality: str = "baja"):
@@ -221,8 +1234,12 @@ async def get_image(filename: str, quality: str = "baja"):
     if not current_project:
         raise HTTPException(400, "No hay proyecto activo")
     
-    folder = "baja_calidad" if quality == "baja" else "originales"
-    image_path = PROJECTS_PATH / current_project / folder / filename
+    project_path = PROJECTS_PATH / current_project
+    registrar_acceso(current_project)
+    if quality == "baja":
+        image_path = asegurar_baja_calidad(project_path, Path(filename).name)
+    else:
+        image_path = project_path / "originales" / filename
     
     if not image_path.exists():
         raise HTTPException(404, f"Imagen no encontrada: {filename}")
@@ -270,10 +1287,10 @@ async def set_current_project(project_name: str):
             raise HTTPException(404, f"Proyecto '{project_name}' no encontrado")
         
         current_project = project_name
+        registrar_acceso(project_name)
         
-        # Obtener lista de imágenes de baja calidad
-        baja_calidad_path = project_path / "baja_calidad"
-        images = sorted([f.name for f in baja_calidad_path.glob("*.jpg")])
+        # Obtener lista de imágenes (las vistas previas se regeneran al pedirlas)
+        images = imagenes_proyecto(project_path)
         
         # Cargar líneas si existen
         json_path = project_path / "lines.json"
@@ -303,6 +1320,106 @@ async def set_current_project(project_name: str):
     except Exception as e:
         raise HTTPException(500, f"Error estableciendo proyecto: {str(e)}")
 
+# Líneas: lines.json compacto + una instantánea por versión guardada
+LINES_VERSIONES_DIR = "lines_versiones"
+LINES_VERSIONES_MAX = int(os.getenv("LINES_VERSIONES_MAX", "200"))
+
+def escribir_json_atomico(path: Path, datos):
+    """JSON compacto escrito a un temporal y renombrado (nunca queda a medias)"""
+    temporal = path.with_name(path.name + ".tmp")
+    with open(temporal, "w") as f:
+        json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporal, path)
+
+def leer_lines(project_path: Path, version: Optional[int] = None) -> dict:
+    """
+    lines.json del proyecto o una versión guardada
+
+    La versión 0 (o un proyecto sin líneas) es el documento vacío
+    """
+    if version == 0:
+        return {"lines": {}, "line_gap": 6.5, "version": 0}
+    
+    if version is None:
+        path = project_path / "lines.json"
+    else:
+        path = project_path / LINES_VERSIONES_DIR / f"v{version:04d}.json"
+        if not path.exists():
+            raise HTTPException(404, f"Versión {version} de líneas no encontrada")
+    
+    if not path.exists():
+        return {"lines": {}, "line_gap": 6.5, "version": 0}
+    with open(path) as f:
+        datos = json.load(f)
+    datos.setdefault("version", 0)
+    return datos
+
+def paginas_cambiadas(antes: dict, despues: dict) -> List[str]:
+    """Imágenes cuyas líneas difieren (sin líneas = lista vacía)"""
+    return sorted(
+        imagen for imagen in set(antes) | set(despues)
+        if (antes.get(imagen) or []) != (despues.get(imagen) or [])
+    )
+
+def guardar_lines(project_path: Path, lines: dict, line_gap: float, origen: str) -> dict:
+    """
+    Escribe lines.json y una nueva versión en lines_versiones/
+
+    Returns:
+        Documento guardado más `changed_pages` respecto a la versión anterior
+    """
+    actual = leer_lines(project_path)
+    version = actual["version"] + 1
+    cambiadas = paginas_cambiadas(actual.get("lines", {}), lines)
+    
+    datos = {
+        "lines": lines,
+        "line_gap": line_gap,
+        "exported_at": datetime.now().isoformat(),
+        "total_lines": sum(len(v) for v in lines.values()),
+        "version": version
+    }
+    
+    carpeta = project_path / LINES_VERSIONES_DIR
+    carpeta.mkdir(exist_ok=True)
+    escribir_json_atomico(carpeta / f"v{version:04d}.json", datos)
+    
+    indice_path = carpeta / "indice.json"
+    indice = []
+    if indice_path.exists():
+        with open(indice_path) as f:
+            indice = json.load(f)
+    indice.append({
+        "version": version,
+        "created_at": datos["exported_at"],
+        "origen": origen,
+        "total_lines": datos["total_lines"],
+        "changed_pages": len(cambiadas)
+    })
+    
+    # Descartar las versiones más antiguas
+    for vieja in indice[:-LINES_VERSIONES_MAX] if LINES_VERSIONES_MAX > 0 else []:
+        (carpeta / f"v{vieja['version']:04d}.json").unlink(missing_ok=True)
+    indice = indice[-LINES_VERSIONES_MAX:] if LINES_VERSIONES_MAX > 0 else indice
+    escribir_json_atomico(indice_path, indice)
+    
+    escribir_json_atomico(project_path / "lines.json", datos)
+    
+    # Actualizar status del proyecto
+    status_path = project_path / "status.json"
+    if status_path.exists():
+        with open(status_path) as f:
+            status = json.load(f)
+    else:
+        status = {"status": "idle"}
+    
+    status["lines_exported"] = datos["exported_at"]
+    status["lines_version"] = version
+    with open(status_path, "w") as f:
+        json.dump(status, f, indent=2)
+    
+    return {**datos, "changed_pages": cambiadas}
+
 @app.post("/api/export-lines")
 async def export_lines(data: LinesData):
     """
@@ -315,34 +1432,17 @@ async def export_lines(data: LinesData):
     try:
         project_path = PROJECTS_PATH / current_project
         json_path = project_path / "lines.json"
+        registrar_acceso(current_project)
         
-        export_data = {
-            "lines": data.lines,
-            "line_gap": data.line_gap,
-            "exported_at": datetime.now().isoformat(),
-            "total_lines": sum(len(v) for v in data.lines.values())
-        }
-        
-        with open(json_path, "w") as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
-        
-        # Actualizar status del proyecto
-        status_path = project_path / "status.json"
-        if status_path.exists():
-            with open(status_path) as f:
-                status = json.load(f)
-        else:
-            status = {"status": "idle"}
-        
-        status["lines_exported"] = datetime.now().isoformat()
-        with open(status_path, "w") as f:
-            json.dump(status, f, indent=2)
+        export_data = guardar_lines(project_path, data.lines, data.line_gap, origen="export")
         
         return {
             "status": "success",
             "message": "Líneas exportadas correctamente",
             "path": str(json_path),
-            "total_lines": export_data["total_lines"]
+            "total_lines": export_data["total_lines"],
+            "version": export_data["version"],
+            "changed_pages": len(export_data["changed_pages"])
         }
     
     except Exception as e:
@@ -370,7 +1470,8 @@ async def get_project_lines(project_name: str):
             "project": project_name,
             "lines": lines_data.get("lines", {}),
             "line_gap": lines_data.get("line_gap", 6.5),
-            "exported_at": lines_data.get("exported_at")
+            "exported_at": lines_data.get("exported_at"),
+            "version": lines_data.get("version", 0)
         }
     
     except HTTPException:
@@ -378,28 +1479,121 @@ async def get_project_lines(project_name: str):
     except Exception as e:
         raise HTTPException(500, f"Error obteniendo líneas: {str(e)}")
 
+@app.patch("/api/project/{project_name}/lines")
+async def patch_project_lines(project_name: str, data: LinesPatch):
+    """
+    Actualiza solo las páginas enviadas (null borra sus líneas) y guarda
+    una nueva versión
+
+    Con `base_version` responde 409 si alguien guardó otra versión antes
+    """
+    try:
+        project_path = PROJECTS_PATH / Path(project_name).name
+        
+        if not project_path.is_dir():
+            raise HTTPException(404, f"Proyecto '{project_name}' no encontrado")
+        registrar_acceso(project_path.name)
+        
+        actual = leer_lines(project_path)
+        if data.base_version is not None and data.base_version != actual["version"]:
+            raise HTTPException(
+                409, f"Las líneas cambiaron: versión actual {actual['version']}, base {data.base_version}"
+            )
+        
+        lines = dict(actual.get("lines", {}))
+        for imagen, lineas in data.lines.items():
+            if lineas is None:
+                lines.pop(imagen, None)
+            else:
+                lines[imagen] = lineas
+        
+        guardado = guardar_lines(
+            project_path,
+            lines,
+            data.line_gap if data.line_gap is not None else actual.get("line_gap", 6.5),
+            origen="patch",
+        )
+        
+        return {
+            "status": "success",
+            "project": project_path.name,
+            "version": guardado["version"],
+            "total_lines": guardado["total_lines"],
+            "changed_pages": guardado["changed_pages"]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error actualizando líneas: {str(e)}")
+
+@app.get("/api/project/{project_name}/lines/versions")
+async def list_lines_versions(project_name: str):
+    """Versiones guardadas de las líneas (más reciente primero)"""
+    project_path = PROJECTS_PATH / Path(project_name).name
+    if not project_path.is_dir():
+        raise HTTPException(404, f"Proyecto '{project_name}' no encontrado")
+    
+    indice_path = project_path / LINES_VERSIONES_DIR / "indice.json"
+    indice = []
+    if indice_path.exists():
+        with open(indice_path) as f:
+            indice = json.load(f)
+    return {
+        "project": project_path.name,
+        "current_version": leer_lines(project_path)["version"],
+        "versions": indice[::-1]
+    }
+
+@app.get("/api/project/{project_name}/lines/versions/{version}")
+async def get_lines_version(project_name: str, version: int):
+    """Instantánea de una versión de las líneas"""
+    project_path = PROJECTS_PATH / Path(project_name).name
+    if not project_path.is_dir():
+        raise HTTPException(404, f"Proyecto '{project_name}' no encontrado")
+    return leer_lines(project_path, version)
+
+@app.get("/api/project/{project_name}/lines/diff")
+async def diff_lines_versions(project_name: str, from_version: int, to_version: Optional[int] = None):
+    """Páginas cuyas líneas cambian entre dos versiones (to_version default: la actual)"""
+    project_path = PROJECTS_PATH / Path(project_name).name
+    if not project_path.is_dir():
+        raise HTTPException(404, f"Proyecto '{project_name}' no encontrado")
+    
+    antes = leer_lines(project_path, from_version)
+    despues = leer_lines(project_path, to_version)
+    lineas_antes, lineas_despues = antes.get("lines", {}), despues.get("lines", {})
+    cambios = {
+        imagen: {"before": lineas_antes.get(imagen, []), "after": lineas_despues.get(imagen, [])}
+        for imagen in paginas_cambiadas(lineas_antes, lineas_despues)
+    }
+    return {
+        "project": project_path.name,
+        "from_version": antes["version"],
+        "to_version": despues["version"],
+        "total_changed": len(cambios),
+        "changed": cambios
+    }
+
 @app.delete("/api/project/{project_name}")
 async def delete_project(project_name: str):
-    """Elimina un proyecto completo (carpeta y archivos)"""
-    global current_project
-    
+    """
+    Elimina un proyecto completo (carpeta y PDF)
+
+    El proyecto desaparece de inmediato (se mueve a la papelera) y el
+    disco se libera en segundo plano
+    """
     try:
-        project_path = PROJECTS_PATH / project_name
+        project_path = PROJECTS_PATH / Path(project_name).name
         
-        if not project_path.exists():
+        if not project_path.is_dir():
             raise HTTPException(404, f"Proyecto '{project_name}' no encontrado")
         
-        # Eliminar carpeta del proyecto
-        shutil.rmtree(project_path)
+        # Igual que la limpieza: borrarlo rompería el OCR en curso
+        if proyecto_ocupado(project_path):
+            raise HTTPException(409, f"Proyecto '{project_name}' activo o procesándose")
         
-        # Eliminar PDF si existe
-        pdf_path = UPLOADS_PATH / f"{project_name}.pdf"
-        if pdf_path.exists():
-            pdf_path.unlink()
-        
-        # Si era el proyecto activo, desactivar
-        if current_project == project_name:
-            current_project = None
+        mover_a_papelera(project_path, extras=[UPLOADS_PATH / f"{project_path.name}.pdf"])
         
         return {
             "status": "success",
@@ -456,6 +1650,73 @@ async def get_project_info(project_name: str):
     except Exception as e:
         raise HTTPException(500, f"Error obteniendo información: {str(e)}")
 
+@app.post("/api/projects/cleanup")
+async def cleanup_projects(data: CleanupRequest):
+    """
+    Elimina varios proyectos a la vez: los indicados en `projects` y/o los
+    que no se abren hace `older_than_days` días (más las subidas por partes
+    abandonadas). Con `dry_run` solo lista lo que se eliminaría
+    """
+    if not data.projects and data.older_than_days is None:
+        raise HTTPException(400, "Indica 'projects' u 'older_than_days'")
+    
+    try:
+        proyectos, omitidos, parciales = await run_in_threadpool(candidatos_limpieza, data)
+        
+        if not data.dry_run:
+            for project_path in proyectos:
+                mover_a_papelera(project_path, extras=[UPLOADS_PATH / f"{project_path.name}.pdf"])
+            for carpeta in parciales:
+                _hash_subidas.pop(carpeta.name, None)
+                mover_a_papelera(carpeta)
+            logger.info(
+                "Limpieza de proyectos",
+                extra={"proyectos": len(proyectos), "subidas_parciales": len(parciales)},
+            )
+        
+        return {
+            "status": "success",
+            "dry_run": data.dry_run,
+            "deleted": [p.name for p in proyectos],
+            "skipped": omitidos,
+            "partial_uploads_deleted": len(parciales),
+        }
+    except Exception as e:
+        raise HTTPException(500, f"Error limpiando proyectos: {str(e)}")
+
+def reanudar_borrados():
+    """Termina de liberar lo que quedó en la papelera antes de un reinicio"""
+    if PAPELERA_PATH.exists():
+        for path in PAPELERA_PATH.iterdir():
+            # <nombre>.<sufijo>; las subidas parciales no tienen filas indexadas
+            nombre = path.name.rsplit(".", 1)[0]
+            es_proyecto = not re.fullmatch(r"[0-9a-f]{32}", nombre)
+            encolar_borrado(path, nombre if es_proyecto else None)
+
+@app.get("/api/storage")
+async def get_storage_usage():
+    """Uso de disco total y por proyecto, con la cuota configurada"""
+    try:
+        # Recorrer el disco fuera del event loop
+        return await run_in_threadpool(uso_almacenamiento)
+    except Exception as e:
+        raise HTTPException(500, f"Error calculando uso de almacenamiento: {str(e)}")
+
+@app.post("/api/storage/enforce")
+async def enforce_storage_quota(quota_gb: Optional[float] = None):
+    """
+    Aplica la cuota ahora (o `quota_gb` para esta llamada) desalojando
+    artefactos regenerables de los proyectos usados hace más tiempo
+    """
+    # Una cuota de 0 desalojaría todos los artefactos regenerables
+    if quota_gb is not None and quota_gb <= 0:
+        raise HTTPException(400, "quota_gb debe ser mayor a 0")
+    try:
+        cuota = int(quota_gb * 2**30) if quota_gb is not None else None
+        return {"status": "success", **(await run_in_threadpool(aplicar_cuota, cuota))}
+    except Exception as e:
+        raise HTTPException(500, f"Error aplicando cuota: {str(e)}")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,85 @@
+"""
+Fixtures de las pruebas del backend
+
+main.py usa rutas relativas (storage/...), así que cada prueba corre en una
+carpeta temporal propia. pdf2image se reemplaza por un rasterizado con
+PyMuPDF para no depender de poppler.
+"""
+
+import importlib.util
+import io
+import sys
+from pathlib import Path
+
+import fitz
+import pytest
+from PIL import Image
+
+MAIN_PATH = Path(__file__).resolve().parent.parent / "main.py"
+
+
+def _convert_from_path(
+    pdf_path, dpi=150, fmt="jpeg", first_page=None, last_page=None,
+    output_folder=None, paths_only=False, **kwargs,
+):
+    """Sustituto de pdf2image.convert_from_path (72 DPI para que sea rápido)"""
+    paginas = []
+    with fitz.open(str(pdf_path)) as doc:
+        inicio = (first_page or 1) - 1
+        fin = last_page or doc.page_count
+        for i in range(inicio, fin):
+            pixmap = doc[i].get_pixmap(dpi=72)
+            imagen = Image.open(io.BytesIO(pixmap.tobytes("png"))).convert("RGB")
+            if paths_only:
+                ruta = Path(output_folder) / f"pagina-{i + 1:04d}.jpg"
+                imagen.save(ruta, "JPEG")
+                paginas.append(str(ruta))
+            else:
+                paginas.append(imagen)
+    return paginas
+
+
+def _pdfinfo_from_path(pdf_path, **kwargs):
+    with fitz.open(str(pdf_path)) as doc:
+        return {"Pages": doc.page_count}
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """Módulo main.py importado dentro de una carpeta de trabajo temporal"""
+    monkeypatch.chdir(tmp_path)
+    if "backend_main" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("backend_main", MAIN_PATH)
+        modulo = importlib.util.module_from_spec(spec)
+        sys.modules["backend_main"] = modulo
+        spec.loader.exec_module(modulo)
+    modulo = sys.modules["backend_main"]
+
+    for carpeta in (modulo.STORAGE_PATH, modulo.UPLOADS_PATH, modulo.PROJECTS_PATH):
+        carpeta.mkdir(exist_ok=True)
+    monkeypatch.setattr(modulo, "convert_from_path", _convert_from_path)
+    monkeypatch.setattr(modulo, "pdfinfo_from_path", _pdfinfo_from_path)
+    modulo._hash_subidas.clear()
+    monkeypatch.setattr(modulo, "current_project", None)
+    return modulo
+
+
+@pytest.fixture
+def client(backend):
+    from fastapi.testclient import TestClient
+
+    return TestClient(backend.app)
+
+
+def crear_pdf(textos):
+    """PDF en memoria con una página por texto"""
+    doc = fitz.open()
+    for texto in textos:
+        page = doc.new_page()
+        page.insert_text((72, 72), texto)
+    return doc.tobytes()
+
+
+@pytest.fixture
+def pdf_bytes():
+    return crear_pdf([f"pagina {i} " * 10 for i in range(3)])
@@ -0,0 +1,71 @@
+"""Borrado diferido de proyectos"""
+
+import sqlite3
+
+
+def crear_indice(backend, filas):
+    conn = sqlite3.connect(str(backend.BUSQUEDA_DB))
+    with conn:
+        conn.execute(
+            "CREATE TABLE filas (id INTEGER PRIMARY KEY, project TEXT, pagina TEXT, fila INTEGER, texto TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO filas(project, pagina, fila, texto) VALUES (?, 'img_001.jpg', 0, 'x')",
+            [(p,) for p in filas],
+        )
+    conn.close()
+
+
+def proyectos_indexados(backend):
+    conn = sqlite3.connect(str(backend.BUSQUEDA_DB))
+    try:
+        return sorted(p for (p,) in conn.execute("SELECT project FROM filas"))
+    finally:
+        conn.close()
+
+
+def test_borrar_proyecto_purga_busqueda(backend, client, pdf_bytes):
+    nombres = [
+        client.post("/api/upload", files={"file": ("a.pdf", pdf_bytes, "application/pdf")},
+                    params={"reutilizar": "false"}).json()["project"]
+        for _ in range(2)
+    ]
+    crear_indice(backend, nombres)
+
+    assert client.delete(f"/api/project/{nombres[0]}").status_code == 200
+    assert not (backend.PROJECTS_PATH / nombres[0]).exists()
+    backend._cola_borrado.join()
+
+    assert proyectos_indexados(backend) == [nombres[1]]
+    assert not any(backend.PAPELERA_PATH.iterdir())
+
+
+def test_purgar_sin_indice(backend):
+    assert backend.purgar_busqueda("proyecto_x") == 0
+
+
+def test_no_borra_proyectos_ocupados(backend, client):
+    procesando = backend.PROJECTS_PATH / "proyecto_procesando"
+    procesando.mkdir()
+    (procesando / "status.json").write_text('{"status": "processing"}')
+    activo = backend.PROJECTS_PATH / "proyecto_activo"
+    activo.mkdir()
+    backend.current_project = activo.name
+
+    for proyecto in (procesando, activo):
+        assert client.delete(f"/api/project/{proyecto.name}").status_code == 409
+        assert proyecto.exists()
+
+
+def test_al_arrancar_termina_los_borrados_pendientes(backend, pdf_bytes):
+    from fastapi.testclient import TestClient
+
+    pendiente = backend.PAPELERA_PATH / "proyecto_viejo.1a2b3c4d"
+    (pendiente / "proyecto_viejo").mkdir(parents=True)
+    crear_indice(backend, ["proyecto_viejo", "proyecto_vivo"])
+
+    with TestClient(backend.app):
+        backend._cola_borrado.join()
+
+    assert not pendiente.exists()
+    assert proyectos_indexados(backend) == ["proyecto_vivo"]
@@ -0,0 +1,53 @@
+"""Cuota de almacenamiento y desalojo de artefactos regenerables"""
+
+import os
+
+from conftest import crear_pdf
+
+
+def subir(client, textos):
+    respuesta = client.post(
+        "/api/upload", files={"file": ("doc.pdf", crear_pdf(textos), "application/pdf")}
+    )
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()["project"]
+
+
+def envejecer(backend, proyecto, segundos=3600):
+    marca = backend.PROJECTS_PATH / proyecto / backend.ULTIMO_ACCESO
+    marca.touch()
+    viejo = marca.stat().st_mtime - segundos
+    os.utime(marca, (viejo, viejo))
+
+
+def test_subida_desaloja_el_proyecto_mas_viejo(backend, client, monkeypatch):
+    viejo = subir(client, ["uno", "dos"])
+    envejecer(backend, viejo)
+
+    # Cuota mínima: todo lo regenerable fuera del proyecto nuevo se desaloja
+    monkeypatch.setattr(backend, "STORAGE_QUOTA_GB", 1e-9)
+    nuevo = subir(client, ["tres", "cuatro"])
+
+    assert not (backend.PROJECTS_PATH / viejo / "baja_calidad").exists()
+    assert (backend.PROJECTS_PATH / viejo / "originales").exists()
+    assert (backend.PROJECTS_PATH / nuevo / "baja_calidad").exists()
+
+
+def test_cuota_no_toca_proyectos_en_creacion(backend, monkeypatch):
+    proyecto = backend.PROJECTS_PATH / "proyecto_en_creacion"
+    (proyecto / "baja_calidad").mkdir(parents=True)
+    (proyecto / "baja_calidad" / "img_001.jpg").write_bytes(b"x" * 1024)
+
+    monkeypatch.setattr(backend, "_proyectos_en_creacion", {proyecto.name})
+    assert backend.aplicar_cuota(1)["evicted"] == []
+
+    monkeypatch.setattr(backend, "_proyectos_en_creacion", set())
+    assert [d["artefacto"] for d in backend.aplicar_cuota(1)["evicted"]] == ["baja_calidad"]
+
+
+def test_enforce_rechaza_cuota_no_positiva(backend, client):
+    (backend.PROJECTS_PATH / "p" / "baja_calidad").mkdir(parents=True)
+    for quota_gb in (0, -1):
+        respuesta = client.post("/api/storage/enforce", params={"quota_gb": quota_gb})
+        assert respuesta.status_code == 400
+    assert (backend.PROJECTS_PATH / "p" / "baja_calidad").exists()
@@ -0,0 +1,66 @@
+"""Huellas de página y reutilización de subidas repetidas"""
+
+import json
+
+import fitz
+
+from conftest import crear_pdf
+
+
+def subir(client, datos, **params):
+    respuesta = client.post(
+        "/api/upload", files={"file": ("doc.pdf", datos, "application/pdf")}, params=params
+    )
+    assert respuesta.status_code == 200, respuesta.text
+    return respuesta.json()
+
+
+def test_huella_depende_solo_de_la_pagina(backend, tmp_path):
+    a = tmp_path / "a.pdf"
+    b = tmp_path / "b.pdf"
+    a.write_bytes(crear_pdf(["uno", "dos", "tres"]))
+    b.write_bytes(crear_pdf(["uno", "DOS revisada", "tres", "cuatro"]))
+
+    huellas_a = backend.huellas_paginas(a)
+    huellas_b = backend.huellas_paginas(b)
+    assert len(set(huellas_a)) == 3
+    assert huellas_a[0] == huellas_b[0] and huellas_a[2] == huellas_b[2]
+    assert huellas_a[1] != huellas_b[1]
+
+
+def test_huella_cambia_con_la_rotacion(backend, tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(crear_pdf(["uno"]))
+    original = backend.huellas_paginas(path)
+
+    with fitz.open(str(path)) as doc:
+        doc[0].set_rotation(90)
+        doc.save(str(tmp_path / "girado.pdf"))
+    assert backend.huellas_paginas(tmp_path / "girado.pdf") != original
+
+
+def test_pdf_repetido_devuelve_el_proyecto_existente(backend, client):
+    datos = crear_pdf(["uno", "dos"])
+    primero = subir(client, datos)
+    segundo = subir(client, datos)
+
+    assert segundo["duplicate_of"] == primero["project"]
+    assert segundo["images"] == primero["images"]
+    assert len(list(backend.PROJECTS_PATH.iterdir())) == 1
+
+    tercero = subir(client, datos, reutilizar="false")
+    assert tercero["project"] != primero["project"]
+    assert "duplicate_of" not in tercero
+
+
+def test_paginas_identicas_se_enlazan(backend, client):
+    primero = subir(client, crear_pdf(["uno", "dos", "tres"]))
+    segundo = subir(client, crear_pdf(["uno", "DOS revisada", "tres", "cuatro"]))
+
+    assert segundo["reused_pages"] == 2
+    proyecto = backend.PROJECTS_PATH / segundo["project"]
+    huellas = json.loads((proyecto / backend.HUELLAS_JSON).read_text())
+    assert set(huellas["reutilizadas"]) == {"img_001.jpg", "img_003.jpg"}
+
+    original = backend.PROJECTS_PATH / primero["project"] / "originales" / "img_001.jpg"
+    assert (proyecto / "originales" / "img_001.jpg").read_bytes() == original.read_bytes()
@@ -0,0 +1,83 @@
+"""lines.json: PATCH parcial, versiones y diff"""
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def proyecto(backend):
+    nombre = "proyecto_lineas"
+    (backend.PROJECTS_PATH / nombre).mkdir()
+    return nombre
+
+
+def patch(client, proyecto, lines, **extra):
+    return client.patch(f"/api/project/{proyecto}/lines", json={"lines": lines, **extra})
+
+
+def test_patch_combina_y_borra_paginas(backend, client, proyecto):
+    r = patch(client, proyecto, {"img_001.jpg": [10, 20], "img_002.jpg": [30]}, line_gap=8)
+    assert r.json()["version"] == 1
+    assert r.json()["changed_pages"] == ["img_001.jpg", "img_002.jpg"]
+
+    r = patch(client, proyecto, {"img_002.jpg": None, "img_003.jpg": [5.5]})
+    assert r.json() == {
+        "status": "success",
+        "project": proyecto,
+        "version": 2,
+        "total_lines": 3,
+        "changed_pages": ["img_002.jpg", "img_003.jpg"],
+    }
+
+    actual = client.get(f"/api/project/{proyecto}/lines").json()
+    assert actual["lines"] == {"img_001.jpg": [10, 20], "img_003.jpg": [5.5]}
+    assert actual["line_gap"] == 8
+    assert actual["version"] == 2
+
+    # lines.json compacto, sin indentación
+    texto = (backend.PROJECTS_PATH / proyecto / "lines.json").read_text()
+    assert "\n" not in texto and json.loads(texto)["version"] == 2
+
+
+def test_patch_con_version_base_vieja(client, proyecto):
+    patch(client, proyecto, {"img_001.jpg": [10]})
+    assert patch(client, proyecto, {"img_001.jpg": [11]}, base_version=1).status_code == 200
+    assert patch(client, proyecto, {"img_001.jpg": [12]}, base_version=1).status_code == 409
+
+
+def test_versiones_y_diff(client, proyecto):
+    patch(client, proyecto, {"img_001.jpg": [10], "img_002.jpg": [20]})
+    patch(client, proyecto, {"img_002.jpg": [25]})
+    patch(client, proyecto, {"img_001.jpg": None})
+
+    versiones = client.get(f"/api/project/{proyecto}/lines/versions").json()
+    assert versiones["current_version"] == 3
+    assert [v["version"] for v in versiones["versions"]] == [3, 2, 1]
+    assert [v["origen"] for v in versiones["versions"]] == ["patch"] * 3
+
+    v2 = client.get(f"/api/project/{proyecto}/lines/versions/2").json()
+    assert v2["lines"] == {"img_001.jpg": [10], "img_002.jpg": [25]}
+
+    diff = client.get(f"/api/project/{proyecto}/lines/diff", params={"from_version": 1}).json()
+    assert diff["to_version"] == 3
+    assert diff["changed"] == {
+        "img_001.jpg": {"before": [10], "after": []},
+        "img_002.jpg": {"before": [20], "after": [25]},
+    }
+
+    diff = client.get(
+        f"/api/project/{proyecto}/lines/diff", params={"from_version": 0, "to_version": 1}
+    ).json()
+    assert diff["total_changed"] == 2
+
+
+def test_descarta_versiones_viejas(backend, client, proyecto, monkeypatch):
+    monkeypatch.setattr(backend, "LINES_VERSIONES_MAX", 2)
+    for x in range(4):
+        patch(client, proyecto, {"img_001.jpg": [x]})
+
+    versiones = client.get(f"/api/project/{proyecto}/lines/versions").json()
+    assert [v["version"] for v in versiones["versions"]] == [4, 3]
+    assert client.get(f"/api/project/{proyecto}/lines/versions/1").status_code == 404
+    assert client.get(f"/api/project/{proyecto}/lines/versions/3").json()["lines"] == {"img_001.jpg": [2]}
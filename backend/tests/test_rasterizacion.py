@@ -0,0 +1,45 @@
+"""Rasterización por rangos de páginas"""
+
+from conftest import crear_pdf
+
+
+def test_rangos_contiguos(backend):
+    assert backend.rangos_contiguos([]) == []
+    assert backend.rangos_contiguos([1, 2, 3, 7, 8, 10]) == [(1, 3), (7, 8), (10, 10)]
+
+
+def test_dividir_rangos(backend):
+    assert backend.dividir_rangos(list(range(1, 21))) == [(1, 8), (9, 16), (17, 20)]
+    assert backend.dividir_rangos([1, 2, 3, 5, 6], tamano=2) == [(1, 2), (3, 3), (5, 6)]
+    assert backend.dividir_rangos([4], tamano=8) == [(4, 4)]
+
+
+def test_workers_respeta_el_maximo(backend, monkeypatch):
+    monkeypatch.setattr(backend, "MAX_WORKERS_RASTER", 3)
+    assert backend.workers_rasterizacion(10) == 3
+    assert backend.workers_rasterizacion(2) == 2
+
+
+def test_subida_en_varios_rangos(backend, client, monkeypatch):
+    dividir_rangos = backend.dividir_rangos
+    rangos = []
+
+    def dividir_en_pares(paginas):
+        rangos.extend(dividir_rangos(paginas, tamano=2))
+        return rangos
+
+    monkeypatch.setattr(backend, "dividir_rangos", dividir_en_pares)
+    monkeypatch.setattr(backend, "MAX_WORKERS_RASTER", 2)
+    datos = crear_pdf([f"pagina {i}" for i in range(5)])
+
+    respuesta = client.post(
+        "/api/upload", files={"file": ("doc.pdf", datos, "application/pdf")}
+    ).json()
+
+    assert rangos == [(1, 2), (3, 4), (5, 5)]
+    assert respuesta["images"] == [f"img_{i:03d}.jpg" for i in range(1, 6)]
+    proyecto = backend.PROJECTS_PATH / respuesta["project"]
+    for carpeta in ("originales", "baja_calidad"):
+        assert sorted(p.name for p in (proyecto / carpeta).glob("*.jpg")) == respuesta["images"]
+    # Sin carpetas temporales de los rangos
+    assert not list((proyecto / "originales").glob(".rango_*"))
@@ -0,0 +1,97 @@
+"""Subidas por partes: hash incremental, reenvío de chunks y reanudación"""
+
+import hashlib
+
+
+def iniciar(client, datos, chunk_size):
+    respuesta = client.post(
+        "/api/upload/init",
+        json={"filename": "doc.pdf", "size": len(datos), "chunk_size": chunk_size},
+    )
+    assert respuesta.status_code == 200
+    return respuesta.json()
+
+
+def partes(datos, chunk_size):
+    return [datos[i:i + chunk_size] for i in range(0, len(datos), chunk_size)]
+
+
+def enviar(client, upload_id, index, contenido, **headers):
+    return client.put(f"/api/upload/{upload_id}/chunk/{index}", content=contenido, headers=headers)
+
+
+def test_hash_en_orden_y_desordenado(backend, client, pdf_bytes):
+    chunk_size = 512
+    for orden in ("directo", "inverso"):
+        meta = iniciar(client, pdf_bytes, chunk_size)
+        trozos = list(enumerate(partes(pdf_bytes, chunk_size)))
+        if orden == "inverso":
+            trozos.reverse()
+
+        for index, contenido in trozos:
+            assert enviar(client, meta["upload_id"], index, contenido).status_code == 200
+
+        hasher, siguiente = backend._hash_subidas[meta["upload_id"]]
+        assert siguiente == meta["total_chunks"]
+        assert hasher.hexdigest() == hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def test_reenviar_chunk_hasheado_reconstruye_el_hash(backend, client, pdf_bytes):
+    chunk_size = 512
+    trozos = partes(pdf_bytes, chunk_size)
+    meta = iniciar(client, pdf_bytes, chunk_size)
+    upload_id = meta["upload_id"]
+
+    # El chunk 0 llega corrupto y entra al hash antes de que se reenvíe
+    enviar(client, upload_id, 0, b"\0" * len(trozos[0]))
+    enviar(client, upload_id, 1, trozos[1])
+    assert backend._hash_subidas[upload_id][1] == 2
+
+    enviar(client, upload_id, 0, trozos[0])
+    for index in range(2, len(trozos)):
+        enviar(client, upload_id, index, trozos[index])
+
+    sha256 = hashlib.sha256(pdf_bytes).hexdigest()
+    assert backend._hash_subidas[upload_id][0].hexdigest() == sha256
+    respuesta = client.post(f"/api/upload/{upload_id}/complete", json={"sha256": sha256})
+    assert respuesta.status_code == 200, respuesta.text
+
+
+def test_reanudar_tras_reinicio(backend, client, pdf_bytes):
+    chunk_size = 512
+    trozos = partes(pdf_bytes, chunk_size)
+    meta = iniciar(client, pdf_bytes, chunk_size)
+    upload_id = meta["upload_id"]
+
+    for index in range(0, len(trozos), 2):
+        enviar(client, upload_id, index, trozos[index])
+
+    # Reinicio del servicio: el hash en memoria se pierde
+    backend._hash_subidas.clear()
+    estado = client.get(f"/api/upload/{upload_id}").json()
+    assert estado["missing"] == list(range(1, len(trozos), 2))
+
+    for index in estado["missing"]:
+        enviar(client, upload_id, index, trozos[index])
+
+    respuesta = client.post(
+        f"/api/upload/{upload_id}/complete",
+        json={"sha256": hashlib.sha256(pdf_bytes).hexdigest()},
+    )
+    assert respuesta.status_code == 200, respuesta.text
+    assert len(respuesta.json()["images"]) == 3
+
+
+def test_chunk_con_hash_incorrecto(client, pdf_bytes):
+    meta = iniciar(client, pdf_bytes, 512)
+    respuesta = enviar(client, meta["upload_id"], 0, pdf_bytes[:512], **{"X-Chunk-Sha256": "0" * 64})
+    assert respuesta.status_code == 400
+
+    estado = client.get(f"/api/upload/{meta['upload_id']}").json()
+    assert 0 in estado["missing"]
+
+
+def test_completar_con_chunks_faltantes(client, pdf_bytes):
+    meta = iniciar(client, pdf_bytes, 512)
+    enviar(client, meta["upload_id"], 0, pdf_bytes[:512])
+    assert client.post(f"/api/upload/{meta['upload_id']}/complete").status_code == 409
@@ -0,0 +1,171 @@
+"""
+Benchmark de agrupación en filas (fija vs adaptativa)
+
+Toma cajas OCR ya grabadas (ocr_tokens/ u ocr_grabado/ de un proyecto, o
+la verdad de páginas sintéticas), las deforma como lo haría una página
+escaneada inclinada o a otra escala y mide, para cada modo de agrupación,
+cuántas filas de la referencia se reconstruyen exactamente y cuánto tarda.
+
+La referencia es la agrupación fija con `line_gap` 6.5 sobre las cajas sin
+deformar (lo que hoy produce el pipeline en páginas limpias).
+
+Uso:
+    python benchmarks/bench_agrupacion.py \\
+        --proyecto /app/storage/projects/proyecto_20251201_053528 --salida agrupacion.json
+    python benchmarks/bench_agrupacion.py --sinteticas 20 --filas 40
+"""
+
+import argparse
+import json
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "paddle" / "app"))
+
+import sintetico  # noqa: E402
+from ocr_engines import MotorMemoria  # noqa: E402
+from ocr_processor import OCRProcessor  # noqa: E402
+from sugerencia_lineas import cajas_proyecto  # noqa: E402
+
+# (nombre, inclinación en grados, escala)
+DEFORMACIONES = (
+    ("original", 0.0, 1.0),
+    ("escala_x0.6", 0.0, 0.6),
+    ("escala_x2", 0.0, 2.0),
+    ("inclinada_0.3", 0.3, 1.0),
+    ("inclinada_0.8", 0.8, 1.0),
+    ("inclinada_0.5_x2", 0.5, 2.0),
+)
+
+
+def _lista_numeros(texto, tipo):
+    return [tipo(v) for v in texto.split(",") if v.strip()] if texto else []
+
+
+def cargar_paginas(args):
+    """{imagen: boxes (N, 4)} desde un proyecto o páginas sintéticas"""
+    if args.proyecto:
+        fuente, cajas = cajas_proyecto(Path(args.proyecto), args.fuente)
+        print(f"Cajas de '{fuente}': {len(cajas)} páginas")
+        return {k: np.asarray(v, dtype=np.float64).reshape(-1, 4) for k, v in cajas.items()}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generado = sintetico.generar_pdf(
+            Path(tmp) / "agrupacion.pdf",
+            paginas=args.sinteticas,
+            filas_por_pagina=args.filas,
+            semilla=args.semilla,
+        )
+    return {
+        nombre: np.asarray(verdad["rec_boxes"], dtype=np.float64)
+        for nombre, verdad in generado["verdad"].items()
+    }
+
+
+def deformar(boxes, grados: float, escala: float):
+    """Gira los centros de las cajas alrededor del centro de la página y escala todo"""
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    mx, my = cx.mean(), cy.mean()
+    ang = math.radians(grados)
+    nx = mx + (cx - mx) * math.cos(ang) - (cy - my) * math.sin(ang)
+    ny = my + (cx - mx) * math.sin(ang) + (cy - my) * math.cos(ang)
+
+    medio_w = (boxes[:, 2] - boxes[:, 0]) / 2
+    medio_h = (boxes[:, 3] - boxes[:, 1]) / 2
+    return np.stack([nx - medio_w, ny - medio_h, nx + medio_w, ny + medio_h], axis=1) * escala
+
+
+def tokens(boxes):
+    """Formato que recibe OCRProcessor._agrupar_lineas (con índice para comparar)"""
+    return [
+        {"text": str(i), "x": b[0], "y": b[1], "x2": b[2], "y2": b[3], "i": i}
+        for i, b in enumerate(boxes.tolist())
+    ]
+
+
+def filas(processor, boxes):
+    """Filas como conjuntos de índices de token"""
+    return {frozenset(t["i"] for t in linea) for linea in processor._agrupar_lineas(tokens(boxes))}
+
+
+def correr(paginas, modos, repeticiones: int):
+    """Exactitud y tiempo por modo y deformación"""
+    referencia_proc = OCRProcessor(motor_ocr=MotorMemoria({}), line_gap=6.5)
+    referencias = {nombre: filas(referencia_proc, boxes) for nombre, boxes in paginas.items()}
+
+    resultados = []
+    for nombre_def, grados, escala in DEFORMACIONES:
+        deformadas = {n: deformar(b, grados, escala) for n, b in paginas.items()}
+        for nombre_modo, processor in modos:
+            exactas = total = filas_modo = 0
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                for nombre, boxes in deformadas.items():
+                    obtenidas = filas(processor, boxes)
+                    exactas += len(referencias[nombre] & obtenidas)
+                    total += len(referencias[nombre])
+                    filas_modo += len(obtenidas)
+            segundos = time.perf_counter() - inicio
+            paginas_totales = len(deformadas) * repeticiones
+
+            resultados.append(
+                {
+                    "deformacion": nombre_def,
+                    "modo": nombre_modo,
+                    "filas_exactas": round(exactas / max(total, 1), 4),
+                    "filas_por_pagina": round(filas_modo / max(paginas_totales, 1), 1),
+                    "filas_referencia": round(total / max(paginas_totales, 1), 1),
+                    "ms_por_pagina": round(1000 * segundos / max(paginas_totales, 1), 3),
+                }
+            )
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--proyecto", help="Proyecto con ocr_tokens/ u ocr_grabado/")
+    parser.add_argument("--fuente", default="auto", help="ocr_tokens, ocr_grabado o auto")
+    parser.add_argument("--sinteticas", type=int, default=10, help="Páginas sintéticas si no hay --proyecto")
+    parser.add_argument("--filas", type=int, default=40)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--line-gaps", default="6.5", help="line_gap a probar en modo fijo, separados por coma")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    paginas = cargar_paginas(args)
+    motor = MotorMemoria({})
+    modos = [
+        (f"fija_{gap}", OCRProcessor(motor_ocr=motor, line_gap=gap))
+        for gap in _lista_numeros(args.line_gaps, float)
+    ]
+    modos.append(("adaptativa", OCRProcessor(motor_ocr=motor, agrupacion="adaptativa")))
+
+    resultados = correr(paginas, modos, args.repeticiones)
+
+    print(f"\n{'deformación':<18} {'modo':<12} {'exactas':>8} {'filas':>7} {'ref':>7} {'ms/pág':>8}")
+    for r in resultados:
+        print(
+            f"{r['deformacion']:<18} {r['modo']:<12} {r['filas_exactas']:>8.2%} "
+            f"{r['filas_por_pagina']:>7} {r['filas_referencia']:>7} {r['ms_por_pagina']:>8}"
+        )
+
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(
+                {"paginas": len(paginas), "resultados": resultados},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Benchmark de punta a punta: upload → líneas → OCR → Excel
+
+Genera PDFs sintéticos (ver sintetico.py), los sube con
+backend/main.py::upload_pdf, exporta sus líneas, los procesa con
+OCRProcessor y arma el Excel con procesar_excel_completo. Con el motor
+"stub" el OCR devuelve la verdad del generador, así que no hace falta
+PaddleOCR ni GPU.
+
+Reporta páginas/seg, percentiles de latencia por etapa y RSS pico, y
+guarda el resultado en JSON para comparar corridas.
+
+Uso:
+    python benchmarks/bench_pipeline.py --paginas 50 --filas 40 \\
+        --salida bench_pipeline.json --comparar bench_anterior.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "paddle" / "app"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from ocr_engines import MotorMemoria  # noqa: E402
+from ocr_processor import OCRProcessor  # noqa: E402
+import sintetico  # noqa: E402
+
+
+class MotorStub(MotorMemoria):
+    """
+    Motor OCR falso: devuelve la verdad del PDF sintético por nombre de
+    imagen y mide el tiempo de cada llamada
+    """
+
+    def __init__(self, verdad: dict, latencia_ms: float = 0):
+        super().__init__(verdad, faltantes="vacio", latencia_ms=latencia_ms)
+        self.tiempos = []
+
+    def ocr(self, entrada):
+        inicio = time.perf_counter()
+        resultado = super().ocr(entrada)
+        self.tiempos.append(time.perf_counter() - inicio)
+        return resultado
+
+
+def _rss_pico_mb():
+    """RSS pico (MB) del proceso y de sus hijos (pool de upload, pdftoppm)"""
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return {"proceso": round(propio, 1), "hijos": round(hijos, 1)}
+
+
+def _resumen(tiempos):
+    """Percentiles (ms) de una lista de tiempos en segundos"""
+    if not tiempos:
+        return None
+    ms = np.asarray(tiempos) * 1000
+    return {
+        "n": len(ms),
+        "media_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "total_s": round(float(ms.sum()) / 1000, 3),
+    }
+
+
+def _cargar_backend(workdir: Path):
+    """Importa backend/main.py con su almacenamiento dentro de `workdir`"""
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "backend_main", RAIZ / "backend" / "main.py"
+        )
+        modulo = importlib.util.module_from_spec(spec)
+        # Registrado para que el pool de procesos pueda importar rasterizar_rango
+        sys.modules["backend_main"] = modulo
+        spec.loader.exec_module(modulo)
+    finally:
+        os.chdir(cwd)
+
+    modulo.STORAGE_PATH = workdir / "storage"
+    modulo.UPLOADS_PATH = modulo.STORAGE_PATH / "uploads"
+    modulo.PROJECTS_PATH = modulo.STORAGE_PATH / "projects"
+    return modulo
+
+
+def correr_pipeline(args, workdir: Path, backend, repeticion: int):
+    """Ejecuta una vez el pipeline completo y devuelve tiempos por etapa"""
+    tiempos = {}
+    pdf_path = workdir / f"sintetico_{repeticion}.pdf"
+
+    if args.omitir_upload:
+        project_path = workdir / "storage" / "projects" / f"bench_{repeticion}"
+        generado = sintetico.generar_pdf(
+            pdf_path,
+            paginas=args.paginas,
+            filas_por_pagina=args.filas,
+            semilla=repeticion,
+            carpeta_imagenes=project_path / "originales",
+        )
+    else:
+        generado = sintetico.generar_pdf(
+            pdf_path,
+            paginas=args.paginas,
+            filas_por_pagina=args.filas,
+            semilla=repeticion,
+        )
+
+        # Etapa 1: upload (rasterización + originales + baja calidad)
+        from fastapi import UploadFile
+
+        inicio = time.perf_counter()
+        with open(pdf_path, "rb") as f:
+            respuesta = asyncio.run(
+                backend.upload_pdf(UploadFile(f, filename="sintetico.pdf"))
+            )
+        tiempos["upload"] = [time.perf_counter() - inicio]
+        project_path = backend.PROJECTS_PATH / respuesta["project"]
+
+        # Etapa 2: exportar líneas
+        inicio = time.perf_counter()
+        asyncio.run(
+            backend.export_lines(
+                backend.LinesData(lines=generado["lines"], line_gap=args.line_gap)
+            )
+        )
+        tiempos["lines"] = [time.perf_counter() - inicio]
+
+    # Etapa 3: OCR + layout por página
+    motor = MotorStub(generado["verdad"], latencia_ms=args.latencia_ms)
+    processor = OCRProcessor(line_gap=args.line_gap, motor_ocr=motor)
+    tiempos["ocr_pagina"] = []
+    dfs = []
+    for filename, lineas in generado["lines"].items():
+        inicio = time.perf_counter()
+        result = processor.procesar_imagen(
+            str(project_path / "originales" / filename), lineas
+        )
+        tiempos["ocr_pagina"].append(time.perf_counter() - inicio)
+        if result.success:
+            dfs.append(result.df)
+    tiempos["inferencia"] = list(motor.tiempos)
+    tiempos["layout"] = [
+        total - inferencia
+        for total, inferencia in zip(tiempos["ocr_pagina"], motor.tiempos)
+    ]
+
+    # Etapa 4: Excel con marca / modelo / año / versión
+    inicio = time.perf_counter()
+    processor.procesar_excel_completo(
+        input_df=pd.concat(dfs, ignore_index=True),
+        json_path=str(sintetico.DATA_JSON),
+        output_path=str(project_path / "resultado.xlsx"),
+    )
+    tiempos["excel"] = [time.perf_counter() - inicio]
+
+    if not args.conservar:
+        shutil.rmtree(project_path, ignore_errors=True)
+        pdf_path.unlink(missing_ok=True)
+
+    return tiempos, len(dfs)
+
+
+def comparar(actual: dict, anterior_path: str):
+    """Imprime la variación de p50 por etapa contra una corrida anterior"""
+    with open(anterior_path) as f:
+        anterior = json.load(f)
+
+    print(f"\n📊 Comparación contra {anterior_path}")
+    for etapa, resumen in actual["etapas"].items():
+        previo = anterior.get("etapas", {}).get(etapa)
+        if not resumen or not previo:
+            continue
+        cambio = (resumen["p50_ms"] / previo["p50_ms"] - 1) * 100 if previo["p50_ms"] else 0
+        print(
+            f"  {etapa:<12} p50 {previo['p50_ms']:>10.3f} → {resumen['p50_ms']:>10.3f} ms ({cambio:+.1f}%)"
+        )
+    for clave in ("pipeline", "ocr"):
+        previo = anterior.get("paginas_por_segundo", {}).get(clave)
+        nuevo = actual["paginas_por_segundo"].get(clave)
+        if previo and nuevo:
+            print(f"  páginas/seg {clave:<8} {previo:>10.2f} → {nuevo:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--filas", type=int, default=40, help="Filas por página")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--line-gap", type=float, default=6.5)
+    parser.add_argument(
+        "--latencia-ms", type=float, default=0, help="Latencia simulada del OCR stub"
+    )
+    parser.add_argument(
+        "--omitir-upload",
+        action="store_true",
+        help="No rasterizar con el backend (escribe las imágenes directo)",
+    )
+    parser.add_argument("--conservar", action="store_true", help="No borrar proyectos")
+    parser.add_argument("--workdir", default=None, help="Directorio de trabajo")
+    parser.add_argument("--salida", default="bench_pipeline.json")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="bench_ocr_"))
+    (workdir / "storage" / "uploads").mkdir(parents=True, exist_ok=True)
+    (workdir / "storage" / "projects").mkdir(parents=True, exist_ok=True)
+    backend = None if args.omitir_upload else _cargar_backend(workdir)
+
+    etapas = {}
+    paginas_total = 0
+    inicio = time.perf_counter()
+    for repeticion in range(args.repeticiones):
+        tiempos, paginas = correr_pipeline(args, workdir, backend, repeticion)
+        paginas_total += paginas
+        for etapa, valores in tiempos.items():
+            etapas.setdefault(etapa, []).extend(valores)
+    duracion = time.perf_counter() - inicio
+
+    ocr_total = sum(etapas["ocr_pagina"])
+    resultado = {
+        "fecha": datetime.now().isoformat(),
+        "config": vars(args),
+        "paginas": paginas_total,
+        "duracion_s": round(duracion, 3),
+        "paginas_por_segundo": {
+            "pipeline": round(paginas_total / duracion, 2),
+            "ocr": round(paginas_total / ocr_total, 2) if ocr_total else None,
+        },
+        "etapas": {etapa: _resumen(valores) for etapa, valores in etapas.items()},
+        "rss_pico_mb": _rss_pico_mb(),
+    }
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    with open(args.salida, "w") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"✅ Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        comparar(resultado, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark de resolución para OCRProcessor
+
+Procesa una muestra de páginas de un proyecto a varias resoluciones y
+reporta tiempo por página y precisión contra la corrida a resolución
+completa (celdas (columna, texto) que coinciden por página).
+
+Uso (dentro del contenedor de Paddle):
+    python benchmarks/bench_resolucion.py \\
+        --proyecto /app/storage/projects/proyecto_20251201_053528 \\
+        --max-lados 2000,1600,1200 --dpis 120,100 --muestra 20
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "paddle" / "app"))
+
+from ocr_processor import OCRProcessor  # noqa: E402
+
+
+def _celdas(df):
+    """Multiconjunto de (columna, texto) no vacíos de un DataFrame"""
+    if df is None:
+        return Counter()
+    celdas = Counter()
+    for col in df.columns:
+        for valor in df[col]:
+            if isinstance(valor, str) and valor.strip():
+                celdas[(col, valor.strip())] += 1
+    return celdas
+
+
+def _lista_numeros(texto, tipo):
+    return [tipo(v) for v in texto.split(",") if v.strip()] if texto else []
+
+
+def correr(processor, paginas, config):
+    """Procesa las páginas con la configuración dada y mide tiempos"""
+    processor.max_lado = config.get("max_lado")
+    processor.dpi_objetivo = config.get("dpi_objetivo")
+    processor.altura_texto_objetivo = config.get("altura_texto_objetivo")
+    processor._altura_texto_estimada = None
+
+    tiempos = []
+    dfs = {}
+    for img_path, lineas in paginas:
+        inicio = time.perf_counter()
+        result = processor.procesar_imagen(str(img_path), lineas)
+        tiempos.append(time.perf_counter() - inicio)
+        dfs[img_path.name] = result.df if result.success else None
+    return tiempos, dfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--proyecto", required=True, help="Carpeta del proyecto")
+    parser.add_argument("--json", default="lines.json", help="JSON de líneas")
+    parser.add_argument("--max-lados", default="", help="Ej. 2000,1600,1200")
+    parser.add_argument("--dpis", default="", help="Ej. 120,100")
+    parser.add_argument("--alturas-texto", default="", help="Ej. 24,18")
+    parser.add_argument("--muestra", type=int, default=20, help="Páginas a usar")
+    parser.add_argument("--perfil", default=None, help="Perfil de motor OCR")
+    parser.add_argument("--salida", default="bench_resolucion.json")
+    args = parser.parse_args()
+
+    proyecto = Path(args.proyecto)
+    with open(proyecto / args.json) as f:
+        data = json.load(f)
+
+    paginas = [
+        (proyecto / "originales" / nombre, sorted(lineas))
+        for nombre, lineas in data.get("lines", {}).items()
+        if lineas and (proyecto / "originales" / nombre).exists()
+    ][: args.muestra]
+    if not paginas:
+        sys.exit("No hay páginas con líneas para el benchmark")
+
+    configs = [{}]
+    configs += [{"max_lado": v} for v in _lista_numeros(args.max_lados, int)]
+    configs += [{"dpi_objetivo": v} for v in _lista_numeros(args.dpis, float)]
+    configs += [
+        {"altura_texto_objetivo": v}
+        for v in _lista_numeros(args.alturas_texto, float)
+    ]
+
+    processor = OCRProcessor(line_gap=data.get("line_gap", 6.5), perfil=args.perfil)
+
+    # Calentar modelo para no medir la inicialización
+    processor.procesar_imagen(str(paginas[0][0]), paginas[0][1])
+
+    resultados = []
+    referencia = None
+    for config in configs:
+        tiempos, dfs = correr(processor, paginas, config)
+
+        if referencia is None:
+            referencia = {nombre: _celdas(df) for nombre, df in dfs.items()}
+
+        total_ref = sum(sum(c.values()) for c in referencia.values())
+        coincidencias = sum(
+            sum((referencia[nombre] & _celdas(df)).values())
+            for nombre, df in dfs.items()
+        )
+
+        resultados.append(
+            {
+                "config": config or {"resolucion": "completa"},
+                "paginas": len(tiempos),
+                "segundos_total": round(sum(tiempos), 3),
+                "segundos_por_pagina": round(sum(tiempos) / len(tiempos), 3),
+                "precision": round(coincidencias / total_ref, 4) if total_ref else None,
+            }
+        )
+        print(json.dumps(resultados[-1], ensure_ascii=False))
+
+    with open(args.salida, "w") as f:
+        json.dump(
+            {
+                "proyecto": proyecto.name,
+                "perfil": processor.perfil,
+                "resultados": resultados,
+            },
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+    print(f"✅ Resultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
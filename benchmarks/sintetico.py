@@ -0,0 +1,133 @@
+"""
+Generador de listas de precios sintéticas
+
+Crea PDFs con tablas de marca / modelo / año-versión / precios a partir
+de paddle/app/data.json, junto con la "verdad" del OCR por página
+(rec_texts / rec_boxes en el espacio de 150 DPI que usa lines.json) y
+los cortes de columna correspondientes.
+"""
+
+import json
+import random
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+DPI = 150
+ANCHO_PAGINA = int(8.5 * DPI)
+ALTO_PAGINA = int(11 * DPI)
+MARGEN_SUPERIOR = 120
+
+# X de inicio de cada columna y cortes entre columnas (px a 150 DPI)
+COLUMNAS_X = [60, 320, 820, 1000]
+CORTES = [290, 790, 970]
+
+VERSIONES = ["5p Sport", "4p Advance", "5p Touring TA", "Limited CVT", "Base MT"]
+
+DATA_JSON = Path(__file__).resolve().parent.parent / "paddle" / "app" / "data.json"
+
+
+def _fuente(tamano):
+    try:
+        return ImageFont.load_default(size=tamano)
+    except TypeError:
+        # Pillow < 10.1 no acepta tamaño en la fuente por defecto
+        return ImageFont.load_default()
+
+
+def _cargar_marcas(data_json=DATA_JSON):
+    with open(data_json, encoding="utf-8") as f:
+        rows = json.load(f)["rows"]
+
+    modelos_por_marca = {}
+    for row in rows:
+        modelos_por_marca.setdefault(row["marca"].upper(), []).append(
+            row["modelo"].upper()
+        )
+    return modelos_por_marca
+
+
+def _filas_tabla(modelos_por_marca, total_filas, rng):
+    """Genera filas (col0, col1, col2, col3) con encabezados de marca/modelo"""
+    marcas = sorted(modelos_por_marca)
+    filas = []
+    while len(filas) < total_filas:
+        marca = rng.choice(marcas)
+        filas.append((marca, "", "", ""))
+        for modelo in rng.sample(
+            modelos_por_marca[marca], min(3, len(modelos_por_marca[marca]))
+        ):
+            filas.append((modelo, "", "", ""))
+            for anio in range(2024, 2024 - rng.randint(2, 4), -1):
+                venta = rng.randint(150, 900) * 1000
+                filas.append(
+                    (
+                        "",
+                        f"{anio} {rng.choice(VERSIONES)}",
+                        f"{venta:,}",
+                        f"{int(venta * 0.8):,} {int(venta * 0.75):,}",
+                    )
+                )
+    return filas[:total_filas]
+
+
+def generar_pdf(
+    salida, paginas=10, filas_por_pagina=40, semilla=0, carpeta_imagenes=None
+):
+    """
+    Genera un PDF sintético y su verdad de OCR
+
+    Las páginas se agregan al PDF una por una para no tener todo el
+    documento en memoria.
+
+    Args:
+        salida: Ruta del PDF a crear
+        paginas: Número de páginas
+        filas_por_pagina: Densidad de la tabla
+        semilla: Semilla aleatoria (mismo valor = mismo PDF)
+        carpeta_imagenes: Si se indica, guarda también cada página como JPEG
+
+    Returns:
+        dict {"verdad": {img_XXX.jpg: {rec_texts, rec_boxes}},
+              "lines": {img_XXX.jpg: CORTES}}
+    """
+    rng = random.Random(semilla)
+    modelos_por_marca = _cargar_marcas()
+    fuente = _fuente(18)
+    alto_fila = max(24, (ALTO_PAGINA - 2 * MARGEN_SUPERIOR) // filas_por_pagina)
+
+    salida = Path(salida)
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    if carpeta_imagenes:
+        Path(carpeta_imagenes).mkdir(parents=True, exist_ok=True)
+
+    verdad = {}
+    lines = {}
+    for num in range(1, paginas + 1):
+        img = Image.new("L", (ANCHO_PAGINA, ALTO_PAGINA), "white")
+        draw = ImageDraw.Draw(img)
+        titulo = f"Lista de Precios - Hoja {num}"
+        draw.text((60, 40), titulo, fill="black", font=fuente)
+
+        textos = [titulo]
+        cajas = [list(draw.textbbox((60, 40), titulo, font=fuente))]
+        filas = _filas_tabla(modelos_por_marca, filas_por_pagina, rng)
+        for i, fila in enumerate(filas):
+            y = MARGEN_SUPERIOR + i * alto_fila
+            for x, texto in zip(COLUMNAS_X, fila):
+                if not texto:
+                    continue
+                draw.text((x, y), texto, fill="black", font=fuente)
+                textos.append(texto)
+                cajas.append(list(draw.textbbox((x, y), texto, font=fuente)))
+
+        nombre = f"img_{num:03d}.jpg"
+        verdad[nombre] = {"rec_texts": textos, "rec_boxes": cajas}
+        lines[nombre] = list(CORTES)
+
+        img.save(salida, "PDF", resolution=DPI, append=num > 1)
+        if carpeta_imagenes:
+            img.convert("RGB").save(Path(carpeta_imagenes) / nombre, "JPEG", quality=98)
+        img.close()
+
+    return {"verdad": verdad, "lines": lines}
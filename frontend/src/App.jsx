@@ -14,7 +14,17 @@ function App() {
   const [filterActive, setFilterActive] = useState(false);
   const [processingStatus, setProcessingStatus] = useState(null);
   const [processingProgress, setProcessingProgress] = useState(0);
-  const { lines, exportJSON, loadLines, setImages: setStoreImages } = useLinesStore();
+  const {
+    lines,
+    linesVersion,
+    exportJSON,
+    loadLines,
+    markSaved,
+    changedLines,
+    loadOverlay,
+    loadGroups,
+    setImages: setStoreImages,
+  } = useLinesStore();
 
   useEffect(() => {
     let isMounted = true;
@@ -90,7 +100,9 @@ function App() {
 
       console.log('Datos cargados:', { projectImages, projectLines, linesToLoad });
 
-      loadLines(linesToLoad);
+      loadLines(linesToLoad, projectLines.version || 0);
+      loadDetection(data.project);
+      loadLayoutGroups(data.project);
       
       setLoading(false);
       console.log(`✓ Proyecto '${data.project}' cargado con ${projectImages.length} imágenes y ${Object.keys(linesToLoad).length} imágenes con líneas`);
@@ -100,12 +112,63 @@ function App() {
     }
   };
 
+  // Carga las cajas de detección (vista previa); si start=true y no existen, la inicia
+  const loadDetection = async (project, start = false) => {
+    loadOverlay({});
+    try {
+      let response = await fetch(getPaddleURL(`/api/project/${project}/detection`));
+
+      if (response.status === 404 && start) {
+        await fetch(getPaddleURL(`/api/project/${project}/detect`), { method: 'POST' });
+        response = await fetch(getPaddleURL(`/api/project/${project}/detection`));
+      }
+
+      for (let intento = 0; response.ok && intento < 150; intento++) {
+        const data = await response.json();
+        if (data.imagenes) {
+          loadOverlay(data.imagenes);
+          return;
+        }
+        if (data.status === 'error') {
+          console.warn('Detección con error:', data.error_message);
+          return;
+        }
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        response = await fetch(getPaddleURL(`/api/project/${project}/detection`));
+      }
+    } catch (error) {
+      console.warn('Vista previa de detección no disponible:', error);
+    }
+  };
+
+  // Grupos de páginas con el mismo layout (para "Replicar en grupo")
+  const loadLayoutGroups = async (project) => {
+    loadGroups({});
+    try {
+      const response = await fetch(getPaddleURL(`/api/project/${project}/layout-groups`));
+      if (!response.ok) return;
+      const data = await response.json();
+      loadGroups(data.pagina_grupo || {});
+      console.log(`✓ ${data.total_grupos} grupos de layout en ${data.total_paginas} páginas`);
+    } catch (error) {
+      console.warn('Grupos de layout no disponibles:', error);
+    }
+  };
+
   const handleUploadSuccess = (data) => {
+    // PDF ya subido: se abre el proyecto existente con sus líneas guardadas
+    if (data.duplicate_of) {
+      loadProject(data.project);
+      return;
+    }
+
     setImages(data.images);
     setFilteredImages(data.images);
     setProjectName(data.project);
     setStoreImages(data.images);
     loadLines({});
+    loadDetection(data.project, true);
+    loadLayoutGroups(data.project);
   };
 
   const handleFilter = (filtered) => {
@@ -127,22 +190,32 @@ function App() {
     }
 
     try {
-      const response = await fetch(getBackendURL('/api/export-lines'), {
-        method: 'POST',
+      // Solo las páginas que cambiaron desde el último guardado
+      const changed = changedLines();
+      const snapshot = lines;
+
+      const response = await fetch(getBackendURL(`/api/project/${projectName}/lines`), {
+        method: 'PATCH',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
-          lines: lines,
-          line_gap: 6.5
+          lines: changed,
+          line_gap: 6.5,
+          base_version: linesVersion
         })
       });
 
+      if (response.status === 409) {
+        alert('⚠️ Las líneas se guardaron desde otra ventana. Recarga el proyecto antes de guardar.');
+        return;
+      }
       if (!response.ok) {
         throw new Error(`Error exportando: ${response.statusText}`);
       }
 
       const data = await response.json();
+      markSaved(snapshot, data.version);
       console.log('Líneas exportadas:', data);
-      alert(`✅ Líneas exportadas correctamente\nTotal: ${data.total_lines} líneas`);
+      alert(`✅ Líneas exportadas correctamente (versión ${data.version})\nTotal: ${data.total_lines} líneas, ${data.changed_pages.length} páginas cambiadas`);
     } catch (error) {
       console.error('Error al exportar:', error);
       alert(`❌ Error exportando líneas: ${error.message}`);
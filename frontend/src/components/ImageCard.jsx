@@ -10,13 +10,19 @@ function ImageCard({ filename }) {
   const [dragLineIndex, setDragLineIndex] = useState(null);
   
   const imageLines = useLinesStore((state) => state.lines[filename]) || [];
-  const { addLine, removeLine, updateLine, replicateLines } = useLinesStore();
+  const overlay = useLinesStore((state) => state.overlay[filename]);
+  const groupSize = useLinesStore((state) => {
+    const group = state.groups[filename];
+    if (group === undefined) return 0;
+    return Object.values(state.groups).filter((id) => id === group).length;
+  });
+  const { addLine, removeLine, updateLine, replicateLines, replicateLinesToGroup } = useLinesStore();
   const imageUrl = getBackendURL(`/api/images/${filename}`);
 
 useEffect(() => {
   if (!imgLoaded) return;
   drawLines();
-}, [imageLines, imgLoaded]);
+}, [imageLines, imgLoaded, overlay]);
 
   const drawLines = () => {
     const canvas = canvasRef.current;
@@ -28,6 +34,16 @@ useEffect(() => {
     canvas.height = img.height;
 
     ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+    // Cajas detectadas (debajo de las líneas) para ver los huecos entre columnas
+    if (overlay && overlay.boxes) {
+      const scale = canvas.width / overlay.ancho;
+      ctx.fillStyle = 'rgba(0, 120, 255, 0.15)';
+      overlay.boxes.forEach(([x0, y0, x1, y1]) => {
+        ctx.fillRect(x0 * scale, y0 * scale, (x1 - x0) * scale, (y1 - y0) * scale);
+      });
+    }
+
     ctx.strokeStyle = '#ff0000';
     ctx.lineWidth = 2;
 
@@ -129,6 +145,16 @@ useEffect(() => {
           >
             Replicar a todas
           </button>
+          {groupSize > 1 && (
+            <button
+              onClick={() => replicateLinesToGroup(filename)}
+              disabled={imageLines.length === 0}
+              className="btn-replicate"
+              title="Copiar estas líneas a las páginas con el mismo layout"
+            >
+              Replicar en grupo ({groupSize})
+            </button>
+          )}
         </div>
       </div>
     </div>
@@ -1,23 +1,89 @@
 import { useState } from 'react';
+import { getBackendURL } from '../config';
+
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const MAX_REINTENTOS = 5;
+
+// Clave para reanudar la misma subida si se interrumpe (recarga, red caída)
+const claveSubida = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+const esperar = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function iniciarOReanudar(file) {
+  const guardado = localStorage.getItem(claveSubida(file));
+  if (guardado) {
+    const response = await fetch(getBackendURL(`/api/upload/${guardado}`));
+    if (response.ok) return response.json();
+  }
+
+  const response = await fetch(getBackendURL('/api/upload/init'), {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size, chunk_size: CHUNK_SIZE }),
+  });
+  if (!response.ok) throw new Error('No se pudo iniciar la subida');
+
+  const meta = await response.json();
+  localStorage.setItem(claveSubida(file), meta.upload_id);
+  return { ...meta, missing: [...Array(meta.total_chunks).keys()] };
+}
+
+async function subirChunk(uploadId, file, chunkSize, index) {
+  const chunk = file.slice(index * chunkSize, (index + 1) * chunkSize);
+
+  // Solo se reintentan errores de red y 5xx; un 4xx no cambia al reenviar
+  for (let intento = 1; ; intento++) {
+    let response;
+    try {
+      response = await fetch(getBackendURL(`/api/upload/${uploadId}/chunk/${index}`), {
+        method: 'PUT',
+        body: chunk,
+      });
+    } catch (error) {
+      if (intento >= MAX_REINTENTOS) throw error;
+      await esperar(1000 * intento);
+      continue;
+    }
+
+    if (response.ok) return;
+    if (response.status < 500 || intento >= MAX_REINTENTOS) {
+      throw new Error(`Chunk ${index} rechazado (${response.status})`);
+    }
+    await esperar(1000 * intento);
+  }
+}
 
 function Uploader({ onSuccess }) {
   const [uploading, setUploading] = useState(false);
+  const [progress, setProgress] = useState(0);
 
   const handleFileChange = async (e) => {
     const file = e.target.files[0];
     if (!file) return;
 
     setUploading(true);
-    const formData = new FormData();
-    formData.append('file', file);
+    setProgress(0);
 
     try {
-      const response = await fetch('http://localhost:5000/api/upload', {
+      const meta = await iniciarOReanudar(file);
+      const total = meta.total_chunks;
+      let enviados = total - meta.missing.length;
+      setProgress(Math.round((enviados / total) * 100));
+
+      for (const index of meta.missing) {
+        await subirChunk(meta.upload_id, file, meta.chunk_size, index);
+        enviados += 1;
+        setProgress(Math.round((enviados / total) * 100));
+      }
+
+      const response = await fetch(getBackendURL(`/api/upload/${meta.upload_id}/complete`), {
         method: 'POST',
-        body: formData,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({}),
       });
 
       if (response.ok) {
+        localStorage.removeItem(claveSubida(file));
         const data = await response.json();
         onSuccess(data);
       } else {
@@ -25,7 +91,7 @@ function Uploader({ onSuccess }) {
       }
     } catch (error) {
       console.error('Error:', error);
-      alert('Error de conexión con el servidor');
+      alert('Error de conexión con el servidor. Vuelve a seleccionar el PDF para reanudar la subida');
     } finally {
       setUploading(false);
     }
@@ -43,11 +109,11 @@ function Uploader({ onSuccess }) {
           id="file-input"
         />
         <label htmlFor="file-input" className="upload-label">
-          {uploading ? 'Procesando...' : 'Seleccionar PDF'}
+          {uploading ? (progress < 100 ? `Subiendo... ${progress}%` : 'Procesando...') : 'Seleccionar PDF'}
         </label>
       </div>
     </div>
   );
 }
 
-export default Uploader;
\ No newline at end of file
+export default Uploader;
@@ -2,14 +2,46 @@ import { create } from "zustand";
 
 export const useLinesStore = create((set, get) => ({
   lines: {},
+  // Últimas líneas guardadas en el backend y su versión (para enviar solo cambios)
+  savedLines: {},
+  linesVersion: 0,
   images: [],
+  // Cajas de texto detectadas por imagen (vista previa para colocar líneas)
+  overlay: {},
+  // Grupo de layout de cada imagen ({ filename: id })
+  groups: {},
 
   setImages: (imageList) => {
     set({ images: imageList });
   },
 
-  loadLines: (linesData) => {
-    set({ lines: linesData });
+  loadLines: (linesData, version = 0) => {
+    set({ lines: linesData, savedLines: linesData, linesVersion: version });
+  },
+
+  markSaved: (savedLines, version) => {
+    set({ savedLines, linesVersion: version });
+  },
+
+  changedLines: () => {
+    const { lines, savedLines } = get();
+    const changed = {};
+    new Set([...Object.keys(lines), ...Object.keys(savedLines)]).forEach((filename) => {
+      const actual = lines[filename] || [];
+      const saved = savedLines[filename] || [];
+      if (actual.length !== saved.length || actual.some((x, i) => x !== saved[i])) {
+        changed[filename] = actual;
+      }
+    });
+    return changed;
+  },
+
+  loadOverlay: (overlayData) => {
+    set({ overlay: overlayData });
+  },
+
+  loadGroups: (groupsData) => {
+    set({ groups: groupsData });
   },
 
   addLine: (filename, x) => {
@@ -72,6 +104,23 @@ export const useLinesStore = create((set, get) => ({
     });
   },
 
+  replicateLinesToGroup: (sourceFilename) => {
+    set((state) => {
+      const sourceLines = state.lines[sourceFilename] || [];
+      const group = state.groups[sourceFilename];
+      if (sourceLines.length === 0 || group === undefined) return state;
+
+      const newLines = { ...state.lines };
+      Object.entries(state.groups).forEach(([filename, id]) => {
+        if (id === group && filename !== sourceFilename) {
+          newLines[filename] = [...sourceLines];
+        }
+      });
+
+      return { lines: newLines };
+    });
+  },
+
   exportJSON: () => {
     return get().lines;
   },
@@ -4,11 +4,13 @@ Permite procesar documentos PDF/imágenes y extraer texto con coordinates
 """
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from paddleocr import PaddleOCR
 from fastapi.responses import FileResponse
-from ocr_processor import OCRProcessor
+from starlette.concurrency import run_in_threadpool
+from ocr_processor import AGRUPACIONES, OCRProcessor, PERFILES_OCR, OPCIONES_OCR
+from metrics import PAGINAS_FALLIDAS, PAGINAS_PROCESADAS, TRABAJOS
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 import os
 from pathlib import Path
 import json
@@ -16,10 +18,28 @@ from datetime import datetime
 from pydantic import BaseModel
 import shutil
 import pandas as pd
+from PIL import Image
 from typing import List, Optional
-import traceback
 import logging
+import time
+import cProfile
+import io
+import pstats
+from logging_config import ResumenPaginas, configurar_logging
+from ocr_store import EscritorOCR
+from preprocesado import PREPROCESADO_JSON, resolver_opciones
+from overlays import OVERLAY_DIR, OVERLAY_MANIFEST, leer_manifest, renderizar_proyecto
+from reuso_ocr import HUELLAS_JSON, OCR_REUTILIZADO_DIR, preparar_ocr_reutilizado
+import search_index
+from sugerencia_lineas import GAP_MIN, TOLERANCIA, sugerir_lineas_proyecto
+from plantillas import (
+    PLANTILLAS_JSON,
+    UMBRAL_SIMILITUD,
+    aplicar_plantillas,
+    cargar_grupos_layout,
+)
 
+configurar_logging()
 logger = logging.getLogger(__name__)
 
 # Inicializar FastAPI
@@ -63,6 +83,110 @@ UPLOADS_PATH.mkdir(exist_ok=True, parents=True)
 PROJECTS_PATH.mkdir(exist_ok=True, parents=True)
 
 
+# Carpeta (dentro del proyecto) con los resultados OCR grabados para replay
+OCR_GRABADO_DIR = "ocr_grabado"
+
+# Capa de texto de PDFs digitales extraída por el backend al subir
+TEXTO_NATIVO_DIR = "texto_nativo"
+
+# Artefactos de profiling (profile=true), junto a resultado.xlsx
+PROFILING_PROF = "profiling.prof"
+PROFILING_RESUMEN = "profiling_top.txt"
+PROFILING_TOP = 40
+
+# Almacén binario de tokens OCR crudos (ver ocr_store.py)
+OCR_TOKENS_DIR = "ocr_tokens"
+
+# Índice FTS5 de filas extraídas, compartido por todos los proyectos
+SEARCH_DB = STORAGE_PATH / "busqueda.sqlite"
+
+# Versiones de lines.json guardadas por el backend
+LINES_VERSIONES_DIR = "lines_versiones"
+
+# Vista previa de solo detección (cajas sobre baja_calidad)
+DETECCION_DIR = "deteccion"
+DETECCION_CAJAS = "cajas.json"
+DETECCION_LOTE = 8
+
+# Cada cuántas páginas dibujadas se actualiza el estado de los overlays
+OVERLAY_PROGRESO_CADA = 25
+
+
+def registrar_procesada(
+    procesadas_path: Path, img_path: Path, filas: int, modo: str = "manifest"
+):
+    """
+    Marca una imagen como procesada sin duplicar sus bytes
+
+    Args:
+        procesadas_path: Carpeta 'procesadas' del proyecto
+        img_path: Imagen original procesada
+        filas: Registros extraídos de la imagen
+        modo: "manifest" (línea en manifest.jsonl), "hardlink" o "copy"
+    """
+    if modo == "manifest":
+        with open(procesadas_path / "manifest.jsonl", "a") as f:
+            f.write(
+                json.dumps(
+                    {
+                        "filename": img_path.name,
+                        "source": str(img_path),
+                        "rows": filas,
+                        "processed_at": datetime.now().isoformat(),
+                    }
+                )
+                + "\n"
+            )
+        return
+
+    destino = procesadas_path / img_path.name
+    if destino.exists():
+        destino.unlink()
+
+    if modo == "hardlink":
+        try:
+            os.link(img_path, destino)
+            return
+        except OSError:
+            # Otro sistema de archivos: se cae a copia
+            pass
+
+    shutil.copy(str(img_path), str(destino))
+
+
+def guardar_profiling(profiler: cProfile.Profile, project_path: Path):
+    """
+    Guarda el perfil de un trabajo y un resumen de las funciones más costosas
+
+    Args:
+        profiler: Perfil ya detenido
+        project_path: Carpeta del proyecto
+
+    Returns:
+        Ruta del archivo .prof (abrible con snakeviz / pstats)
+    """
+    prof_path = project_path / PROFILING_PROF
+    profiler.dump_stats(str(prof_path))
+
+    resumen = io.StringIO()
+    stats = pstats.Stats(profiler, stream=resumen).strip_dirs()
+    resumen.write(f"# Top {PROFILING_TOP} por tiempo acumulado\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILING_TOP)
+    resumen.write(f"\n# Top {PROFILING_TOP} por tiempo propio\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(PROFILING_TOP)
+
+    with open(project_path / PROFILING_RESUMEN, "w") as f:
+        f.write(resumen.getvalue())
+
+    return prof_path
+
+
+@app.get("/metrics")
+def metrics():
+    """Métricas Prometheus (etapas, páginas, trabajos y memoria)"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/health")
 def health_check():
     """Verificar que la API está activa"""
@@ -73,9 +197,26 @@ def health_check():
     }
 
 
-def process_ocr_background(project_name: str, json_filename: str):
+def process_ocr_background(
+    project_name: str,
+    json_filename: str,
+    perfil: Optional[str] = None,
+    opciones_ocr: Optional[dict] = None,
+    motor: str = "paddle",
+    grabar_ocr: bool = False,
+    profile: bool = False,
+):
     """Procesa OCR en background usando OCRProcessor"""
+    TRABAJOS.labels(estado="pendiente").dec()
+    TRABAJOS.labels(estado="procesando").inc()
+
+    # cProfile mide el hilo que lo activa, que es el que corre el trabajo
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+
     try:
+        inicio_job = time.perf_counter()
         project_path = PROJECTS_PATH / project_name
         project_path = PROJECTS_PATH / project_name
         status_path = project_path / "status.json"
@@ -105,15 +246,58 @@ def process_ocr_background(project_name: str, json_filename: str):
         with open(json_path) as f:
             data = json.load(f)
 
-        print("✅ JSON cargado correctamente")
-        print("🚀 Iniciando OCRProcessor...")
-        print(f"Proyecto: {project_name}, JSON: {json_filename}")
-
         lines_data = data.get("lines", {})
         line_gap = data.get("line_gap", 6.5)
+        gc_interval = data.get("gc_interval", 0)
+        procesadas_modo = data.get("procesadas_modo", "manifest")
+        roi = data.get("roi", False)
+        roi_margen = data.get("roi_margen", 40)
+        roi_banda = data.get("roi_banda")
+        modo = data.get("modo", "pagina")
+        max_lado = data.get("max_lado")
+        dpi_objetivo = data.get("dpi_objetivo")
+        altura_texto_objetivo = data.get("altura_texto_objetivo")
+        preprocesado = data.get("preprocesado")
+        # Con preprocesado, lotes de varias páginas para enderezarlas en paralelo
+        paginas_por_lote = max(
+            1,
+            int(
+                data.get(
+                    "paginas_por_lote",
+                    4 if modo == "columnas" or preprocesado else 1,
+                )
+            ),
+        )
 
-        print(f"Línea gap configurado: {line_gap}")
-        print(f"Número de imágenes a procesar: {len(lines_data)}")
+        # Páginas sin líneas heredan las de su grupo de layout
+        if data.get("plantillas", False):
+            grupos = cargar_grupos_layout(
+                project_path, data.get("plantillas_umbral", UMBRAL_SIMILITUD)
+            )
+            con_lineas = sum(1 for v in lines_data.values() if v)
+            lines_data = aplicar_plantillas(lines_data, grupos["pagina_grupo"])
+            logger.info(
+                "Plantillas de layout aplicadas",
+                extra={
+                    "project": project_name,
+                    "grupos": grupos["total_grupos"],
+                    "paginas_heredadas": sum(1 for v in lines_data.values() if v)
+                    - con_lineas,
+                },
+            )
+
+        logger.info(
+            "Iniciando OCR",
+            extra={
+                "project": project_name,
+                "json": json_filename,
+                "imagenes": len(lines_data),
+                "line_gap": line_gap,
+                "modo": modo,
+                "perfil": perfil,
+                "motor": motor,
+            },
+        )
 
         # Usar carpeta de imágenes de alta calidad (originales)
         originales_path = project_path / "originales"
@@ -123,77 +307,185 @@ def process_ocr_background(project_name: str, json_filename: str):
             raise Exception(f"Carpeta 'originales' no encontrada en {project_path}")
 
         procesadas_path.mkdir(exist_ok=True)
+        manifest_path = procesadas_path / "manifest.jsonl"
+        if manifest_path.exists():
+            manifest_path.unlink()
+
+        # Páginas idénticas a otras ya procesadas reutilizan su OCR
+        paginas_reutilizables = 0
+        if data.get("reutilizar_ocr", True) and motor != "replay":
+            try:
+                paginas_reutilizables = preparar_ocr_reutilizado(PROJECTS_PATH, project_name)
+            except Exception as e:
+                logger.warning(
+                    "No se pudo preparar el OCR reutilizado", extra={"error": str(e)}
+                )
+            if paginas_reutilizables:
+                logger.info(
+                    "OCR reutilizado de páginas idénticas",
+                    extra={"project": project_name, "paginas": paginas_reutilizables},
+                )
 
         # Inicializar OCRProcessor
-        processor = OCRProcessor(line_gap=line_gap)
+        processor = OCRProcessor(
+            line_gap=line_gap,
+            perfil=perfil,
+            opciones_ocr=opciones_ocr,
+            motor=motor,
+            replay_dir=str(project_path / OCR_GRABADO_DIR),
+            grabar_ocr_dir=str(project_path / OCR_GRABADO_DIR) if grabar_ocr else None,
+            gc_interval=gc_interval,
+            recortar_roi=roi,
+            roi_margen=roi_margen,
+            roi_banda=tuple(roi_banda) if roi_banda else None,
+            modo=modo,
+            max_lado=max_lado,
+            dpi_objetivo=dpi_objetivo,
+            altura_texto_objetivo=altura_texto_objetivo,
+            texto_nativo_dir=(
+                str(project_path / TEXTO_NATIVO_DIR)
+                if data.get("texto_nativo", True)
+                and (project_path / TEXTO_NATIVO_DIR).exists()
+                else None
+            ),
+            ocr_reutilizado_dir=(
+                str(project_path / OCR_REUTILIZADO_DIR) if paginas_reutilizables else None
+            ),
+            agrupacion=data.get("agrupacion", "fija"),
+            preprocesado=preprocesado,
+        )
 
         # Limitar a 30 items para testing
         # lines_data = dict(list(lines_data.items())[:50])
 
-        print(lines_data)
-
+        # DataFrames por página; procesar_excel_completo necesita la tabla
+        # completa, así que se concatenan una sola vez al final
         all_dfs = []
         total = len(lines_data)
 
-        print(f"🚀 Iniciando procesamiento de {total} imágenes con OCRProcessor...")
-
+        # Validar imágenes y líneas antes de procesar
+        pendientes = []
         for idx, (filename, line_positions) in enumerate(lines_data.items(), 1):
             # Buscar imagen en carpeta originales (alta calidad)
             original_img = originales_path / filename
 
             if not original_img.exists():
-                print(f"⚠️  Imagen no encontrada: {filename}")
+                logger.warning("Imagen no encontrada", extra={"imagen": filename})
                 continue
 
             if not line_positions or len(line_positions) == 0:
-                print(f"⚠️  Sin líneas para: {filename}")
+                logger.warning("Sin líneas", extra={"imagen": filename})
                 continue
 
-            # Procesar con OCRProcessor
-            try:
-                # Convertir line_positions a array
-                lineas_array = (
-                    sorted(line_positions)
-                    if isinstance(line_positions, list)
-                    else [line_positions]
-                )
-
-                # Procesar imagen con la clase
-                result = processor.procesar_imagen(
-                    img_path=str(original_img), lineas_array=lineas_array
-                )
+            # Convertir line_positions a array
+            lineas_array = (
+                sorted(line_positions)
+                if isinstance(line_positions, list)
+                else [line_positions]
+            )
+            pendientes.append((idx, filename, original_img, lineas_array))
+
+        resumen = ResumenPaginas(logger, len(pendientes))
+        # La región del OCR se guarda con los tokens: solo las corridas sobre
+        # la página completa se reutilizan en páginas idénticas
+        almacen = EscritorOCR(
+            project_path / OCR_TOKENS_DIR,
+            metadatos={"roi": bool(roi), "roi_banda": roi_banda, "modo": modo},
+        )
+        # El almacén se escribe en ocr_tokens.tmp; si el trabajo falla se
+        # descarta y el índice de búsqueda se cierra sin confirmar
+        publicado = False
+        indexador = None
+        try:
+            indexador = search_index.IndexadorProyecto(SEARCH_DB, project_name)
+            for inicio in range(0, len(pendientes), paginas_por_lote):
+                lote = pendientes[inicio : inicio + paginas_por_lote]
+
+                # Procesar lote con OCRProcessor
+                try:
+                    resultados = processor.procesar_lote(
+                        [(str(img), lineas) for _, _, img, lineas in lote]
+                    )
+                except Exception:
+                    logger.exception(
+                        "Error procesando lote",
+                        extra={"imagenes": [f for _, f, _, _ in lote]},
+                    )
+                    PAGINAS_FALLIDAS.inc(len(lote))
+                    for _ in lote:
+                        resumen.pagina(ok=False)
+                    continue
 
-                if result.success:
-                    # Guardar imagen procesada si existe
-                    if result.image_path and Path(result.image_path).exists():
-                        output_img = procesadas_path / filename
-                        shutil.copy(result.image_path, str(output_img))
-
-                    # Agregar DataFrame al resultado
-                    all_dfs.append(result.df)
-
-                    # Actualizar progreso
-                    progress = int((idx / total) * 100)
-                    with open(status_path, "w") as f:
-                        json.dump(
-                            {
-                                "status": "processing",
-                                "progress": f"{progress}%",
-                                "processed": idx,
-                                "total": total,
-                            },
-                            f,
+                for (idx, filename, _, _), result in zip(lote, resultados):
+                    if result.success:
+                        PAGINAS_PROCESADAS.inc()
+                        if result.tokens is not None:
+                            almacen.agregar_pagina(filename, result.tokens)
+                        try:
+                            indexador.agregar_pagina(filename, result.df)
+                        except Exception as e:
+                            logger.warning(
+                                "Error indexando página",
+                                extra={"imagen": filename, "error": str(e)},
+                            )
+
+                        # Registrar imagen procesada (sin copiar bytes por defecto)
+                        if result.image_path and Path(result.image_path).exists():
+                            registrar_procesada(
+                                procesadas_path,
+                                Path(result.image_path),
+                                len(result.df),
+                                modo=procesadas_modo,
+                            )
+
+                        all_dfs.append(result.df)
+
+                        # Actualizar progreso
+                        progress = int((idx / total) * 100)
+                        with open(status_path, "w") as f:
+                            json.dump(
+                                {
+                                    "status": "processing",
+                                    "progress": f"{progress}%",
+                                    "processed": idx,
+                                    "total": total,
+                                },
+                                f,
+                            )
+
+                        resumen.pagina(ok=True, filas=len(result.df))
+                    else:
+                        PAGINAS_FALLIDAS.inc()
+                        resumen.pagina(ok=False)
+                        logger.warning(
+                            "Error procesando imagen",
+                            extra={"imagen": filename, "error": result.error_msg},
                         )
 
-                    print(f"✅ [{progress}%] Procesada {idx}/{total}: {filename}")
-                else:
-                    print(f"❌ Error procesando {filename}: {result.error_msg}")
-                    continue
-
-            except Exception as e:
-                print(f"Error procesando {filename}: {e}")
-                traceback.print_exc()
-                continue
+            resumen.emitir()
+            almacen.cerrar()
+            indexador.cerrar()
+            publicado = True
+        finally:
+            if not publicado:
+                almacen.descartar()
+                if indexador is not None:
+                    indexador.descartar()
+
+        # Transformación aplicada a cada página (cortes de lines.json -> marco enderezado)
+        preprocesado_path = project_path / PREPROCESADO_JSON
+        if processor.preprocesado:
+            with open(preprocesado_path, "w") as f:
+                json.dump(
+                    {
+                        "opciones": processor.preprocesado,
+                        "json_used": json_filename,
+                        "paginas": processor.transformaciones,
+                    },
+                    f,
+                )
+        elif preprocesado_path.exists():
+            preprocesado_path.unlink()
 
         # Concatenar todos los DataFrames
         if all_dfs:
@@ -204,7 +496,6 @@ def process_ocr_background(project_name: str, json_filename: str):
             # df_final.to_excel(excel_ocr_path, index=False)
 
             # Procesar Excel con marca, modelo, año, versión
-            print("🔄 Procesando Excel con marca, modelo, año, versión...")
             try:
                 # Buscar archivo data.json para referencia de marcas/modelos
                 data_json_path = STORAGE_PATH / "data.json"
@@ -216,14 +507,16 @@ def process_ocr_background(project_name: str, json_filename: str):
                         output_path=str(excel_final_path),
                     )
 
-                    print(f"✅ Excel procesado guardado: {excel_final_path}")
+                    logger.info("Excel procesado guardado", extra={"path": str(excel_final_path)})
                     excel_path = excel_final_path
                 else:
-                    print("⚠️ No se encontró data.json, usando Excel OCR sin procesar")
+                    logger.warning("No se encontró data.json, usando Excel OCR sin procesar")
                     excel_path = excel_final_path
             except Exception as e:
-                print(f"⚠️ Error procesando con marca/modelo: {e}")
-                print("Usando Excel OCR sin procesar como fallback")
+                logger.warning(
+                    "Error procesando con marca/modelo, usando Excel OCR sin procesar",
+                    extra={"error": str(e)},
+                )
                 excel_path = excel_final_path
 
             # Estado completado
@@ -235,17 +528,27 @@ def process_ocr_background(project_name: str, json_filename: str):
                         "excel_path": str(excel_path),
                         "total_rows": len(df_final),
                         "json_used": json_filename,
+                        "perfil": processor.perfil,
+                        "profiling": bool(profiler),
+                        "paginas_texto_nativo": processor.paginas_nativas,
+                        "paginas_ocr_reutilizado": processor.paginas_reutilizadas,
+                        "paginas_enderezadas": sum(
+                            1 for t in processor.transformaciones.values() if t["angulo"]
+                        ),
+                        "segundos_por_pagina": round(
+                            (time.perf_counter() - inicio_job) / max(len(pendientes), 1),
+                            3,
+                        ),
                     },
                     f,
                 )
 
-            print(f"✅ Procesamiento completado: {project_name}")
+            logger.info("Procesamiento completado", extra={"project": project_name})
         else:
             raise Exception("No se procesó ninguna imagen")
 
     except Exception as e:
-        print(f"❌ Error en procesamiento: {e}")
-        print(traceback.format_exc())
+        logger.exception("Error en procesamiento", extra={"project": project_name})
         # Estado error
         try:
             project_path = PROJECTS_PATH / project_name
@@ -262,20 +565,45 @@ def process_ocr_background(project_name: str, json_filename: str):
                 )
         except:
             pass
+    finally:
+        if profiler:
+            profiler.disable()
+            try:
+                prof_path = guardar_profiling(profiler, PROJECTS_PATH / project_name)
+                logger.info("Profiling guardado", extra={"path": str(prof_path)})
+            except Exception as e:
+                logger.warning("No se pudo guardar el profiling", extra={"error": str(e)})
+        TRABAJOS.labels(estado="procesando").dec()
 
 
 class ProcessRequest(BaseModel):
     project: str
-    json_filename: str
+    json_filename: Optional[str] = None
+    # Versión guardada de las líneas (lines_versiones/vNNNN.json); tiene
+    # prioridad sobre json_filename
+    lines_version: Optional[int] = None
+    perfil: Optional[str] = None
+    device: Optional[str] = None
+    cpu_threads: Optional[int] = None
+    enable_mkldnn: Optional[bool] = None
+    precision: Optional[str] = None
+    motor: Optional[str] = None
+    grabar_ocr: bool = False
+    profile: bool = False
 
 
 @app.post("/api/process")
 async def start_processing(request: ProcessRequest, background_tasks: BackgroundTasks):
     """Inicia procesamiento OCR con proyecto y JSON especificados"""
     try:
+        if request.lines_version is not None:
+            request.json_filename = (
+                f"{LINES_VERSIONES_DIR}/v{request.lines_version:04d}.json"
+            )
+
         if not request.project or not request.json_filename:
             raise HTTPException(
-                400, "Parámetros requeridos: 'project' y 'json_filename'"
+                400, "Parámetros requeridos: 'project' y 'json_filename' o 'lines_version'"
             )
 
         project_path = PROJECTS_PATH / request.project
@@ -290,6 +618,44 @@ async def start_processing(request: ProcessRequest, background_tasks: Background
                 404, f"Archivo JSON '{request.json_filename}' no encontrado en proyecto"
             )
 
+        if request.perfil and request.perfil not in PERFILES_OCR:
+            raise HTTPException(
+                400,
+                f"Perfil OCR '{request.perfil}' no existe. Disponibles: {', '.join(PERFILES_OCR)}",
+            )
+
+        # Opciones de lines.json que el trabajo validaría ya en segundo plano
+        try:
+            with open(json_path) as f:
+                opciones_lines = json.load(f)
+        except ValueError as e:
+            raise HTTPException(400, f"JSON inválido en '{request.json_filename}': {e}")
+
+        agrupacion = opciones_lines.get("agrupacion", "fija")
+        if agrupacion not in AGRUPACIONES:
+            raise HTTPException(
+                400,
+                f"Agrupación '{agrupacion}' no existe. Disponibles: {', '.join(AGRUPACIONES)}",
+            )
+        try:
+            resolver_opciones(opciones_lines.get("preprocesado"))
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+        motor = request.motor or "paddle"
+        if motor not in ("paddle", "replay"):
+            raise HTTPException(400, "Motor OCR debe ser 'paddle' o 'replay'")
+        if motor == "replay" and not (project_path / OCR_GRABADO_DIR).exists():
+            raise HTTPException(
+                400, "El proyecto no tiene OCR grabado; procesa primero con grabar_ocr"
+            )
+
+        opciones_ocr = {
+            clave: getattr(request, clave)
+            for clave in OPCIONES_OCR
+            if getattr(request, clave) is not None
+        }
+
         # Crear archivo de estado
         status_path = project_path / "status.json"
         with open(status_path, "w") as f:
@@ -299,13 +665,24 @@ async def start_processing(request: ProcessRequest, background_tasks: Background
                     "created_at": datetime.now().isoformat(),
                     "project": request.project,
                     "json_filename": request.json_filename,
+                    "perfil": request.perfil,
+                    "motor": motor,
+                    "profile": request.profile,
                 },
                 f,
             )
 
         # Iniciar procesamiento en background
+        TRABAJOS.labels(estado="pendiente").inc()
         background_tasks.add_task(
-            process_ocr_background, request.project, request.json_filename
+            process_ocr_background,
+            request.project,
+            request.json_filename,
+            request.perfil,
+            opciones_ocr,
+            motor,
+            request.grabar_ocr,
+            request.profile,
         )
 
         return {
@@ -313,6 +690,8 @@ async def start_processing(request: ProcessRequest, background_tasks: Background
             "message": "Procesamiento OCR iniciado",
             "project": request.project,
             "json_file": request.json_filename,
+            "lines_version": request.lines_version,
+            "perfil": request.perfil,
             "info": "El proceso continuará aunque cierres el navegador",
         }
 
@@ -322,6 +701,318 @@ async def start_processing(request: ProcessRequest, background_tasks: Background
         raise HTTPException(500, f"Error iniciando procesamiento: {str(e)}")
 
 
+def carpeta_deteccion(project_path: Path) -> Optional[Path]:
+    """baja_calidad/, u originales/ si la cuota la desalojó (None si no hay ninguna)"""
+    for nombre in ("baja_calidad", "originales"):
+        if (project_path / nombre).exists():
+            return project_path / nombre
+    return None
+
+
+def detect_background(project_name: str, perfil: Optional[str] = None):
+    """
+    Detecta cajas de texto (sin reconocimiento) en baja_calidad/ (u
+    originales/ si se desalojó) y las guarda en deteccion/cajas.json para
+    dibujarlas sobre la imagen en el frontend
+    """
+    project_path = PROJECTS_PATH / project_name
+    carpeta = project_path / DETECCION_DIR
+    status_path = carpeta / "status.json"
+
+    def estado(**datos):
+        with open(status_path, "w") as f:
+            json.dump({**datos, "updated_at": datetime.now().isoformat()}, f)
+
+    try:
+        fuente = carpeta_deteccion(project_path)
+        if fuente is None:
+            raise Exception(f"Sin imágenes en {project_path}")
+        imagenes = sorted(fuente.glob("*.jpg"))
+        estado(status="processing", processed=0, total=len(imagenes))
+
+        processor = OCRProcessor(modo="deteccion", perfil=perfil)
+
+        cajas = {}
+        for inicio in range(0, len(imagenes), DETECCION_LOTE):
+            lote = imagenes[inicio : inicio + DETECCION_LOTE]
+            for img_path, det in zip(lote, processor.detectar_lote([str(p) for p in lote])):
+                # Escala para llevar las cajas a coordenadas de originales/
+                original = project_path / "originales" / img_path.name
+                if original.exists() and "ancho" in det:
+                    with Image.open(original) as img:
+                        det["escala_originales"] = round(img.width / det["ancho"], 6)
+                cajas[det.pop("imagen")] = det
+            estado(status="processing", processed=len(cajas), total=len(imagenes))
+
+        with open(carpeta / DETECCION_CAJAS, "w") as f:
+            json.dump(
+                {
+                    "version": 1,
+                    "fuente": fuente.name,
+                    "perfil": processor.perfil,
+                    "generated_at": datetime.now().isoformat(),
+                    "imagenes": cajas,
+                },
+                f,
+                separators=(",", ":"),
+            )
+
+        estado(status="completed", processed=len(cajas), total=len(imagenes))
+        logger.info(
+            "Detección completada", extra={"project": project_name, "imagenes": len(cajas)}
+        )
+
+    except Exception as e:
+        logger.exception("Error en detección", extra={"project": project_name})
+        try:
+            estado(status="error", error_message=str(e))
+        except Exception:
+            pass
+
+
+class DetectRequest(BaseModel):
+    perfil: Optional[str] = None
+
+
+@app.post("/api/project/{project}/detect")
+async def start_detection(
+    project: str, background_tasks: BackgroundTasks, request: Optional[DetectRequest] = None
+):
+    """Inicia la detección de cajas (sin reconocimiento) sobre baja_calidad/ u originales/"""
+    try:
+        project_path = PROJECTS_PATH / project
+        request = request or DetectRequest()
+
+        if not project_path.exists():
+            raise HTTPException(404, f"Proyecto '{project}' no existe")
+
+        if carpeta_deteccion(project_path) is None:
+            raise HTTPException(
+                404, "Carpetas 'baja_calidad' y 'originales' no encontradas en el proyecto"
+            )
+
+        if request.perfil and request.perfil not in PERFILES_OCR:
+            raise HTTPException(
+                400,
+                f"Perfil OCR '{request.perfil}' no existe. Disponibles: {', '.join(PERFILES_OCR)}",
+            )
+
+        carpeta = project_path / DETECCION_DIR
+        carpeta.mkdir(exist_ok=True)
+        with open(carpeta / "status.json", "w") as f:
+            json.dump({"status": "pending", "created_at": datetime.now().isoformat()}, f)
+
+        background_tasks.add_task(detect_background, project, request.perfil)
+
+        return {
+            "status": "success",
+            "message": "Detección iniciada",
+            "project": project,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error iniciando detección: {str(e)}")
+
+
+@app.get("/api/project/{project}/detection")
+async def get_detection(project: str, imagen: Optional[str] = None):
+    """
+    Cajas detectadas para dibujar sobre las imágenes de baja_calidad
+
+    Mientras la detección corre devuelve solo el estado.
+    """
+    try:
+        project_path = PROJECTS_PATH / project
+        carpeta = project_path / DETECCION_DIR
+
+        if not project_path.exists():
+            raise HTTPException(404, f"Proyecto '{project}' no existe")
+
+        cajas_path = carpeta / DETECCION_CAJAS
+        if not cajas_path.exists():
+            status_path = carpeta / "status.json"
+            if not status_path.exists():
+                raise HTTPException(404, "Sin detección. Iníciala con POST /detect")
+            with open(status_path) as f:
+                return {"project": project, **json.load(f)}
+
+        if imagen is None:
+            return FileResponse(cajas_path, media_type="application/json")
+
+        with open(cajas_path) as f:
+            datos = json.load(f)
+        if imagen not in datos["imagenes"]:
+            raise HTTPException(404, f"Imagen '{imagen}' sin detección")
+        return {"project": project, "imagen": imagen, **datos["imagenes"][imagen]}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error obteniendo detección: {str(e)}")
+
+
+def overlays_background(project_name: str, json_filename: str, forzar: bool = False):
+    """
+    Dibuja las líneas de cada página sobre su vista previa en lineas_overlay/
+    (solo las páginas cuyas líneas cambiaron desde la última corrida)
+    """
+    project_path = PROJECTS_PATH / project_name
+    status_path = project_path / OVERLAY_DIR / "status.json"
+
+    def estado(**datos):
+        with open(status_path, "w") as f:
+            json.dump({**datos, "updated_at": datetime.now().isoformat()}, f)
+
+    def progreso(hechas, total):
+        if hechas % OVERLAY_PROGRESO_CADA == 0 or hechas == total:
+            estado(status="processing", processed=hechas, total=total)
+
+    try:
+        with open(project_path / json_filename) as f:
+            lines = json.load(f).get("lines", {})
+
+        estado(status="processing", processed=0, total=len(lines))
+        resumen = renderizar_proyecto(project_path, lines, forzar=forzar, progreso=progreso)
+        estado(status="completed", json_used=json_filename, **resumen)
+        logger.info(
+            "Overlays de líneas completados",
+            extra={
+                "project": project_name,
+                "dibujadas": resumen["dibujadas"],
+                "sin_cambios": resumen["sin_cambios"],
+                "segundos": resumen["segundos"],
+            },
+        )
+
+    except Exception as e:
+        logger.exception("Error dibujando overlays", extra={"project": project_name})
+        try:
+            estado(status="error", error_message=str(e))
+        except Exception:
+            pass
+
+
+class OverlayRequest(BaseModel):
+    json_filename: str = "lines.json"
+    # Versión guardada de las líneas; tiene prioridad sobre json_filename
+    lines_version: Optional[int] = None
+    forzar: bool = False
+
+
+@app.post("/api/project/{project}/overlays")
+async def start_overlays(
+    project: str, background_tasks: BackgroundTasks, request: Optional[OverlayRequest] = None
+):
+    """Inicia el dibujo de las líneas sobre las vistas previas del proyecto"""
+    try:
+        project_path = PROJECTS_PATH / project
+        request = request or OverlayRequest()
+
+        if not project_path.exists():
+            raise HTTPException(404, f"Proyecto '{project}' no existe")
+
+        json_filename = request.json_filename
+        if request.lines_version is not None:
+            json_filename = f"{LINES_VERSIONES_DIR}/v{request.lines_version:04d}.json"
+        if not (project_path / json_filename).exists():
+            raise HTTPException(
+                404, f"Archivo JSON '{json_filename}' no encontrado en proyecto"
+            )
+
+        carpeta = project_path / OVERLAY_DIR
+        carpeta.mkdir(exist_ok=True)
+        with open(carpeta / "status.json", "w") as f:
+            json.dump({"status": "pending", "created_at": datetime.now().isoformat()}, f)
+
+        background_tasks.add_task(overlays_background, project, json_filename, request.forzar)
+
+        return {
+            "status": "success",
+            "message": "Overlays de líneas iniciados",
+            "project": project,
+            "json_file": json_filename,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error iniciando overlays: {str(e)}")
+
+
+@app.get("/api/project/{project}/overlays")
+async def get_overlays(project: str):
+    """Estado del último dibujo de overlays y líneas de cada imagen dibujada"""
+    try:
+        project_path = PROJECTS_PATH / project
+        carpeta = project_path / OVERLAY_DIR
+
+        if not project_path.exists():
+            raise HTTPException(404, f"Proyecto '{project}' no existe")
+
+        status_path = carpeta / "status.json"
+        if not status_path.exists():
+            raise HTTPException(404, "Sin overlays. Inícialos con POST /overlays")
+
+        with open(status_path) as f:
+            estado = json.load(f)
+        return {"project": project, **estado, "imagenes": leer_manifest(carpeta)}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error obteniendo overlays: {str(e)}")
+
+
+@app.get("/api/project/{project}/overlays/{imagen}")
+async def get_overlay_image(project: str, imagen: str):
+    """Imagen de baja_calidad con las líneas dibujadas"""
+    path = PROJECTS_PATH / project / OVERLAY_DIR / imagen
+    if imagen in (OVERLAY_MANIFEST, "status.json") or not path.is_file():
+        raise HTTPException(404, f"Overlay '{imagen}' no encontrado")
+    return FileResponse(path, media_type="image/jpeg")
+
+
+@app.get("/api/search")
+async def search(q: str, limit: int = 50, project: Optional[str] = None):
+    """Busca texto en las filas extraídas de todos los proyectos"""
+    try:
+        if not q.strip():
+            raise HTTPException(400, "Parámetro 'q' requerido")
+
+        inicio = time.perf_counter()
+        resultados = await run_in_threadpool(
+            search_index.buscar,
+            SEARCH_DB,
+            q,
+            limite=max(1, min(limit, 500)),
+            project=project,
+        )
+        # Proyectos borrados cuyas filas el backend aún no purga del índice
+        resultados = [r for r in resultados if (PROJECTS_PATH / r["project"]).exists()]
+        return {
+            "query": q,
+            "total": len(resultados),
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "results": resultados,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error buscando: {str(e)}")
+
+
+@app.get("/api/ocr-profiles")
+async def list_ocr_profiles():
+    """Lista los perfiles de motor OCR disponibles"""
+    return {
+        "profiles": PERFILES_OCR,
+        "overridable": list(OPCIONES_OCR),
+    }
+
+
 @app.get("/api/process-status/{project}")
 async def get_process_status(project: str):
     """Obtiene estado del procesamiento para un proyecto específico"""
@@ -377,6 +1068,39 @@ async def download_excel(project: str):
         raise HTTPException(500, f"Error descargando Excel: {str(e)}")
 
 
+@app.get("/api/download-profile/{project}")
+async def download_profile(project: str, formato: str = "resumen"):
+    """
+    Descarga el profiling del último trabajo procesado con profile=true
+
+    formato: "resumen" (top de funciones en texto) o "prof" (pstats binario)
+    """
+    try:
+        project_path = PROJECTS_PATH / project
+
+        if not project_path.exists():
+            raise HTTPException(404, f"Proyecto '{project}' no existe")
+
+        if formato == "resumen":
+            path, media_type = project_path / PROFILING_RESUMEN, "text/plain"
+        elif formato == "prof":
+            path, media_type = project_path / PROFILING_PROF, "application/octet-stream"
+        else:
+            raise HTTPException(400, "formato debe ser 'resumen' o 'prof'")
+
+        if not path.exists():
+            raise HTTPException(
+                404, "Profiling no encontrado. Procesa el proyecto con profile=true"
+            )
+
+        return FileResponse(path, media_type=media_type, filename=f"{project}_{path.name}")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error descargando profiling: {str(e)}")
+
+
 @app.get("/api/download-excel-ocr/{project}")
 async def download_excel_ocr(project: str):
     """Descarga el Excel OCR bruto (sin procesar marca/modelo)"""
@@ -447,7 +1171,12 @@ async def list_json_files(project: str):
 
         json_files = []
         for json_file in project_path.glob("*.json"):
-            if json_file.name != "status.json":
+            if json_file.name not in (
+                "status.json",
+                PLANTILLAS_JSON,
+                HUELLAS_JSON,
+                PREPROCESADO_JSON,
+            ):
                 json_files.append(
                     {
                         "filename": json_file.name,
@@ -470,6 +1199,95 @@ async def list_json_files(project: str):
         raise HTTPException(500, f"Error listando archivos JSON: {str(e)}")
 
 
+@app.get("/api/project/{project}/suggest-lines")
+async def suggest_lines(
+    project: str,
+    fuente: str = "auto",
+    gap_min: float = GAP_MIN,
+    tolerancia: float = TOLERANCIA,
+    guardar: bool = False,
+):
+    """
+    Sugiere líneas de división por página a partir del OCR guardado
+
+    Con guardar=true escribe `lines_sugeridas.json` en el proyecto (no
+    toca `lines.json`), listo para revisar o procesar directamente.
+    """
+    try:
+        project_path = PROJECTS_PATH / project
+
+        if not project_path.exists():
+            raise HTTPException(404, f"Proyecto '{project}' no existe")
+
+        line_gap = None
+        lines_path = project_path / "lines.json"
+        if lines_path.exists():
+            with open(lines_path) as f:
+                line_gap = json.load(f).get("line_gap")
+
+        try:
+            sugerencia = sugerir_lineas_proyecto(
+                project_path,
+                fuente=fuente,
+                gap_min=gap_min,
+                tolerancia=tolerancia,
+                line_gap=line_gap,
+            )
+        except FileNotFoundError as e:
+            raise HTTPException(404, str(e))
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+        if guardar:
+            sugerencia["exported_at"] = datetime.now().isoformat()
+            with open(project_path / "lines_sugeridas.json", "w") as f:
+                json.dump(sugerencia, f, indent=2)
+
+        return {"project": project, **sugerencia}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error sugiriendo líneas: {str(e)}")
+
+
+@app.get("/api/project/{project}/layout-groups")
+async def layout_groups(
+    project: str, umbral: float = UMBRAL_SIMILITUD, recalcular: bool = False
+):
+    """
+    Agrupa las páginas del proyecto por estructura de columnas
+
+    Un juego de líneas sirve para todo un grupo (ver opción `plantillas`
+    del JSON de líneas y el botón "Replicar en grupo" del frontend).
+    """
+    try:
+        project_path = PROJECTS_PATH / project
+
+        if not project_path.exists():
+            raise HTTPException(404, f"Proyecto '{project}' no existe")
+
+        if not 0 < umbral <= 1:
+            raise HTTPException(400, "umbral debe estar entre 0 y 1")
+
+        inicio = time.perf_counter()
+        try:
+            grupos = cargar_grupos_layout(project_path, umbral, recalcular)
+        except FileNotFoundError as e:
+            raise HTTPException(404, str(e))
+
+        return {
+            "project": project,
+            "ms": round((time.perf_counter() - inicio) * 1000, 2),
+            **grupos,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error agrupando páginas: {str(e)}")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -310,6 +310,9 @@ def separar_anio_y_resto_mejorado(texto):
 
 
 def crear_imagenes_con_lineas(promedios, image_files):
+    """Mismas líneas sobre varias imágenes (notebooks). Para revisar un proyecto
+    completo, con las líneas de cada página, usar overlays.renderizar_proyecto
+    o POST /api/project/{project}/overlays"""
     output_dir = "./imagenes_con_lineas"
     os.makedirs(output_dir, exist_ok=True)
 
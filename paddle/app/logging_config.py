@@ -0,0 +1,117 @@
+"""
+Logging estructurado (JSON) con niveles por módulo
+
+Variables de entorno:
+    LOG_FORMAT: "json" (default) o "texto"
+    LOG_LEVEL: nivel raíz (default INFO)
+    LOG_LEVELS: niveles por logger, p. ej. "ocr_processor.filas=DEBUG,api=WARNING"
+    LOG_RESUMEN_CADA: páginas entre resúmenes de progreso (default 25)
+
+Los loggers de rutas calientes (`ocr_processor.filas` por fila y
+`ocr_processor.paginas` por página) quedan en WARNING por defecto.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+# Loggers silenciosos salvo que LOG_LEVELS diga lo contrario
+NIVELES_DEFAULT = {
+    "ocr_processor.filas": "WARNING",
+    "ocr_processor.paginas": "WARNING",
+}
+
+# Atributos estándar de LogRecord que no se copian como campos extra
+_ATRIBUTOS_RECORD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los `extra` como campos"""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_RECORD:
+                data[clave] = valor
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _parsear_niveles(texto: str) -> dict:
+    niveles = {}
+    for par in (texto or "").split(","):
+        if "=" in par:
+            nombre, nivel = par.split("=", 1)
+            niveles[nombre.strip()] = nivel.strip().upper()
+    return niveles
+
+
+def configurar_logging():
+    """Configura el logger raíz según las variables de entorno"""
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+
+    raiz = logging.getLogger()
+    raiz.handlers[:] = [handler]
+    raiz.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    niveles = {**NIVELES_DEFAULT, **_parsear_niveles(os.getenv("LOG_LEVELS", ""))}
+    for nombre, nivel in niveles.items():
+        logging.getLogger(nombre).setLevel(nivel)
+
+
+class ResumenPaginas:
+    """
+    Agrega el progreso por página y emite un solo registro cada
+    `cada` páginas (y al cerrar) en lugar de uno por página
+    """
+
+    def __init__(self, logger: logging.Logger, total: int, cada: int = None):
+        self.logger = logger
+        self.total = total
+        self.cada = cada or int(os.getenv("LOG_RESUMEN_CADA", "25"))
+        self.procesadas = 0
+        self.fallidas = 0
+        self.filas = 0
+        self._pendientes = 0
+        self._inicio = time.perf_counter()
+
+    def pagina(self, ok: bool, filas: int = 0):
+        if ok:
+            self.procesadas += 1
+            self.filas += filas
+        else:
+            self.fallidas += 1
+
+        self._pendientes += 1
+        if self._pendientes >= self.cada:
+            self.emitir()
+
+    def emitir(self):
+        if not self._pendientes:
+            return
+        self._pendientes = 0
+        hechas = self.procesadas + self.fallidas
+        segundos = time.perf_counter() - self._inicio
+        self.logger.info(
+            f"Progreso {hechas}/{self.total} páginas",
+            extra={
+                "paginas_procesadas": self.procesadas,
+                "paginas_fallidas": self.fallidas,
+                "filas": self.filas,
+                "paginas_por_segundo": round(hechas / segundos, 2) if segundos else None,
+            },
+        )
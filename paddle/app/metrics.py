@@ -0,0 +1,44 @@
+"""
+Métricas Prometheus del servicio OCR
+
+Se exponen en GET /metrics junto con las métricas de proceso por defecto
+de prometheus_client (process_resident_memory_bytes, CPU, etc.).
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets en segundos: de unos ms (layout) a minutos (Excel de 400 páginas)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+ETAPA_SEGUNDOS = Histogram(
+    "ocr_etapa_segundos",
+    "Duración por etapa del pipeline OCR",
+    ["etapa"],
+    buckets=BUCKETS_SEGUNDOS,
+)
+
+PAGINAS_PROCESADAS = Counter(
+    "ocr_paginas_procesadas_total", "Páginas procesadas con éxito"
+)
+
+PAGINAS_FALLIDAS = Counter("ocr_paginas_fallidas_total", "Páginas con error de OCR")
+
+TRABAJOS = Gauge("ocr_trabajos", "Trabajos OCR por estado", ["estado"])
+
+
+def registrar(etapa: str, segundos: float):
+    """Registra una duración ya medida en ocr_etapa_segundos{etapa=...}"""
+    ETAPA_SEGUNDOS.labels(etapa=etapa).observe(segundos)
+
+
+@contextmanager
+def medir(etapa: str):
+    """Registra la duración del bloque en ocr_etapa_segundos{etapa=...}"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(etapa, time.perf_counter() - inicio)
@@ -0,0 +1,314 @@
+"""
+Motores OCR intercambiables para OCRProcessor
+
+Todo motor expone `ocr(entrada)` y devuelve una lista (una por entrada)
+de dicts con `rec_texts`, `rec_boxes` ([x_min, y_min, x_max, y_max]) y,
+si existen, `rec_scores`. La entrada puede ser una ruta, un array BGR o
+una lista de ellos.
+
+Los motores de detección (MotorDeteccion) exponen `detectar(entrada)`, que
+devuelve solo geometría: dicts con `boxes` ([x_min, y_min, x_max, y_max]) y
+`scores`. Todo motor OCR sirve también como motor de detección.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def resultado_vacio() -> dict:
+    """Resultado sin textos"""
+    return {"rec_texts": [], "rec_boxes": np.zeros((0, 4)), "rec_scores": []}
+
+
+def normalizar_resultado(result) -> dict:
+    """Convierte un resultado de PaddleOCR (o dict) al formato común"""
+    if not result:
+        return resultado_vacio()
+
+    boxes = np.asarray(result["rec_boxes"])
+    if not len(boxes):
+        boxes = np.zeros((0, 4))
+
+    scores = result["rec_scores"] if "rec_scores" in result else []
+    return {
+        "rec_texts": list(result["rec_texts"]),
+        "rec_boxes": boxes,
+        "rec_scores": [float(s) for s in scores],
+    }
+
+
+def clave_entrada(entrada) -> str:
+    """
+    Clave estable de una entrada: nombre del archivo para rutas o hash
+    del contenido para arrays (recortes de ROI / columnas)
+    """
+    if isinstance(entrada, (str, Path)):
+        return Path(entrada).name
+
+    array = np.ascontiguousarray(entrada)
+    digest = hashlib.sha1(array.tobytes())
+    digest.update(str(array.shape).encode())
+    return f"sha1-{digest.hexdigest()[:20]}"
+
+
+class MotorDeteccion(ABC):
+    """Interfaz de motor que solo localiza textos (sin reconocerlos)"""
+
+    nombre = "base"
+
+    @abstractmethod
+    def detectar(self, entrada):
+        """Lista (una por entrada) de {boxes, scores}"""
+
+
+class MotorOCR(MotorDeteccion):
+    """Interfaz base de motor OCR"""
+
+    def ocr(self, entrada):
+        """Lista de resultados (uno por entrada); los motores con lotes lo sobrescriben"""
+        entradas = entrada if isinstance(entrada, list) else [entrada]
+        return [self.ocr_una(e) for e in entradas]
+
+    @abstractmethod
+    def ocr_una(self, entrada) -> dict:
+        """Resultado normalizado de una sola entrada"""
+
+    def detectar(self, entrada):
+        """
+        Solo geometría de los textos
+
+        Por defecto corre el OCR completo y descarta los textos (sirve para
+        replay / memoria); los motores de detección lo sobrescriben.
+        """
+        return [
+            {"boxes": r["rec_boxes"], "scores": list(r.get("rec_scores", []))}
+            for r in self.ocr(entrada)
+        ]
+
+
+class MotorPaddle(MotorOCR):
+    """PaddleOCR real (import diferido para no requerirlo en otros motores)"""
+
+    nombre = "paddle"
+
+    def __init__(self, **paddle_kwargs):
+        from paddleocr import PaddleOCR
+
+        self.paddle_kwargs = paddle_kwargs
+        self._ocr = PaddleOCR(**paddle_kwargs)
+
+    def ocr(self, entrada):
+        resultados = self._ocr.ocr(entrada) or []
+        return [normalizar_resultado(r) for r in resultados]
+
+    def ocr_una(self, entrada) -> dict:
+        resultados = self.ocr(entrada)
+        return resultados[0] if resultados else resultado_vacio()
+
+
+def cajas_de_poligonos(polys) -> np.ndarray:
+    """Polígonos de detección (N, 4, 2) a cajas alineadas [x_min, y_min, x_max, y_max]"""
+    polys = np.asarray(polys, dtype=np.float64)
+    if not len(polys):
+        return np.zeros((0, 4))
+    return np.concatenate([polys.min(axis=1), polys.max(axis=1)], axis=1)
+
+
+# Kwargs de PaddleOCR que acepta también el detector suelto
+KWARGS_DETECCION = ("device", "cpu_threads", "enable_mkldnn", "precision")
+
+
+class MotorDeteccionPaddle(MotorDeteccion):
+    """
+    Solo el detector de texto de PaddleOCR (sin reconocimiento)
+
+    Usa el mismo modelo de detección que el perfil, así las cajas coinciden
+    con las del OCR completo.
+    """
+
+    nombre = "paddle_det"
+
+    def __init__(self, **paddle_kwargs):
+        from paddleocr import TextDetection
+
+        kwargs = {k: paddle_kwargs[k] for k in KWARGS_DETECCION if k in paddle_kwargs}
+        if "text_detection_model_name" in paddle_kwargs:
+            kwargs["model_name"] = paddle_kwargs["text_detection_model_name"]
+        self._det = TextDetection(**kwargs)
+
+    def detectar(self, entrada):
+        resultados = self._det.predict(entrada) or []
+        return [
+            {
+                "boxes": cajas_de_poligonos(r["dt_polys"]),
+                "scores": [float(s) for s in r["dt_scores"]],
+            }
+            for r in resultados
+        ]
+
+
+class MotorMemoria(MotorOCR):
+    """
+    Motor determinista que sirve resultados ya conocidos
+
+    Args:
+        resultados: Dict {clave_entrada: {rec_texts, rec_boxes, ...}}
+        faltantes: Qué hacer con entradas sin resultado:
+            "error" (KeyError), "vacio" (sin textos) o "ciclo" (reusa los
+            resultados conocidos en orden, útil para pruebas de escala)
+        latencia_ms: Latencia simulada por llamada
+    """
+
+    nombre = "memoria"
+
+    def __init__(
+        self, resultados: dict, faltantes: str = "vacio", latencia_ms: float = 0
+    ):
+        self.resultados = resultados
+        self.faltantes = faltantes
+        self.latencia_ms = latencia_ms
+        self._claves = sorted(resultados)
+        self._siguiente = 0
+
+    def ocr(self, entrada):
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        return super().ocr(entrada)
+
+    def _buscar(self, clave: str) -> Optional[dict]:
+        return self.resultados.get(clave)
+
+    def ocr_una(self, entrada) -> dict:
+        clave = clave_entrada(entrada)
+        result = self._buscar(clave)
+        if result is not None:
+            return normalizar_resultado(result)
+
+        if self.faltantes == "error":
+            raise KeyError(f"Sin resultado OCR grabado para '{clave}'")
+        if self.faltantes == "ciclo" and self._claves:
+            clave = self._claves[self._siguiente % len(self._claves)]
+            self._siguiente += 1
+            return normalizar_resultado(self._buscar(clave))
+        return resultado_vacio()
+
+
+class MotorReplay(MotorMemoria):
+    """
+    Sirve resultados grabados en disco por MotorGrabador
+    (un `<clave>.json` por entrada dentro de `carpeta`)
+    """
+
+    nombre = "replay"
+
+    def __init__(self, carpeta: str, faltantes: str = "vacio", latencia_ms: float = 0):
+        self.carpeta = Path(carpeta)
+        if not self.carpeta.exists():
+            raise FileNotFoundError(f"No existe la carpeta de OCR grabado: {carpeta}")
+
+        claves = {p.stem: None for p in self.carpeta.glob("*.json")}
+        super().__init__(claves, faltantes=faltantes, latencia_ms=latencia_ms)
+
+    def _buscar(self, clave: str) -> Optional[dict]:
+        if clave not in self.resultados:
+            return None
+        if self.resultados[clave] is None:
+            with open(self.carpeta / f"{clave}.json") as f:
+                self.resultados[clave] = json.load(f)
+        return self.resultados[clave]
+
+
+class MotorGrabador(MotorOCR):
+    """Envuelve otro motor y graba cada resultado en disco para replay"""
+
+    def __init__(self, motor: MotorOCR, carpeta: str):
+        self.motor = motor
+        self.carpeta = Path(carpeta)
+        self.carpeta.mkdir(parents=True, exist_ok=True)
+        self.nombre = f"{motor.nombre}+grabador"
+
+    def ocr(self, entrada):
+        entradas = entrada if isinstance(entrada, list) else [entrada]
+        resultados = self.motor.ocr(entrada)
+        for e, result in zip(entradas, resultados):
+            guardar_resultado(self.carpeta / f"{clave_entrada(e)}.json", result)
+        return resultados
+
+    def ocr_una(self, entrada) -> dict:
+        return self.ocr(entrada)[0]
+
+
+def guardar_resultado(path: Path, result: dict):
+    """Escribe un resultado normalizado como JSON compacto"""
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "rec_texts": list(result["rec_texts"]),
+                "rec_boxes": np.asarray(result["rec_boxes"]).tolist(),
+                "rec_scores": list(result.get("rec_scores", [])),
+            },
+            f,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+
+def crear_motor(
+    nombre: str = "paddle",
+    paddle_kwargs: Optional[dict] = None,
+    replay_dir: Optional[str] = None,
+    grabar_dir: Optional[str] = None,
+    faltantes: str = "vacio",
+) -> MotorOCR:
+    """
+    Construye un motor por nombre
+
+    Args:
+        nombre: "paddle" o "replay"
+        paddle_kwargs: kwargs de PaddleOCR (motor "paddle")
+        replay_dir: Carpeta con resultados grabados (motor "replay")
+        grabar_dir: Si se indica, graba los resultados en esa carpeta
+        faltantes: Política del replay para entradas sin grabar
+    """
+    if nombre == "paddle":
+        motor = MotorPaddle(**(paddle_kwargs or {}))
+    elif nombre == "replay":
+        if not replay_dir:
+            raise ValueError("El motor 'replay' requiere replay_dir")
+        motor = MotorReplay(replay_dir, faltantes=faltantes)
+    else:
+        raise ValueError(f"Motor OCR desconocido: '{nombre}'")
+
+    if grabar_dir:
+        motor = MotorGrabador(motor, grabar_dir)
+
+    logger.info(f"Motor OCR: {motor.nombre}")
+    return motor
+
+
+def crear_motor_deteccion(
+    nombre: str = "paddle",
+    paddle_kwargs: Optional[dict] = None,
+    replay_dir: Optional[str] = None,
+) -> MotorDeteccion:
+    """
+    Construye un motor para `detectar()`
+
+    "paddle" carga solo el detector; "replay" reutiliza las cajas grabadas.
+    """
+    if nombre == "paddle":
+        motor = MotorDeteccionPaddle(**(paddle_kwargs or {}))
+    else:
+        motor = crear_motor(nombre, paddle_kwargs, replay_dir)
+
+    logger.info(f"Motor de detección: {motor.nombre}")
+    return motor
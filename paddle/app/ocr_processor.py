@@ -1,19 +1,28 @@
 import pandas as pd
 import numpy as np
-from paddleocr import PaddleOCR
 from pathlib import Path
-from typing import List, Optional, NamedTuple
+from typing import List, Optional, NamedTuple, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import gc
+import os
 from PIL import Image
 import json
 import re
 import unicodedata
+import time
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+from metrics import medir, registrar
+from ocr_engines import MotorGrabador, crear_motor, crear_motor_deteccion
+from preprocesado import preprocesar, resolver_opciones
+
+# Logging (configurado por el servicio, ver logging_config)
 logger = logging.getLogger(__name__)
 
+# Rutas calientes: por fila y por página (silenciosas por defecto)
+logger_filas = logging.getLogger(f"{__name__}.filas")
+logger_paginas = logging.getLogger(f"{__name__}.paginas")
+
 
 # ========================
 # FUNCIONES DE UTILIDAD
@@ -123,7 +132,7 @@ def detectar_marcas_modelos(
             marca_actual = marca_encontrada
             if marca_actual != (marcas[-1] if marcas else None):
                 modelo_actual = None
-            logger.info(f"Fila {idx}: Nueva marca → {marca_actual}")
+            logger_filas.debug("Fila %s: Nueva marca → %s", idx, marca_actual)
 
         if marca_actual and marca_actual in modelos_por_marca:
             modelo_encontrado = buscar_en_fila(
@@ -131,7 +140,7 @@ def detectar_marcas_modelos(
             )
             if modelo_encontrado:
                 modelo_actual = modelo_encontrado
-                logger.info(f"Fila {idx}: Nuevo modelo → {modelo_actual}")
+                logger_filas.debug("Fila %s: Nuevo modelo → %s", idx, modelo_actual)
 
         marcas.append(marca_actual)
         modelos.append(modelo_actual)
@@ -141,7 +150,6 @@ def detectar_marcas_modelos(
 
 def separar_anio_y_resto(texto):
     """Separa año del resto del texto, devolviendo el original si falla"""
-    print(texto)
     if pd.isna(texto) or texto == "":
         return pd.Series([np.nan, ""])
 
@@ -152,7 +160,7 @@ def separar_anio_y_resto(texto):
     match = re.match(r"^(\d{4})Q\d+", texto_str, re.IGNORECASE)
     if match:
         anio = match.group(1)
-        logger.info(f"  Detectado año con trimestre: {texto_str} → {anio}")
+        logger_filas.debug("Detectado año con trimestre: %s → %s", texto_str, anio)
         return pd.Series([anio, ""])
 
     # Patrón 2: Año + espacio + texto
@@ -166,13 +174,154 @@ def separar_anio_y_resto(texto):
         return pd.Series([match.group(1), ""])
 
     # Fallback: Si no coincide ningún patrón, devolver texto original
-    logger.warning(f"⚠️ No se detectó patrón en '{texto_str}', devolviendo original")
+    logger_filas.debug("No se detectó patrón en '%s', devolviendo original", texto_str)
     return pd.Series([np.nan, texto_original])
 
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+
+# Ancho mínimo (px) de una franja en modo columnas
+ANCHO_MIN_FRANJA = 8
+
+# Parámetros base de PaddleOCR (comunes a todos los perfiles)
+PADDLE_BASE = {
+    "use_doc_orientation_classify": False,
+    "use_doc_unwarping": False,
+    "lang": "es",
+}
+
+# Perfiles de motor OCR seleccionables por trabajo
+PERFILES_OCR = {
+    # Modelos por defecto de PaddleOCR para español
+    "default": {},
+    # Modelos móviles en CPU (nodos sin GPU)
+    "movil_cpu": {
+        "text_detection_model_name": "PP-OCRv5_mobile_det",
+        "text_recognition_model_name": "latin_PP-OCRv5_mobile_rec",
+        "device": "cpu",
+        "enable_mkldnn": True,
+        "cpu_threads": 8,
+    },
+    # Modelos móviles en GPU con media precisión
+    "movil_gpu": {
+        "text_detection_model_name": "PP-OCRv5_mobile_det",
+        "text_recognition_model_name": "latin_PP-OCRv5_mobile_rec",
+        "device": "gpu",
+        "precision": "fp16",
+    },
+    # Detector de servidor (más preciso, más lento) en GPU
+    "servidor_gpu": {
+        "text_detection_model_name": "PP-OCRv5_server_det",
+        "device": "gpu",
+        "precision": "fp32",
+    },
+}
+
+# Opciones que se pueden sobrescribir por trabajo
+OPCIONES_OCR = ("device", "cpu_threads", "enable_mkldnn", "precision")
+
+
+def resolver_perfil_ocr(perfil: str, opciones: Optional[dict] = None) -> dict:
+    """
+    Construye los kwargs de PaddleOCR para un perfil
+
+    Args:
+        perfil: Nombre del perfil en PERFILES_OCR
+        opciones: Sobrescrituras (solo claves de OPCIONES_OCR, None se ignora)
+
+    Returns:
+        Dict de kwargs para PaddleOCR
+    """
+    if perfil not in PERFILES_OCR:
+        raise ValueError(
+            f"Perfil OCR desconocido '{perfil}'. Disponibles: {', '.join(PERFILES_OCR)}"
+        )
+
+    kwargs = {**PADDLE_BASE, **PERFILES_OCR[perfil]}
+    for clave, valor in (opciones or {}).items():
+        if clave not in OPCIONES_OCR:
+            raise ValueError(f"Opción OCR no soportada: '{clave}'")
+        if valor is not None:
+            kwargs[clave] = valor
+    return kwargs
+
+
+# Agrupación de textos en filas: "fija" (distancia `line_gap` entre Y
+# consecutivas) o "adaptativa" (altura de fila estimada por página)
+AGRUPACIONES = ("fija", "adaptativa")
+
+# Modo adaptativo: salto entre centros (en alturas de fila) que abre fila nueva
+UMBRAL_FILA = 0.5
+
+# Hilos que preprocesan las páginas de un lote (OpenCV suelta el GIL)
+PREPROCESADO_WORKERS = int(os.getenv("PREPROCESADO_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def agrupar_filas_adaptativo(
+    y_min, y_max, x_min=None, x_max=None, umbral: float = UMBRAL_FILA
+) -> np.ndarray:
+    """
+    Asigna una fila a cada caja según la altura de fila de la página
+
+    La altura de fila es la mediana de la altura de las cajas, así que no
+    depende de la escala ni del DPI. Las cajas se ordenan por su centro
+    vertical y se abre fila donde el salto entre centros consecutivos
+    supera `umbral` alturas (el centro ya no cae dentro de la fila
+    anterior). Una fila que termina más alta que una altura de fila puede
+    ser una fila inclinada o dos filas encadenadas; si dos de sus cajas se
+    enciman en X (misma columna) son dos filas y se vuelve a partir en
+    bandas de `umbral` alturas.
+
+    Args:
+        y_min, y_max: Bordes verticales de las cajas
+        x_min, x_max: Bordes horizontales (sin ellos toda fila alta se parte)
+        umbral: Fracción de la altura de fila
+
+    Returns:
+        Arreglo con el número de fila de cada caja (0 = la más alta)
+    """
+    y_min = np.asarray(y_min, dtype=np.float64)
+    y_max = np.asarray(y_max, dtype=np.float64)
+    n = len(y_min)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    alto_fila = max(float(np.median(y_max - y_min)), 1.0)
+    centros = (y_min + y_max) / 2
+    orden = np.argsort(centros, kind="stable")
+    c = centros[orden]
+
+    nueva = np.empty(n, dtype=bool)
+    nueva[0] = True
+    nueva[1:] = np.diff(c) > umbral * alto_fila
+
+    # Filas encadenadas: bandas desde el primer centro (searchsorted por banda)
+    inicios = np.flatnonzero(nueva)
+    fines = np.append(inicios[1:], n)
+    for a, b in zip(inicios, fines):
+        if c[b - 1] - c[a] <= alto_fila:
+            continue
+        if x_min is not None and not _cajas_encimadas_x(
+            np.asarray(x_min, dtype=np.float64)[orden[a:b]],
+            np.asarray(x_max, dtype=np.float64)[orden[a:b]],
+        ):
+            continue
+        inicio = a
+        while inicio < b:
+            nueva[inicio] = True
+            inicio = a + int(
+                np.searchsorted(c[a:b], c[inicio] + umbral * alto_fila, side="right")
+            )
+
+    filas = np.empty(n, dtype=np.int64)
+    filas[orden] = np.cumsum(nueva) - 1
+    return filas
+
+
+def _cajas_encimadas_x(x_min: np.ndarray, x_max: np.ndarray) -> bool:
+    """¿Alguna caja empieza antes de que termine la anterior (ordenadas por X)?"""
+    orden = np.argsort(x_min)
+    fin_previo = np.maximum.accumulate(x_max[orden])[:-1]
+    return bool(np.any(x_min[orden][1:] < fin_previo))
 
 
 class ExcelResult(NamedTuple):
@@ -183,6 +332,8 @@ class ExcelResult(NamedTuple):
     output_path: Optional[str] = None
     image_path: Optional[str] = None
     error_msg: Optional[str] = None
+    # Tokens OCR crudos en coordenadas de la página (para ocr_store)
+    tokens: Optional[dict] = None
 
 
 class OCRProcessor:
@@ -193,42 +344,155 @@ class OCRProcessor:
     """
 
     def __init__(
-        self, line_gap: float = 6.5, use_gpu: bool = True, use_fast_model: bool = True
+        self,
+        line_gap: float = 6.5,
+        use_gpu: bool = True,
+        use_fast_model: bool = False,
+        perfil: Optional[str] = None,
+        opciones_ocr: Optional[dict] = None,
+        motor_ocr=None,
+        motor: str = "paddle",
+        replay_dir: Optional[str] = None,
+        grabar_ocr_dir: Optional[str] = None,
+        gc_interval: int = 0,
+        recortar_roi: bool = False,
+        roi_margen: int = 40,
+        roi_banda: Optional[Tuple[Optional[int], Optional[int]]] = None,
+        modo: str = "pagina",
+        max_lado: Optional[int] = None,
+        dpi_objetivo: Optional[float] = None,
+        dpi_origen: float = 150,
+        altura_texto_objetivo: Optional[float] = None,
+        texto_nativo_dir: Optional[str] = None,
+        ocr_reutilizado_dir: Optional[str] = None,
+        agrupacion: str = "fija",
+        preprocesado=None,
     ):
         """
         Inicializa el procesador
 
         Args:
             line_gap: Espaciado en líneas para agrupar texto
-            use_gpu: Usar GPU si disponible
-            use_fast_model: Usar modelo móvil rápido (PP-OCRv3)
+            use_gpu: Usar GPU si disponible (False fuerza CPU)
+            use_fast_model: Usar modelos móviles si no se indica `perfil`
+            perfil: Perfil de motor en PERFILES_OCR (None = según flags)
+            opciones_ocr: Sobrescrituras del perfil (device, cpu_threads,
+                enable_mkldnn, precision)
+            motor_ocr: Motor ya construido (ver ocr_engines); tiene prioridad
+                sobre `motor`
+            motor: Motor a construir: "paddle" (según el perfil) o "replay"
+            replay_dir: Carpeta con resultados grabados (motor "replay")
+            grabar_ocr_dir: Carpeta donde grabar cada resultado para replay
+            gc_interval: Cada cuántas imágenes forzar gc.collect()
+                (0 = nunca, se confía en buffers acotados)
+            recortar_roi: Recortar la página al área entre los cortes extremos
+            roi_margen: Margen en px alrededor de los cortes extremos
+            roi_banda: Banda vertical (y_min, y_max) en px; None = página completa
+            modo: "pagina" (OCR de la página completa), "columnas"
+                (OCR por franja vertical entre cortes) o "deteccion" (solo
+                cajas de texto, ver `detectar_lote`)
+            max_lado: Lado mayor máximo (px) de la imagen enviada al OCR
+            dpi_objetivo: DPI al que se reduce la imagen antes del OCR
+            dpi_origen: DPI con el que se rasterizaron las imágenes
+            altura_texto_objetivo: Altura de texto (px) deseada; la escala
+                se adapta con la altura medida en la página anterior
+            texto_nativo_dir: Carpeta con la capa de texto de PDFs digitales
+                (`<imagen>.json`, escrita por el backend); esas páginas no
+                pasan por el OCR
+            ocr_reutilizado_dir: Carpeta con tokens OCR de páginas idénticas
+                ya procesadas en otro proyecto (mismo formato que
+                `texto_nativo_dir`); tampoco pasan por el OCR
+            agrupacion: "fija" (textos en la misma fila si su Y difiere a
+                lo más `line_gap` de la anterior) o "adaptativa" (altura de
+                fila estimada por página, ver agrupar_filas_adaptativo)
+            preprocesado: None/False (desactivado), True u opciones de
+                preprocesado.OPCIONES_DEFAULT (enderezar, contraste,
+                binarizar); la transformación de cada página queda en
+                `transformaciones`
         """
+        if agrupacion not in AGRUPACIONES:
+            raise ValueError(
+                f"Agrupación desconocida '{agrupacion}'. Disponibles: {', '.join(AGRUPACIONES)}"
+            )
         self.line_gap = line_gap
+        self.agrupacion = agrupacion
+        self.preprocesado = resolver_opciones(preprocesado)
+        self.transformaciones = {}
         self.use_gpu = use_gpu
         self.use_fast_model = use_fast_model
+        self.gc_interval = gc_interval
+        self._imagenes_desde_gc = 0
+        self.recortar_roi = recortar_roi
+        self.roi_margen = roi_margen
+        self.roi_banda = roi_banda
+        self.modo = modo
+        self.max_lado = max_lado
+        self.dpi_objetivo = dpi_objetivo
+        self.dpi_origen = dpi_origen
+        self.altura_texto_objetivo = altura_texto_objetivo
+        self._altura_texto_estimada = None
+        self.texto_nativo_dir = Path(texto_nativo_dir) if texto_nativo_dir else None
+        self.paginas_nativas = 0
+        self.ocr_reutilizado_dir = Path(ocr_reutilizado_dir) if ocr_reutilizado_dir else None
+        self.paginas_reutilizadas = 0
+
+        if perfil is None:
+            if use_fast_model:
+                perfil = "movil_gpu" if use_gpu else "movil_cpu"
+            else:
+                perfil = "default"
+
+        opciones_ocr = dict(opciones_ocr or {})
+        if not use_gpu:
+            opciones_ocr["device"] = "cpu"
+
+        self.perfil = perfil
+        self.paddle_kwargs = resolver_perfil_ocr(perfil, opciones_ocr)
+
+        if motor_ocr is not None:
+            self.ocr = (
+                MotorGrabador(motor_ocr, grabar_ocr_dir) if grabar_ocr_dir else motor_ocr
+            )
+            return
 
         # Inicializar OCR
         try:
-            logger.info("🔄 Inicializando PaddleOCR...")
-            self.ocr = PaddleOCR(
-                use_doc_orientation_classify=False, use_doc_unwarping=False, lang="es"
-            )
-            logger.info("✅ PaddleOCR inicializado")
+            logger.info(f"🔄 Inicializando motor OCR '{motor}' (perfil '{perfil}')...")
+            if modo == "deteccion":
+                self.ocr = crear_motor_deteccion(
+                    motor, paddle_kwargs=self.paddle_kwargs, replay_dir=replay_dir
+                )
+            else:
+                self.ocr = crear_motor(
+                    motor,
+                    paddle_kwargs=self.paddle_kwargs,
+                    replay_dir=replay_dir,
+                    grabar_dir=grabar_ocr_dir,
+                )
+            logger.info("✅ Motor OCR inicializado")
         except Exception as e:
-            logger.error(f"❌ Error inicializando PaddleOCR: {e}")
+            logger.error(f"❌ Error inicializando motor OCR: {e}")
             raise
 
-    def procesar_imagen(self, img_path: str, lineas_array: List[float]) -> ExcelResult:
+    def procesar_imagen(
+        self, img_path: str, lineas_array: List[float], preparada=None
+    ) -> ExcelResult:
         """
         Procesa imagen con OCR usando array de líneas
 
         Args:
             img_path: Ruta a la imagen
             lineas_array: Array de posiciones Y de líneas [100, 300, 500]
+            preparada: Future con la entrada ya preparada (ver procesar_lote)
 
         Returns:
             ExcelResult con DataFrame procesado
         """
+        if self.modo == "columnas":
+            return self._procesar_lote_columnas([(img_path, lineas_array)])[0]
+        if self.modo == "deteccion":
+            raise ValueError("En modo 'deteccion' usa detectar_lote()")
+
         try:
             img_path = Path(img_path)
 
@@ -237,50 +501,613 @@ class OCRProcessor:
                     success=False, error_msg=f"Imagen no encontrada: {img_path}"
                 )
 
-            logger.info(
-                f"🔍 Procesando {img_path.name} con {len(lineas_array)} líneas..."
+            if self._tokens_guardados(img_path):
+                return self._procesar_tokens_guardados(img_path, lineas_array)
+
+            logger_paginas.debug(
+                "Procesando %s con %s líneas", img_path.name, len(lineas_array)
+            )
+
+            # Preprocesar, recortar a la región de interés y reducir resolución (si aplica)
+            entrada, offset, escala, transformacion = (
+                preparada.result()
+                if preparada is not None
+                else self._preparar_entrada(img_path, lineas_array)
             )
 
             # Ejecutar OCR
-            ocr_result = self.ocr.ocr(str(img_path))
+            with medir("inferencia"):
+                ocr_result = self.ocr.ocr(entrada)
 
-            if not ocr_result or not ocr_result[0]:
+            if not ocr_result or not len(ocr_result[0]["rec_texts"]):
                 return ExcelResult(
                     success=False, error_msg=f"OCR no extrajo texto de {img_path.name}"
                 )
 
-            # Convertir OCR a DataFrame
-            df = self._ocr_to_dataframe(ocr_result[0], lineas_array)
+            # Convertir OCR a DataFrame (coordenadas de la página completa;
+            # con preprocesado, de la página enderezada)
+            with medir("layout"):
+                result = self._trasladar_cajas(ocr_result[0], offset, escala)
+                self._actualizar_altura_texto(result["rec_boxes"])
+                if transformacion is None:
+                    df = self._ocr_to_dataframe(result, lineas_array)
+                else:
+                    df = self._ocr_to_dataframe(
+                        result, transformacion.mapear_cortes(lineas_array)
+                    )
+                    result = self._cajas_a_original(result, transformacion)
+                    self.transformaciones[img_path.name] = transformacion.a_dict()
 
-            logger.info(f"✅ {img_path.name}: {len(df)} registros extraídos")
+            logger_paginas.debug("%s: %s registros extraídos", img_path.name, len(df))
 
             # Limpiar memoria
             del ocr_result
-            gc.collect()
+            self._liberar_memoria()
 
             return ExcelResult(
-                success=True, df=df, output_path=None, image_path=str(img_path)
+                success=True,
+                df=df,
+                output_path=None,
+                image_path=str(img_path),
+                tokens=result,
             )
 
         except Exception as e:
             logger.error(f"Error adentro procesando {img_path}: {e}")
             return ExcelResult(success=False, error_msg=str(e))
 
+    def procesar_lote(
+        self, items: List[Tuple[str, List[float]]]
+    ) -> List[ExcelResult]:
+        """
+        Procesa varias imágenes con sus arrays de líneas
+
+        En modo "columnas" todas las franjas del lote se envían al OCR
+        en una sola llamada. Con preprocesado, las páginas del lote se
+        preparan en hilos mientras el OCR infiere las anteriores.
+
+        Args:
+            items: Lista de (ruta_imagen, lineas_array)
+
+        Returns:
+            Lista de ExcelResult en el mismo orden que `items`
+        """
+        if self.modo != "columnas":
+            pool = self._pool_preparacion(len(items))
+            if pool is None:
+                return [self.procesar_imagen(img, lineas) for img, lineas in items]
+
+            with pool:
+                preparadas = [
+                    pool.submit(self._preparar_entrada, Path(img), lineas)
+                    if Path(img).exists() and not self._tokens_guardados(Path(img))
+                    else None
+                    for img, lineas in items
+                ]
+                return [
+                    self.procesar_imagen(img, lineas, preparada)
+                    for (img, lineas), preparada in zip(items, preparadas)
+                ]
+
+        # Las páginas con texto nativo u OCR reutilizado no entran al lote de franjas
+        resultados = [None] * len(items)
+        pendientes = []
+        for i, (img, lineas) in enumerate(items):
+            if Path(img).exists() and self._tokens_guardados(Path(img)):
+                resultados[i] = self._procesar_tokens_guardados(Path(img), lineas)
+            else:
+                pendientes.append(i)
+
+        if pendientes:
+            lote = self._procesar_lote_columnas([items[i] for i in pendientes])
+            for i, result in zip(pendientes, lote):
+                resultados[i] = result
+        return resultados
+
+    def _tokens_guardados(self, img_path: Path) -> Optional[Tuple[str, Path]]:
+        """
+        Tokens ya conocidos de la imagen, sin correr el OCR
+
+        Returns:
+            ("texto_nativo" | "ocr_reutilizado", ruta) o None; la capa de
+            texto del PDF tiene prioridad
+        """
+        for fuente, carpeta in (
+            ("texto_nativo", self.texto_nativo_dir),
+            ("ocr_reutilizado", self.ocr_reutilizado_dir),
+        ):
+            if carpeta is None:
+                continue
+            path = carpeta / f"{img_path.name}.json"
+            if path.exists():
+                return fuente, path
+        return None
+
+    def _procesar_tokens_guardados(
+        self, img_path: Path, lineas_array: List[float]
+    ) -> ExcelResult:
+        """
+        Arma la página desde tokens guardados (sin inferencia)
+
+        La capa de texto del PDF y el OCR reutilizado ya vienen en
+        coordenadas de la imagen a 150 DPI, así que pasan por la misma
+        agrupación en filas y columnas que el OCR.
+        """
+        try:
+            fuente, path = self._tokens_guardados(img_path)
+            with medir(fuente):
+                with open(path) as f:
+                    result = json.load(f)
+                result["rec_boxes"] = np.asarray(
+                    result["rec_boxes"], dtype=np.float64
+                ).reshape(-1, 4)
+                result = self._filtrar_roi(img_path, result, lineas_array)
+
+                if not len(result["rec_texts"]):
+                    return ExcelResult(
+                        success=False,
+                        error_msg=f"Sin textos ({fuente}) en la ROI de {img_path.name}",
+                    )
+                df = self._ocr_to_dataframe(result, lineas_array)
+
+            if fuente == "texto_nativo":
+                self.paginas_nativas += 1
+            else:
+                self.paginas_reutilizadas += 1
+            logger_paginas.debug("%s: %s registros (%s)", img_path.name, len(df), fuente)
+            return ExcelResult(
+                success=True,
+                df=df,
+                output_path=None,
+                image_path=str(img_path),
+                tokens=result,
+            )
+        except Exception as e:
+            logger.error(f"Error leyendo tokens guardados de {img_path}: {e}")
+            return ExcelResult(success=False, error_msg=str(e))
+
+    def _filtrar_roi(self, img_path: Path, result: dict, lineas_array: List[float]):
+        """Descarta las frases fuera de la ROI, igual que lo haría el recorte"""
+        if not (self.recortar_roi or self.roi_banda):
+            return result
+
+        with Image.open(img_path) as img:
+            ancho, alto = img.size
+        caja = self._calcular_roi(
+            ancho, alto, lineas_array if self.recortar_roi else []
+        )
+        if caja is None:
+            return result
+
+        boxes = result["rec_boxes"]
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        dentro = (cx >= caja[0]) & (cx <= caja[2]) & (cy >= caja[1]) & (cy <= caja[3])
+        scores = result.get("rec_scores", [])
+        return {
+            "rec_texts": [t for t, d in zip(result["rec_texts"], dentro) if d],
+            "rec_boxes": boxes[dentro],
+            "rec_scores": (
+                [s for s, d in zip(scores, dentro) if d]
+                if len(scores) == len(dentro)
+                else []
+            ),
+        }
+
+    def detectar_lote(self, img_paths: List[str]) -> List[dict]:
+        """
+        Detecta cajas de texto sin reconocerlas (vista previa para colocar líneas)
+
+        Pensado para las imágenes de `baja_calidad`: las cajas quedan en
+        coordenadas de la imagen recibida.
+
+        Args:
+            img_paths: Rutas de las imágenes
+
+        Returns:
+            Lista (en el mismo orden) de {imagen, ancho, alto, boxes, scores}
+            o {imagen, error} si la imagen no se pudo leer
+        """
+        salida = [None] * len(img_paths)
+        entradas, posiciones = [], []
+        for i, img_path in enumerate(img_paths):
+            img_path = Path(img_path)
+            try:
+                with Image.open(img_path) as img:
+                    salida[i] = {"imagen": img_path.name, "ancho": img.width, "alto": img.height}
+                entradas.append(str(img_path))
+                posiciones.append(i)
+            except Exception as e:
+                salida[i] = {"imagen": img_path.name, "error": str(e)}
+
+        if entradas:
+            with medir("deteccion"):
+                detecciones = self.ocr.detectar(entradas)
+            for i, det in zip(posiciones, detecciones):
+                boxes = np.rint(np.asarray(det["boxes"], dtype=np.float64)).astype(int)
+                salida[i]["boxes"] = boxes.reshape(-1, 4).tolist()
+                salida[i]["scores"] = [round(float(s), 3) for s in det["scores"]]
+
+        return salida
+
+    def _recortar_franjas(self, img_path: Path, lineas_array: List[float]):
+        """
+        Corta la página en franjas verticales delimitadas por los cortes
+
+        Con preprocesado la página se endereza antes y los cortes se llevan
+        al marco enderezado.
+
+        Returns:
+            (franjas, transformacion): una franja por sección,
+            (array_bgr, x0, y0, escala) o None si es demasiado angosta;
+            transformacion es None sin preprocesado
+        """
+        cortes = sorted(lineas_array)
+        transformacion = None
+
+        with Image.open(img_path) as img:
+            img = img.convert("RGB")
+            if self.preprocesado:
+                img, transformacion = self._preprocesar(img)
+                cortes = sorted(transformacion.mapear_cortes(cortes))
+            ancho, alto = img.width, img.height
+            escala = self._calcular_escala(ancho, alto)
+
+            izquierda, derecha = 0, ancho
+            if self.recortar_roi and cortes:
+                izquierda = max(0, int(cortes[0] - self.roi_margen))
+                derecha = min(ancho, int(cortes[-1] + self.roi_margen))
+
+            y0, y1 = 0, alto
+            if self.roi_banda:
+                banda_min, banda_max = self.roi_banda
+                if banda_min is not None:
+                    y0 = max(0, int(banda_min))
+                if banda_max is not None:
+                    y1 = min(alto, int(banda_max))
+
+            bordes = [izquierda] + [int(c) for c in cortes] + [derecha]
+            franjas = []
+            for x0, x1 in zip(bordes[:-1], bordes[1:]):
+                x0, x1 = max(0, x0), min(ancho, x1)
+                if x1 - x0 < ANCHO_MIN_FRANJA or y1 <= y0:
+                    franjas.append(None)
+                    continue
+
+                recorte = self._reducir(img.crop((x0, y0, x1, y1)), escala)
+                franjas.append((self._a_bgr(recorte), x0, y0, escala))
+
+        return franjas, transformacion
+
+    def _procesar_lote_columnas(
+        self, items: List[Tuple[str, List[float]]]
+    ) -> List[ExcelResult]:
+        """OCR por franjas: la columna de cada texto se conoce por construcción"""
+        resultados = [None] * len(items)
+        tokens = [[] for _ in items]
+        crudos = [
+            {"rec_texts": [], "rec_boxes": [], "rec_scores": [], "cols": []}
+            for _ in items
+        ]
+        transformaciones = [None] * len(items)
+        franjas = []
+        origen = []
+
+        # Con preprocesado las páginas del lote se enderezan y recortan en hilos
+        pool = self._pool_preparacion(len(items))
+        preparadas = [
+            pool.submit(self._recortar_franjas, Path(img), lineas)
+            if pool is not None and Path(img).exists()
+            else None
+            for img, lineas in items
+        ]
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+        for i, (img_path, lineas_array) in enumerate(items):
+            img_path = Path(img_path)
+            if not img_path.exists():
+                resultados[i] = ExcelResult(
+                    success=False, error_msg=f"Imagen no encontrada: {img_path}"
+                )
+                continue
+
+            try:
+                recortes, transformaciones[i] = (
+                    preparadas[i].result()
+                    if preparadas[i] is not None
+                    else self._recortar_franjas(img_path, lineas_array)
+                )
+                for col, franja in enumerate(recortes):
+                    if franja is None:
+                        continue
+                    recorte, x0, y0, escala = franja
+                    franjas.append(recorte)
+                    origen.append((i, col, x0, y0, escala))
+            except Exception as e:
+                logger.error(f"Error recortando {img_path}: {e}")
+                resultados[i] = ExcelResult(success=False, error_msg=str(e))
+
+        logger_paginas.debug(
+            "OCR por columnas: %s franjas de %s imágenes", len(franjas), len(items)
+        )
+
+        if franjas:
+            try:
+                with medir("inferencia"):
+                    ocr_results = self.ocr.ocr(franjas)
+            except Exception as e:
+                logger.error(f"Error en OCR por columnas: {e}")
+                return [
+                    r if r is not None else ExcelResult(success=False, error_msg=str(e))
+                    for r in resultados
+                ]
+
+            for (i, col, x0, y0, escala), res in zip(origen, ocr_results or []):
+                if not res:
+                    continue
+                res = self._trasladar_cajas(res, (x0, y0), escala)
+                self._actualizar_altura_texto(res["rec_boxes"])
+                n = len(res["rec_texts"])
+                scores = res.get("rec_scores")
+                crudos[i]["rec_texts"].extend(res["rec_texts"])
+                crudos[i]["rec_boxes"].extend(np.asarray(res["rec_boxes"]).tolist())
+                crudos[i]["rec_scores"].extend(
+                    scores if scores is not None and len(scores) == n else [np.nan] * n
+                )
+                crudos[i]["cols"].extend([col] * n)
+                for text, box in zip(res["rec_texts"], res["rec_boxes"]):
+                    tokens[i].append(
+                        {
+                            "text": text.strip(),
+                            "x": box[0],
+                            "y": box[1],
+                            "x2": box[2],
+                            "y2": box[3],
+                            "col": col,
+                        }
+                    )
+
+            del ocr_results
+            del franjas
+
+        for i, (img_path, lineas_array) in enumerate(items):
+            if resultados[i] is not None:
+                continue
+
+            nombre = Path(img_path).name
+            if not tokens[i]:
+                resultados[i] = ExcelResult(
+                    success=False, error_msg=f"OCR no extrajo texto de {nombre}"
+                )
+                continue
+
+            with medir("layout"):
+                df = self._filas_por_seccion(
+                    self._agrupar_lineas(tokens[i]), None, len(lineas_array) + 1
+                )
+            if transformaciones[i] is not None:
+                crudos[i]["rec_boxes"] = (
+                    transformaciones[i].cajas_a_original(crudos[i]["rec_boxes"]).tolist()
+                )
+                self.transformaciones[nombre] = transformaciones[i].a_dict()
+            logger_paginas.debug("%s: %s registros extraídos", nombre, len(df))
+            resultados[i] = ExcelResult(
+                success=True,
+                df=df,
+                output_path=None,
+                image_path=str(img_path),
+                tokens=crudos[i],
+            )
+            self._liberar_memoria()
+
+        return resultados
+
+    def _calcular_roi(
+        self, ancho: int, alto: int, lineas_array: List[float]
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Calcula la caja (x0, y0, x1, y1) a recortar
+
+        Returns:
+            Caja en px de la página o None si no hay nada que recortar
+        """
+        x0, x1 = 0, ancho
+        if lineas_array:
+            x0 = max(0, int(min(lineas_array) - self.roi_margen))
+            x1 = min(ancho, int(max(lineas_array) + self.roi_margen))
+
+        y0, y1 = 0, alto
+        if self.roi_banda:
+            banda_min, banda_max = self.roi_banda
+            if banda_min is not None:
+                y0 = max(0, int(banda_min))
+            if banda_max is not None:
+                y1 = min(alto, int(banda_max))
+
+        if x1 <= x0 or y1 <= y0:
+            return None
+        if (x0, y0, x1, y1) == (0, 0, ancho, alto):
+            return None
+        return x0, y0, x1, y1
+
+    def _calcular_escala(self, ancho: int, alto: int) -> float:
+        """
+        Calcula el factor de reducción (<= 1) según la política de resolución
+
+        Se toma la escala más pequeña entre `max_lado`, `dpi_objetivo` y
+        `altura_texto_objetivo` (esta última usa la altura de texto medida
+        en las páginas anteriores).
+        """
+        escala = 1.0
+        if self.max_lado:
+            escala = min(escala, self.max_lado / max(ancho, alto, 1))
+        if self.dpi_objetivo:
+            escala = min(escala, self.dpi_objetivo / self.dpi_origen)
+        if self.altura_texto_objetivo and self._altura_texto_estimada:
+            escala = min(
+                escala, self.altura_texto_objetivo / self._altura_texto_estimada
+            )
+        return escala
+
+    def _actualizar_altura_texto(self, boxes):
+        """Guarda la mediana de altura de las cajas (px de la página)"""
+        if not self.altura_texto_objetivo:
+            return
+
+        boxes = np.asarray(boxes)
+        if len(boxes):
+            self._altura_texto_estimada = float(np.median(boxes[:, 3] - boxes[:, 1]))
+
+    @staticmethod
+    def _reducir(img: Image.Image, escala: float) -> Image.Image:
+        """Reduce la imagen por `escala` (no hace nada si escala >= 1)"""
+        if escala >= 1:
+            return img
+        nuevo = (max(1, round(img.width * escala)), max(1, round(img.height * escala)))
+        return img.resize(nuevo, Image.Resampling.LANCZOS)
+
+    @staticmethod
+    def _a_bgr(img: Image.Image) -> np.ndarray:
+        """Convierte imagen PIL RGB al array BGR que espera PaddleOCR"""
+        return np.ascontiguousarray(np.asarray(img)[:, :, ::-1])
+
+    def _preparar_entrada(self, img_path: Path, lineas_array: List[float]):
+        """
+        Prepara la entrada del OCR: ruta original, página preprocesada,
+        recorte de la ROI y/o imagen reducida
+
+        Con preprocesado el offset y la escala son del marco enderezado y la
+        ROI se calcula con los cortes ya mapeados a ese marco.
+
+        Returns:
+            tuple (entrada, (offset_x, offset_y), escala, transformacion);
+            transformacion es None sin preprocesado
+        """
+        if not (
+            self.preprocesado
+            or self.recortar_roi
+            or self.max_lado
+            or self.dpi_objetivo
+            or self.altura_texto_objetivo
+        ):
+            return str(img_path), (0, 0), 1.0, None
+
+        transformacion = None
+        with Image.open(img_path) as img:
+            if self.preprocesado:
+                img, transformacion = self._preprocesar(img.convert("RGB"))
+                lineas_array = transformacion.mapear_cortes(lineas_array)
+
+            escala = self._calcular_escala(img.width, img.height)
+            caja = None
+            if self.recortar_roi:
+                caja = self._calcular_roi(img.width, img.height, lineas_array)
+
+            if caja is None and escala >= 1 and transformacion is None:
+                return str(img_path), (0, 0), 1.0, None
+
+            img = img.convert("RGB")
+            if caja is not None:
+                img = img.crop(caja)
+            entrada = self._a_bgr(self._reducir(img, escala))
+
+        offset = (caja[0], caja[1]) if caja is not None else (0, 0)
+        return entrada, offset, escala, transformacion
+
+    def _preprocesar(self, img: Image.Image):
+        """
+        Endereza / normaliza una página RGB (ver preprocesado.preprocesar)
+
+        Returns:
+            (imagen RGB preprocesada, Transformacion)
+        """
+        with medir("preprocesado"):
+            salida, transformacion = preprocesar(self._a_bgr(img), self.preprocesado)
+        return Image.fromarray(np.ascontiguousarray(salida[:, :, ::-1])), transformacion
+
+    def _pool_preparacion(self, n_items: int) -> Optional[ThreadPoolExecutor]:
+        """Hilos para preparar las páginas de un lote (solo con preprocesado)"""
+        if not self.preprocesado or n_items < 2 or PREPROCESADO_WORKERS < 2:
+            return None
+        return ThreadPoolExecutor(
+            max_workers=min(n_items, PREPROCESADO_WORKERS),
+            thread_name_prefix="preprocesado",
+        )
+
+    @staticmethod
+    def _cajas_a_original(result, transformacion) -> dict:
+        """Regresa las cajas del marco enderezado a la página original"""
+        return {
+            "rec_texts": result["rec_texts"],
+            "rec_boxes": transformacion.cajas_a_original(result["rec_boxes"]),
+            "rec_scores": result.get("rec_scores", []),
+        }
+
+    @staticmethod
+    def _trasladar_cajas(result, offset, escala: float = 1.0):
+        """Regresa las cajas del recorte/reducción a coordenadas de la página"""
+        offset_x, offset_y = offset
+        if offset_x == 0 and offset_y == 0 and escala == 1:
+            return result
+
+        boxes = np.asarray(result["rec_boxes"])
+        if len(boxes):
+            boxes = boxes / escala + np.array([offset_x, offset_y, offset_x, offset_y])
+
+        return {
+            "rec_texts": result["rec_texts"],
+            "rec_boxes": boxes,
+            "rec_scores": result.get("rec_scores", []),
+        }
+
+    def _liberar_memoria(self):
+        """Fuerza gc.collect() solo cada `gc_interval` imágenes"""
+        if self.gc_interval <= 0:
+            return
+
+        self._imagenes_desde_gc += 1
+        if self._imagenes_desde_gc >= self.gc_interval:
+            gc.collect()
+            self._imagenes_desde_gc = 0
+
     def _ocr_to_dataframe(self, result, lineas_array=None):
         texts = result["rec_texts"]
         boxes = result["rec_boxes"]
 
-        print(f"✅ OCR extrajo {len(texts)} textos")
-        print(f"✅ OCR extrajo {len(boxes)} cajas")
-        print("🚀 Ordenando textos por posición...")
-        print(f"Líneas para cortes: {lineas_array}")
+        logger_paginas.debug(
+            "OCR extrajo %s textos / %s cajas; cortes: %s",
+            len(texts),
+            len(boxes),
+            lineas_array,
+        )
 
         # Extraer coordenadas y asociar texto
         data = []
         for text, box in zip(texts, boxes):
             x_min, y_min = box[0], box[1]
             text = text.strip()
-            data.append({"text": text, "x": x_min, "y": y_min})
+            data.append({"text": text, "x": x_min, "y": y_min, "x2": box[2], "y2": box[3]})
+
+        ordered_lines = self._agrupar_lineas(data)
+
+        # Si no se pasan cortes, devolvemos normal
+        if not lineas_array:
+            max_len = max(len(line) for line in ordered_lines)
+            ordered_filled = [
+                [i["text"] for i in line] + [""] * (max_len - len(line))
+                for line in ordered_lines
+            ]
+            return pd.DataFrame(ordered_filled)
+
+        # --- Usar cortes en X para dividir en secciones ---
+        cortes = sorted(lineas_array)
+        return self._filas_por_seccion(ordered_lines, cortes, len(cortes) + 1)
+
+    def _agrupar_lineas(self, data):
+        """Ordena los textos y los agrupa en líneas según `agrupacion`"""
+        if self.agrupacion == "adaptativa":
+            return self._agrupar_lineas_adaptativo(data)
 
         # Ordenar primero por Y (vertical) y luego por X (horizontal)
         data = sorted(data, key=lambda d: (d["y"], d["x"]))
@@ -301,19 +1128,32 @@ class OCRProcessor:
         if current_line:
             ordered_lines.append(current_line)
 
-        # Si no se pasan cortes, devolvemos normal
-        if not lineas_array:
-            max_len = max(len(line) for line in ordered_lines)
-            ordered_filled = [
-                [i["text"] for i in line] + [""] * (max_len - len(line))
-                for line in ordered_lines
-            ]
-            return pd.DataFrame(ordered_filled)
+        return ordered_lines
 
-        # --- Usar cortes en X para dividir en secciones ---
-        cortes = sorted(lineas_array)
-        n_sections = len(cortes) + 1
+    @staticmethod
+    def _agrupar_lineas_adaptativo(data):
+        """Filas por altura estimada de la página; dentro de cada fila, de izquierda a derecha"""
+        if not data:
+            return []
+
+        y_min = np.fromiter((d["y"] for d in data), dtype=np.float64, count=len(data))
+        y_max = np.fromiter((d["y2"] for d in data), dtype=np.float64, count=len(data))
+        x = np.fromiter((d["x"] for d in data), dtype=np.float64, count=len(data))
+        x2 = np.fromiter((d.get("x2", d["x"]) for d in data), dtype=np.float64, count=len(data))
+
+        filas = agrupar_filas_adaptativo(y_min, y_max, x, x2)
+        orden = np.lexsort((x, filas))
+        cortes = np.flatnonzero(np.diff(filas[orden])) + 1
+        return [[data[i] for i in grupo] for grupo in np.split(orden, cortes)]
 
+    @staticmethod
+    def _filas_por_seccion(ordered_lines, cortes, n_sections):
+        """
+        Reparte cada línea en secciones
+
+        Los textos con clave "col" (modo columnas) ya traen su sección;
+        el resto se asigna comparando su X contra los cortes.
+        """
         all_rows = []
         for line in ordered_lines:
             row = [""] * n_sections
@@ -321,13 +1161,15 @@ class OCRProcessor:
                 x = item["x"]
                 text = item["text"]
 
-                # Buscar en qué sección cae
-                section_idx = 0
-                for c in cortes:
-                    if x > c:
-                        section_idx += 1
-                    else:
-                        break
+                section_idx = item.get("col")
+                if section_idx is None:
+                    # Buscar en qué sección cae
+                    section_idx = 0
+                    for c in cortes:
+                        if x > c:
+                            section_idx += 1
+                        else:
+                            break
                 row[section_idx] += " " + text if row[section_idx] else text
 
             all_rows.append(row)
@@ -365,7 +1207,7 @@ class OCRProcessor:
             resultados[filename] = result
 
             progress = int((idx / total) * 100)
-            logger.info(f"[{progress}%] {idx}/{total} procesadas")
+            logger_paginas.debug("[%s%%] %s/%s procesadas", progress, idx, total)
 
         return resultados
 
@@ -418,14 +1260,16 @@ class OCRProcessor:
 
             # 3. Detectar marcas y modelos
             logger.info("Detectando marcas y modelos...")
-            marcas, modelos = detectar_marcas_modelos(
-                df, marcas_validas, modelos_por_marca, columnas=[0, 1, 2, 3]
-            )
+            with medir("marcas"):
+                marcas, modelos = detectar_marcas_modelos(
+                    df, marcas_validas, modelos_por_marca, columnas=[0, 1, 2, 3]
+                )
             df["marca"] = marcas
             df["modelo"] = modelos
 
             # 4. Detectar año y texto
             logger.info("Procesando años...")
+            inicio_limpieza = time.perf_counter()
             anio_resto = df.iloc[:, 1].apply(separar_anio_y_resto)
             df["año"] = anio_resto[0]
             df["texto"] = anio_resto[1]
@@ -446,12 +1290,10 @@ class OCRProcessor:
 
             df["version"] = versiones
 
-            print(df.iloc[:, 3])
             valor_original = df.iloc[:, 3]
 
             # Separar por espacios (máximo 2 partes: n=1)
             valor_cortado = valor_original.astype(str).str.split(" ", n=1)
-            print(valor_cortado)
 
             # 6. Agregar valores originales y separar por espacio
             valor_c_col = valor_cortado.apply(
@@ -463,6 +1305,7 @@ class OCRProcessor:
 
             df["valor_c"] = valor_c_col
             df["valor_d"] = valor_d_col
+            registrar("limpieza", time.perf_counter() - inicio_limpieza)
 
             # 7. Reordenar columnas
             columnas_base = ["marca", "modelo", "año", "version", "valor_c", "valor_d"]
@@ -476,7 +1319,8 @@ class OCRProcessor:
             # 8. Guardar
             output_path = Path(output_path)
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            excel_df.to_excel(output_path, index=False, header=False)
+            with medir("excel"):
+                excel_df.to_excel(output_path, index=False, header=False)
 
             logger.info(f"✅ Excel procesado guardado en: {output_path}")
             logger.info(
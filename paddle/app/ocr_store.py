@@ -0,0 +1,228 @@
+"""
+Almacén binario de tokens OCR crudos por proyecto
+
+Guarda todos los textos, cajas y scores de todas las páginas en archivos
+planos que se leen con memory-map, para re-layout, búsqueda o
+re-exportación sin volver a correr el OCR ni parsear JSON.
+
+Estructura de la carpeta (`ocr_tokens/` dentro del proyecto):
+    boxes.f32          float32 (N, 4)  [x_min, y_min, x_max, y_max] de la página
+    scores.f32         float32 (N,)    confianza del reconocimiento (NaN si no hay)
+    cols.i16           int16   (N,)    columna en modo columnas (-1 si no aplica)
+    textos.bin         UTF-8 concatenado de los N textos
+    textos_offsets.i64 int64   (N+1,)  offsets en bytes de cada texto en textos.bin
+    paginas.i64        int64   (P+1,)  índice del primer token de cada página
+    indice.json        versión, nombres de página, total de tokens y
+                       metadatos de la corrida (p. ej. ROI)
+"""
+
+import json
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+VERSION = 1
+INDICE = "indice.json"
+
+# Nombre de archivo -> dtype (y columnas) de cada arreglo
+ARREGLOS = {
+    "boxes.f32": (np.float32, 4),
+    "scores.f32": (np.float32, None),
+    "cols.i16": (np.int16, None),
+    "textos_offsets.i64": (np.int64, None),
+    "paginas.i64": (np.int64, None),
+}
+
+
+class EscritorOCR:
+    """
+    Escribe el almacén página por página (sin acumular en memoria)
+
+    Se escribe en `<carpeta>.tmp` y se renombra al cerrar, así un
+    almacén a medias nunca reemplaza a uno completo.
+    """
+
+    def __init__(self, carpeta: str, metadatos: Optional[dict] = None):
+        """
+        Args:
+            carpeta: Carpeta final del almacén
+            metadatos: Opciones de la corrida que se guardan en el índice
+                (p. ej. `roi`, `roi_banda`)
+        """
+        self.carpeta = Path(carpeta)
+        self.metadatos = dict(metadatos or {})
+        self._tmp = self.carpeta.with_name(self.carpeta.name + ".tmp")
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        self._tmp.mkdir(parents=True)
+
+        self._archivos = {
+            nombre: open(self._tmp / nombre, "wb")
+            for nombre in list(ARREGLOS) + ["textos.bin"]
+        }
+        self._paginas = []
+        self._tokens = 0
+        self._bytes_texto = 0
+
+        self._escribir("textos_offsets.i64", [0])
+        self._escribir("paginas.i64", [0])
+
+    def _escribir(self, nombre: str, valores):
+        dtype, _ = ARREGLOS[nombre]
+        self._archivos[nombre].write(np.asarray(valores, dtype=dtype).tobytes())
+
+    def agregar_pagina(self, nombre: str, tokens: dict):
+        """
+        Agrega los tokens de una página
+
+        Args:
+            nombre: Nombre de la imagen (clave de `lines`)
+            tokens: Dict con `rec_texts`, `rec_boxes` y opcionalmente
+                `rec_scores` y `cols`, en coordenadas de la página
+        """
+        textos = [t.encode("utf-8") for t in tokens["rec_texts"]]
+        n = len(textos)
+
+        boxes = np.asarray(tokens["rec_boxes"], dtype=np.float32).reshape(n, 4)
+        scores = tokens.get("rec_scores")
+        scores = scores if scores is not None and len(scores) == n else [np.nan] * n
+        cols = tokens.get("cols")
+        cols = cols if cols is not None and len(cols) == n else [-1] * n
+
+        offsets = self._bytes_texto + np.cumsum([len(t) for t in textos], dtype=np.int64)
+        self._archivos["textos.bin"].write(b"".join(textos))
+        self._archivos["boxes.f32"].write(boxes.tobytes())
+        self._escribir("scores.f32", scores)
+        self._escribir("cols.i16", cols)
+        self._escribir("textos_offsets.i64", offsets)
+
+        self._tokens += n
+        self._bytes_texto = int(offsets[-1]) if n else self._bytes_texto
+        self._paginas.append(nombre)
+        self._escribir("paginas.i64", [self._tokens])
+
+    def cerrar(self):
+        """Cierra los archivos y publica el almacén en `carpeta`"""
+        for f in self._archivos.values():
+            f.close()
+
+        with open(self._tmp / INDICE, "w") as f:
+            json.dump(
+                {
+                    "version": VERSION,
+                    "paginas": self._paginas,
+                    "tokens": self._tokens,
+                    "metadatos": self.metadatos,
+                },
+                f,
+                ensure_ascii=False,
+            )
+
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+        self._tmp.rename(self.carpeta)
+
+    def descartar(self):
+        """Cierra y borra un almacén incompleto"""
+        for f in self._archivos.values():
+            f.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+class AlmacenOCR:
+    """
+    Lectura con memory-map de un almacén escrito por EscritorOCR
+
+    Los arreglos son vistas de solo lectura sobre los archivos, así que
+    abrir un proyecto de 400 páginas no copia nada a memoria.
+    """
+
+    def __init__(self, carpeta: str):
+        self.carpeta = Path(carpeta)
+        with open(self.carpeta / INDICE) as f:
+            indice = json.load(f)
+
+        if indice.get("version") != VERSION:
+            raise ValueError(
+                f"Versión de almacén OCR no soportada: {indice.get('version')}"
+            )
+
+        self.paginas: List[str] = indice["paginas"]
+        # Almacenes anteriores a los metadatos: {}
+        self.metadatos: dict = indice.get("metadatos", {})
+        self._posicion = {nombre: i for i, nombre in enumerate(self.paginas)}
+
+        arreglos = {
+            nombre: self._mapear(nombre, dtype, columnas)
+            for nombre, (dtype, columnas) in ARREGLOS.items()
+        }
+        self.boxes = arreglos["boxes.f32"]
+        self.scores = arreglos["scores.f32"]
+        self.cols = arreglos["cols.i16"]
+        self.textos_offsets = arreglos["textos_offsets.i64"]
+        self.inicio_paginas = arreglos["paginas.i64"]
+        self._textos = self._mapear("textos.bin", np.uint8, None)
+
+    def _mapear(self, nombre: str, dtype, columnas: Optional[int]):
+        path = self.carpeta / nombre
+        if path.stat().st_size == 0:
+            forma = (0, columnas) if columnas else (0,)
+            return np.zeros(forma, dtype=dtype)
+
+        arreglo = np.memmap(path, dtype=dtype, mode="r")
+        return arreglo.reshape(-1, columnas) if columnas else arreglo
+
+    @property
+    def pagina_completa(self) -> bool:
+        """
+        ¿Los tokens vienen de una corrida sobre la página completa?
+
+        Con `roi`/`roi_banda` falta el texto fuera de la región y en modo
+        columnas las cajas terminan en los cortes. Los almacenes sin
+        metadatos (anteriores a que se guardaran) no cuentan: no se sabe
+        cómo se corrieron.
+        """
+        m = self.metadatos
+        return (
+            "roi" in m
+            and not m["roi"]
+            and not m.get("roi_banda")
+            and m.get("modo", "pagina") == "pagina"
+        )
+
+    def __len__(self):
+        return len(self.scores)
+
+    def texto(self, i: int) -> str:
+        """Texto del token `i`"""
+        inicio, fin = self.textos_offsets[i], self.textos_offsets[i + 1]
+        return bytes(self._textos[inicio:fin]).decode("utf-8")
+
+    def textos(self, inicio: int = 0, fin: Optional[int] = None) -> List[str]:
+        """Textos de los tokens [inicio, fin)"""
+        fin = len(self) if fin is None else fin
+        offsets = self.textos_offsets[inicio : fin + 1] - self.textos_offsets[inicio]
+        bloque = bytes(self._textos[self.textos_offsets[inicio] : self.textos_offsets[fin]])
+        return [
+            bloque[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def rango_pagina(self, nombre: str):
+        """(inicio, fin) de los tokens de una página"""
+        i = self._posicion[nombre]
+        return int(self.inicio_paginas[i]), int(self.inicio_paginas[i + 1])
+
+    def pagina(self, nombre: str) -> dict:
+        """
+        Tokens de una página en el formato de los motores OCR
+
+        Returns:
+            Dict con `rec_texts`, `rec_boxes`, `rec_scores` y `cols`
+        """
+        inicio, fin = self.rango_pagina(nombre)
+        return {
+            "rec_texts": self.textos(inicio, fin),
+            "rec_boxes": self.boxes[inicio:fin],
+            "rec_scores": self.scores[inicio:fin],
+            "cols": self.cols[inicio:fin],
+        }
@@ -0,0 +1,237 @@
+"""
+Imágenes con las líneas de división dibujadas (revisión de un proyecto)
+
+Versión de proyecto de `funciones.crear_imagenes_con_lineas`: cada página
+se dibuja con sus propias líneas de `lines.json` (coordenadas de
+originales/) sobre la vista previa de baja_calidad/ y se guarda en
+`lineas_overlay/` dentro del proyecto.
+
+Las páginas se reparten en un pool de procesos. `manifest.json` guarda la
+firma de cada imagen dibujada (líneas, imagen fuente y estilo), así que
+al volver a correr solo se dibujan las páginas cuyas líneas cambiaron.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+from PIL import Image
+
+OVERLAY_DIR = "lineas_overlay"
+OVERLAY_MANIFEST = "manifest.json"
+
+# Ancho de la vista previa si falta baja_calidad/ (igual que el backend)
+ANCHO_PREVIEW = 800
+
+COLOR_LINEA = (0, 255, 0)  # Verde (BGR)
+GROSOR_LINEA = 2
+CALIDAD_JPEG = 90
+
+# Procesos del pool (default: CPUs asignadas al contenedor)
+OVERLAY_WORKERS = int(
+    os.getenv(
+        "OVERLAY_WORKERS",
+        len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1,
+    )
+)
+
+# Levantar el pool (spawn + importar cv2 en cada worker) cuesta ~1 s; una
+# vista previa se dibuja en ~8 ms, así que con pocas páginas va en serie
+MIN_PAGINAS_POOL = 64
+
+
+def _fuente(project_path: Path, imagen: str) -> Optional[Path]:
+    """Vista previa de la página (o la original si se desalojó baja_calidad/)"""
+    for carpeta in ("baja_calidad", "originales"):
+        path = project_path / carpeta / imagen
+        if path.exists():
+            return path
+    return None
+
+
+def firma_overlay(fuente: Path, lineas: List[float]) -> str:
+    """Cambia si cambian las líneas, la imagen fuente o el estilo del dibujo"""
+    stat = fuente.stat()
+    contenido = json.dumps(
+        [
+            sorted(float(x) for x in lineas),
+            fuente.parent.name,
+            stat.st_size,
+            stat.st_mtime_ns,
+            COLOR_LINEA,
+            GROSOR_LINEA,
+            ANCHO_PREVIEW,
+        ]
+    )
+    return hashlib.sha1(contenido.encode()).hexdigest()[:20]
+
+
+def dibujar_overlay(fuente: str, original: Optional[str], destino: str, lineas: List[float]):
+    """
+    Dibuja las líneas sobre una página y la guarda (corre en los workers)
+
+    Args:
+        fuente: Imagen sobre la que se dibuja (baja_calidad/ u originales/)
+        original: Imagen de originales/ (para escalar las coordenadas)
+        destino: JPEG de salida
+        lineas: Posiciones X en coordenadas de originales/
+
+    Returns:
+        (ancho, alto) de la imagen guardada
+    """
+    img = cv2.imread(fuente)
+    if img is None:
+        raise ValueError(f"No se pudo leer: {fuente}")
+
+    ancho_original = img.shape[1]
+    if original and original != fuente:
+        # PIL solo lee la cabecera para conocer el tamaño
+        with Image.open(original) as cabecera:
+            ancho_original = cabecera.width
+
+    if img.shape[1] > ANCHO_PREVIEW:
+        alto = max(1, round(img.shape[0] * ANCHO_PREVIEW / img.shape[1]))
+        img = cv2.resize(img, (ANCHO_PREVIEW, alto), interpolation=cv2.INTER_AREA)
+
+    escala = img.shape[1] / ancho_original
+    alto, ancho = img.shape[:2]
+    for x in lineas:
+        x = int(round(x * escala))
+        cv2.line(img, (x, 0), (x, alto), COLOR_LINEA, GROSOR_LINEA)
+
+    temporal = f"{destino}.tmp.jpg"
+    if not cv2.imwrite(temporal, img, [cv2.IMWRITE_JPEG_QUALITY, CALIDAD_JPEG]):
+        raise OSError(f"No se pudo escribir: {destino}")
+    os.replace(temporal, destino)
+    return ancho, alto
+
+
+def leer_manifest(carpeta: Path) -> Dict[str, dict]:
+    """{imagen: {firma, lineas, ...}} de la última corrida ({} si no hay)"""
+    path = carpeta / OVERLAY_MANIFEST
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f).get("imagenes", {})
+
+
+def renderizar_proyecto(
+    project_path: Path,
+    lines: Dict[str, List[float]],
+    forzar: bool = False,
+    workers: Optional[int] = None,
+    progreso=None,
+) -> dict:
+    """
+    Dibuja las líneas de cada página del proyecto en lineas_overlay/
+
+    Args:
+        project_path: Carpeta del proyecto
+        lines: {imagen: [x, ...]} en coordenadas de originales/
+        forzar: Volver a dibujar aunque la firma no haya cambiado
+        workers: Procesos del pool (default OVERLAY_WORKERS)
+        progreso: Callback opcional (hechas, total)
+
+    Returns:
+        Resumen {total, dibujadas, sin_cambios, sin_imagen, errores, segundos}
+    """
+    inicio = time.perf_counter()
+    carpeta = project_path / OVERLAY_DIR
+    carpeta.mkdir(exist_ok=True)
+
+    anterior = leer_manifest(carpeta)
+    manifest = {}
+    pendientes = []
+    sin_imagen = []
+    for imagen, lineas in sorted(lines.items()):
+        fuente = _fuente(project_path, imagen)
+        if fuente is None:
+            sin_imagen.append(imagen)
+            continue
+
+        lineas = sorted(float(x) for x in (lineas or []))
+        firma = firma_overlay(fuente, lineas)
+        previa = anterior.get(imagen)
+        if (
+            not forzar
+            and previa is not None
+            and previa["firma"] == firma
+            and (carpeta / imagen).exists()
+        ):
+            manifest[imagen] = previa
+            continue
+
+        original = project_path / "originales" / imagen
+        pendientes.append(
+            (
+                imagen,
+                firma,
+                lineas,
+                (
+                    str(fuente),
+                    str(original) if original.exists() else None,
+                    str(carpeta / imagen),
+                    lineas,
+                ),
+            )
+        )
+
+    errores = {}
+    total = len(pendientes)
+    hechas = [0]
+
+    def registrar(imagen, firma, lineas, resultado):
+        ancho, alto = resultado
+        manifest[imagen] = {"firma": firma, "lineas": lineas, "ancho": ancho, "alto": alto}
+        hechas[0] += 1
+        if progreso:
+            progreso(hechas[0], total)
+
+    workers = max(1, workers or OVERLAY_WORKERS)
+    if workers > 1 and total >= MIN_PAGINAS_POOL:
+        # spawn: el servicio tiene hilos y el modelo OCR cargado; no se hereda nada
+        with ProcessPoolExecutor(
+            max_workers=min(workers, total), mp_context=get_context("spawn")
+        ) as pool:
+            futuros = [
+                (imagen, firma, lineas, pool.submit(dibujar_overlay, *args))
+                for imagen, firma, lineas, args in pendientes
+            ]
+            for imagen, firma, lineas, futuro in futuros:
+                try:
+                    registrar(imagen, firma, lineas, futuro.result())
+                except Exception as e:
+                    errores[imagen] = str(e)
+    else:
+        for imagen, firma, lineas, args in pendientes:
+            try:
+                registrar(imagen, firma, lineas, dibujar_overlay(*args))
+            except Exception as e:
+                errores[imagen] = str(e)
+
+    # Páginas que ya no están en las líneas
+    for path in carpeta.glob("*.jpg"):
+        if path.name not in manifest:
+            path.unlink(missing_ok=True)
+
+    resumen = {
+        "total": len(lines),
+        "dibujadas": hechas[0],
+        "sin_cambios": len(manifest) - hechas[0],
+        "sin_imagen": sin_imagen,
+        "errores": errores,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+    temporal = carpeta / f"{OVERLAY_MANIFEST}.tmp"
+    with open(temporal, "w") as f:
+        json.dump({"imagenes": manifest, **resumen}, f, separators=(",", ":"))
+    os.replace(temporal, carpeta / OVERLAY_MANIFEST)
+
+    return resumen
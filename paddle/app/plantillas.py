@@ -0,0 +1,182 @@
+"""
+Plantillas de layout: agrupa páginas con la misma estructura de columnas
+
+La huella de una página es su perfil de densidad de tinta proyectado en X
+(promedio de oscuridad por banda vertical), centrado y normalizado. Dos
+páginas con las mismas columnas tienen perfiles muy correlacionados, así
+que un solo juego de líneas sirve para todo su grupo.
+
+Todas las huellas se calculan en una matriz (páginas x bandas) y la
+similitud entre todas las páginas es un solo producto de matrices.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+# Bandas verticales del perfil
+BANDAS = 128
+
+# Correlación mínima con el representante para entrar a su grupo
+UMBRAL_SIMILITUD = 0.9
+
+# Ancho (en bandas) del suavizado, tolera corrimientos de unos px
+SUAVIZADO = 3
+
+PLANTILLAS_JSON = "plantillas.json"
+
+
+def huella_pagina(img_path, bandas: int = BANDAS) -> np.ndarray:
+    """Densidad de tinta por banda vertical (0 = blanco, 1 = negro)"""
+    with Image.open(img_path) as img:
+        # BOX promedia todos los píxeles de cada banda en una sola pasada
+        fila = img.convert("L").resize((bandas, 1), Image.Resampling.BOX)
+    return 1.0 - np.asarray(fila, dtype=np.float32)[0] / 255.0
+
+
+def normalizar_huellas(perfiles: np.ndarray, suavizado: int = SUAVIZADO) -> np.ndarray:
+    """Suaviza, centra y normaliza (L2) cada fila de la matriz de perfiles"""
+    if suavizado > 1:
+        acumulado = np.cumsum(np.pad(perfiles, ((0, 0), (suavizado, 0)), mode="edge"), axis=1)
+        perfiles = (acumulado[:, suavizado:] - acumulado[:, :-suavizado]) / suavizado
+
+    centrados = perfiles - perfiles.mean(axis=1, keepdims=True)
+    normas = np.linalg.norm(centrados, axis=1, keepdims=True)
+    return centrados / np.where(normas > 0, normas, 1)
+
+
+def agrupar_huellas(huellas: np.ndarray, umbral: float = UMBRAL_SIMILITUD):
+    """
+    Agrupa páginas por similitud de huella
+
+    Cada página sin grupo se vuelve representante y absorbe de golpe a
+    todas las páginas libres con correlación >= umbral.
+
+    Returns:
+        (grupo por página, índice del representante de cada grupo, similitud)
+    """
+    similitud = huellas @ huellas.T
+    grupo = np.full(len(huellas), -1, dtype=np.int64)
+    representantes = []
+
+    for i in range(len(huellas)):
+        if grupo[i] >= 0:
+            continue
+        miembros = (grupo < 0) & (similitud[i] >= umbral)
+        miembros[i] = True
+        grupo[miembros] = len(representantes)
+        representantes.append(i)
+
+    return grupo, representantes, similitud
+
+
+def firma_imagenes(project_path: Path) -> str:
+    """
+    Cambia si se agregan, quitan o reemplazan páginas en originales/
+
+    Se usa originales/ (no baja_calidad/, que la cuota desaloja y se
+    regenera) y solo se leen nombre, tamaño y mtime de cada archivo.
+    """
+    partes = [
+        f"{p.name}|{st.st_size}|{st.st_mtime_ns}"
+        for p in sorted((project_path / "originales").glob("*.jpg"))
+        for st in (p.stat(),)
+    ]
+    return hashlib.sha1("\n".join(partes).encode()).hexdigest()[:20]
+
+
+def agrupar_proyecto(
+    project_path: Path, umbral: float = UMBRAL_SIMILITUD, carpeta: Optional[str] = None
+) -> dict:
+    """
+    Calcula los grupos de layout de un proyecto y los guarda en plantillas.json
+
+    Args:
+        project_path: Carpeta del proyecto
+        umbral: Correlación mínima para compartir grupo
+        carpeta: Imágenes a usar (default baja_calidad/, o originales/ si no existe)
+
+    Returns:
+        Dict con `grupos` (id, representante, páginas, similitud mínima) y
+        `pagina_grupo` ({imagen: id})
+    """
+    if carpeta is None:
+        carpeta = "baja_calidad" if (project_path / "baja_calidad").exists() else "originales"
+
+    imagenes = sorted((project_path / carpeta).glob("*.jpg"))
+    if not imagenes:
+        raise FileNotFoundError(f"Sin imágenes en '{carpeta}/'")
+
+    perfiles = np.stack([huella_pagina(p) for p in imagenes])
+    grupo, representantes, similitud = agrupar_huellas(normalizar_huellas(perfiles), umbral)
+
+    nombres = [p.name for p in imagenes]
+    grupos = []
+    for gid, rep in enumerate(representantes):
+        miembros = np.flatnonzero(grupo == gid)
+        grupos.append(
+            {
+                "id": gid,
+                "representante": nombres[rep],
+                "paginas": [nombres[i] for i in miembros],
+                "similitud_min": round(float(similitud[rep, miembros].min()), 4),
+            }
+        )
+
+    resultado = {
+        "umbral": umbral,
+        "firma_imagenes": firma_imagenes(project_path),
+        "carpeta": carpeta,
+        "total_paginas": len(nombres),
+        "total_grupos": len(grupos),
+        "grupos": sorted(grupos, key=lambda g: len(g["paginas"]), reverse=True),
+        "pagina_grupo": {nombre: int(g) for nombre, g in zip(nombres, grupo)},
+    }
+
+    with open(project_path / PLANTILLAS_JSON, "w") as f:
+        json.dump(resultado, f)
+
+    return resultado
+
+
+def cargar_grupos_layout(project_path: Path, umbral: float, recalcular: bool = False):
+    """
+    Grupos de layout del proyecto (reutiliza plantillas.json si el umbral
+    coincide y las páginas de originales/ no cambiaron)
+    """
+    cache = project_path / PLANTILLAS_JSON
+    if cache.exists() and not recalcular:
+        with open(cache) as f:
+            grupos = json.load(f)
+        if (
+            grupos.get("umbral") == umbral
+            and grupos.get("firma_imagenes") == firma_imagenes(project_path)
+        ):
+            return grupos
+    return agrupar_proyecto(project_path, umbral=umbral)
+
+
+def aplicar_plantillas(
+    lines: Dict[str, List[float]], pagina_grupo: Dict[str, int]
+) -> Dict[str, List[float]]:
+    """
+    Copia las líneas de cada grupo a sus páginas que no tienen líneas
+
+    La plantilla de un grupo es la primera página (por nombre) con líneas;
+    las páginas con líneas propias no se tocan.
+    """
+    plantilla = {}
+    for imagen in sorted(lines):
+        gid = pagina_grupo.get(imagen)
+        if gid is not None and lines[imagen] and gid not in plantilla:
+            plantilla[gid] = lines[imagen]
+
+    completas = dict(lines)
+    for imagen, gid in pagina_grupo.items():
+        if not completas.get(imagen) and gid in plantilla:
+            completas[imagen] = list(plantilla[gid])
+    return completas
@@ -0,0 +1,271 @@
+"""
+Preprocesado de páginas escaneadas antes del OCR
+
+Las páginas escaneadas suelen venir ligeramente giradas y PaddleOCR se crea
+sin clasificador de orientación ni `unwarping`, así que una inclinación de
+medio grado ya mezcla filas y cruza los cortes de columna. Antes de la
+inferencia se puede:
+
+- Enderezar: la inclinación se estima por perfil de proyección (la varianza
+  de la suma de tinta por renglón es máxima cuando los renglones quedan
+  horizontales) y la página se gira sobre un lienzo que la contiene completa.
+- Normalizar contraste: estiramiento lineal entre los percentiles 1 y 99.
+- Binarizar: umbral adaptativo gaussiano (apagado por default, puede
+  empeorar el reconocimiento en escaneos limpios).
+
+La transformación aplicada se guarda para llevar los cortes de `lines.json`
+(en coordenadas de la página original) al marco enderezado y regresar las
+cajas del OCR a la página original.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+PREPROCESADO_JSON = "preprocesado.json"
+
+OPCIONES_DEFAULT = {
+    "enderezar": True,
+    "contraste": True,
+    "binarizar": False,
+    # Inclinación máxima buscada (grados, en ambos sentidos)
+    "max_angulo": 5.0,
+    # Por debajo de esta inclinación la página no se gira
+    "angulo_min": 0.1,
+}
+
+# Ancho (px) de la imagen reducida con la que se estima la inclinación
+ANCHO_ESTIMACION = 1000
+
+# Muestra máxima de píxeles de tinta usados en la estimación
+MAX_PIXELES_TINTA = 200_000
+
+# Percentiles del estiramiento de contraste
+PERCENTILES_CONTRASTE = (1, 99)
+
+# Vecindario (px, impar) y constante del umbral adaptativo
+BLOQUE_BINARIZADO = 31
+C_BINARIZADO = 15
+
+
+def resolver_opciones(opciones) -> Optional[dict]:
+    """
+    Normaliza la opción `preprocesado` de lines.json
+
+    Args:
+        opciones: None/False (desactivado), True (valores por default) o
+            dict con sobrescrituras de OPCIONES_DEFAULT
+
+    Returns:
+        Opciones completas o None si el preprocesado está desactivado
+    """
+    if not opciones:
+        return None
+    if opciones is True:
+        return dict(OPCIONES_DEFAULT)
+    if not isinstance(opciones, dict):
+        raise ValueError("'preprocesado' debe ser bool u objeto")
+
+    desconocidas = set(opciones) - set(OPCIONES_DEFAULT)
+    if desconocidas:
+        raise ValueError(
+            f"Opciones de preprocesado desconocidas: {', '.join(sorted(desconocidas))}. "
+            f"Disponibles: {', '.join(OPCIONES_DEFAULT)}"
+        )
+    return {**OPCIONES_DEFAULT, **opciones}
+
+
+class Transformacion(NamedTuple):
+    """Giro aplicado a una página (matriz afín 2x3 de original a enderezada)"""
+
+    angulo: float
+    matriz: np.ndarray
+    tamano_original: Tuple[int, int]
+    tamano_salida: Tuple[int, int]
+
+    @property
+    def identidad(self) -> bool:
+        return self.angulo == 0
+
+    def mapear_cortes(self, cortes: List[float]) -> List[float]:
+        """
+        Lleva cortes verticales de la página original al marco enderezado
+
+        Cada corte se transforma en el punto donde cruza la mitad de la
+        altura de la página, que es donde menos se desplaza con el giro.
+        """
+        if self.identidad or not cortes:
+            return list(cortes)
+        xs = np.asarray(cortes, dtype=np.float64)
+        centro_y = self.tamano_original[1] / 2
+        nuevas_x = self.matriz[0, 0] * xs + self.matriz[0, 1] * centro_y + self.matriz[0, 2]
+        return [round(float(x), 1) for x in nuevas_x]
+
+    def cajas_a_original(self, boxes) -> np.ndarray:
+        """Cajas [x_min, y_min, x_max, y_max] del marco enderezado a la página original"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if self.identidad or not len(boxes):
+            return boxes
+
+        inversa = cv2.invertAffineTransform(self.matriz)
+        esquinas = np.stack(
+            [boxes[:, [0, 1]], boxes[:, [2, 1]], boxes[:, [2, 3]], boxes[:, [0, 3]]],
+            axis=1,
+        )
+        originales = esquinas @ inversa[:, :2].T + inversa[:, 2]
+        return np.concatenate([originales.min(axis=1), originales.max(axis=1)], axis=1)
+
+    def a_dict(self) -> dict:
+        return {
+            "angulo": round(self.angulo, 3),
+            "matriz": np.round(self.matriz, 6).tolist(),
+            "tamano_original": list(self.tamano_original),
+            "tamano_salida": list(self.tamano_salida),
+        }
+
+
+def _tinta(gris: np.ndarray) -> np.ndarray:
+    """Máscara de tinta (Otsu invertido)"""
+    _, binaria = cv2.threshold(gris, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return binaria
+
+
+def estimar_inclinacion(gris: np.ndarray, max_angulo: float = 5.0) -> float:
+    """
+    Inclinación de los renglones en grados (positivo = bajan hacia la derecha)
+
+    Se proyectan las coordenadas de los píxeles de tinta sobre la normal de
+    cada ángulo candidato y se elige el que da el histograma de renglones
+    más "picudo" (mayor suma de cuadrados). Búsqueda gruesa cada 0.5° y fina
+    cada 0.05° alrededor del mejor; no se gira ninguna imagen.
+
+    Args:
+        gris: Página en escala de grises
+        max_angulo: Inclinación máxima a buscar
+
+    Returns:
+        Ángulo estimado (0 si la página no tiene tinta suficiente)
+    """
+    escala = min(1.0, ANCHO_ESTIMACION / gris.shape[1])
+    if escala < 1:
+        gris = cv2.resize(gris, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+
+    ys, xs = np.nonzero(_tinta(gris))
+    if len(xs) < 100:
+        return 0.0
+    if len(xs) > MAX_PIXELES_TINTA:
+        paso = len(xs) // MAX_PIXELES_TINTA + 1
+        ys, xs = ys[::paso], xs[::paso]
+    xs = xs.astype(np.float64) - gris.shape[1] / 2
+    ys = ys.astype(np.float64)
+
+    def puntaje(angulos: np.ndarray) -> np.ndarray:
+        rad = np.radians(angulos)
+        # Renglón de cada píxel si la página se girara -angulo (una fila por ángulo)
+        renglones = np.rint(
+            ys[None, :] * np.cos(rad)[:, None] - xs[None, :] * np.sin(rad)[:, None]
+        ).astype(np.int64)
+        renglones -= renglones.min(axis=1, keepdims=True)
+        largo = int(renglones.max()) + 1
+        desplazados = renglones + np.arange(len(angulos))[:, None] * largo
+        conteos = np.bincount(desplazados.ravel(), minlength=largo * len(angulos))
+        return (conteos.reshape(len(angulos), largo).astype(np.float64) ** 2).sum(axis=1)
+
+    gruesos = np.arange(-max_angulo, max_angulo + 1e-9, 0.5)
+    mejor = gruesos[np.argmax(puntaje(gruesos))]
+    finos = np.arange(mejor - 0.5, mejor + 0.5 + 1e-9, 0.05)
+    return float(finos[np.argmax(puntaje(finos))])
+
+
+def girar(img: np.ndarray, angulo: float):
+    """
+    Gira la imagen `angulo` grados (antihorario) sobre un lienzo blanco que
+    la contiene completa
+
+    Returns:
+        (imagen girada, matriz afín 2x3)
+    """
+    alto, ancho = img.shape[:2]
+    matriz = cv2.getRotationMatrix2D((ancho / 2, alto / 2), angulo, 1.0)
+    cos, sen = abs(matriz[0, 0]), abs(matriz[0, 1])
+    nuevo_ancho = int(np.ceil(alto * sen + ancho * cos))
+    nuevo_alto = int(np.ceil(alto * cos + ancho * sen))
+    matriz[0, 2] += nuevo_ancho / 2 - ancho / 2
+    matriz[1, 2] += nuevo_alto / 2 - alto / 2
+
+    blanco = (255,) * (img.shape[2] if img.ndim == 3 else 1)
+    girada = cv2.warpAffine(
+        img,
+        matriz,
+        (nuevo_ancho, nuevo_alto),
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=blanco,
+    )
+    return girada, matriz
+
+
+def normalizar_contraste(gris: np.ndarray) -> np.ndarray:
+    """Estira los niveles de gris entre los percentiles de PERCENTILES_CONTRASTE"""
+    bajo, alto = np.percentile(gris, PERCENTILES_CONTRASTE)
+    if alto - bajo < 1:
+        return gris
+    lut = np.clip((np.arange(256) - bajo) * 255.0 / (alto - bajo), 0, 255).astype(np.uint8)
+    return cv2.LUT(gris, lut)
+
+
+def binarizar(gris: np.ndarray) -> np.ndarray:
+    """Umbral adaptativo (tolera sombras y fondos disparejos del escaneo)"""
+    return cv2.adaptiveThreshold(
+        gris,
+        255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        BLOQUE_BINARIZADO,
+        C_BINARIZADO,
+    )
+
+
+def preprocesar(img_bgr: np.ndarray, opciones: dict):
+    """
+    Aplica el preprocesado a una página
+
+    Args:
+        img_bgr: Página BGR (como la espera PaddleOCR)
+        opciones: Opciones completas (ver resolver_opciones)
+
+    Returns:
+        (imagen BGR preprocesada, Transformacion)
+    """
+    alto, ancho = img_bgr.shape[:2]
+    gris = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+
+    angulo = 0.0
+    if opciones["enderezar"]:
+        angulo = estimar_inclinacion(gris, opciones["max_angulo"])
+        if abs(angulo) < opciones["angulo_min"]:
+            angulo = 0.0
+
+    if opciones["contraste"]:
+        gris = normalizar_contraste(gris)
+    if opciones["binarizar"]:
+        gris = binarizar(gris)
+
+    # Con contraste o binarizado la salida es gris; sin ellos se conserva el color
+    salida = gris if opciones["contraste"] or opciones["binarizar"] else img_bgr
+    if angulo:
+        salida, matriz = girar(salida, angulo)
+    else:
+        matriz = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+    if salida.ndim == 2:
+        salida = cv2.cvtColor(salida, cv2.COLOR_GRAY2BGR)
+
+    transformacion = Transformacion(
+        angulo=angulo,
+        matriz=matriz,
+        tamano_original=(ancho, alto),
+        tamano_salida=(salida.shape[1], salida.shape[0]),
+    )
+    return salida, transformacion
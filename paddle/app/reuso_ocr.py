@@ -0,0 +1,129 @@
+"""
+Reutilización de OCR entre proyectos para páginas idénticas
+
+Al subir un PDF el backend guarda en `huellas.json` la huella (SHA-256 del
+contenido) de cada página. Si una página de este proyecto tiene la misma
+huella que una página ya procesada en otro proyecto, sus tokens OCR se
+toman del almacén `ocr_tokens/` de ese proyecto en lugar de volver a
+correr el modelo.
+
+Solo se reutilizan páginas procesadas en modo "pagina" y sobre la página
+completa: en modo "columnas" los tokens dependen de los cortes con los que
+se recortó, y con `roi`/`roi_banda` falta el texto fuera de la región.
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from ocr_engines import guardar_resultado
+from ocr_store import AlmacenOCR
+
+logger = logging.getLogger(__name__)
+
+HUELLAS_JSON = "huellas.json"
+OCR_REUTILIZADO_DIR = "ocr_reutilizado"
+OCR_TOKENS_DIR = "ocr_tokens"
+
+
+def leer_huellas(project_path: Path) -> Dict[str, str]:
+    """{imagen: huella} del proyecto ({} si se subió antes de las huellas)"""
+    path = project_path / HUELLAS_JSON
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f).get("paginas", {})
+
+
+def tokens_reutilizables(projects_path: Path, project_name: str) -> Dict[str, dict]:
+    """
+    Tokens OCR de otros proyectos para las páginas idénticas de este
+
+    Returns:
+        {imagen: {rec_texts, rec_boxes, rec_scores}} en coordenadas de la página
+    """
+    buscadas = {}
+    for imagen, huella in leer_huellas(projects_path / project_name).items():
+        buscadas.setdefault(huella, []).append(imagen)
+    if not buscadas:
+        return {}
+
+    encontrados = {}
+    for project_dir in sorted(projects_path.iterdir(), reverse=True):
+        if project_dir.name == project_name or not (project_dir / OCR_TOKENS_DIR).exists():
+            continue
+
+        huellas = leer_huellas(project_dir)
+        comunes = [
+            (imagen, huella)
+            for imagen, huella in huellas.items()
+            if huella in buscadas and huella not in encontrados
+        ]
+        if not comunes:
+            continue
+
+        try:
+            almacen = AlmacenOCR(project_dir / OCR_TOKENS_DIR)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Almacén OCR ilegible",
+                extra={"project": project_dir.name, "error": str(e)},
+            )
+            continue
+
+        if not almacen.pagina_completa:
+            continue
+
+        disponibles = set(almacen.paginas)
+        for imagen, huella in comunes:
+            if imagen not in disponibles:
+                continue
+            tokens = almacen.pagina(imagen)
+            if len(tokens["cols"]) and np.any(tokens["cols"] >= 0):
+                continue
+            encontrados[huella] = tokens
+
+        if len(encontrados) == len(buscadas):
+            break
+
+    return {
+        imagen: encontrados[huella]
+        for huella, imagenes in buscadas.items()
+        if huella in encontrados
+        for imagen in imagenes
+    }
+
+
+def preparar_ocr_reutilizado(projects_path: Path, project_name: str) -> int:
+    """
+    Escribe `ocr_reutilizado/<imagen>.json` con los tokens de páginas idénticas
+
+    Mismo formato que `texto_nativo/`, así OCRProcessor salta la inferencia
+    de esas páginas.
+
+    Returns:
+        Páginas con OCR reutilizable
+    """
+    destino = projects_path / project_name / OCR_REUTILIZADO_DIR
+    shutil.rmtree(destino, ignore_errors=True)
+
+    tokens = tokens_reutilizables(projects_path, project_name)
+    if not tokens:
+        return 0
+
+    destino.mkdir(parents=True)
+    for imagen, resultado in tokens.items():
+        scores = resultado["rec_scores"]
+        guardar_resultado(
+            destino / f"{imagen}.json",
+            {
+                "rec_texts": resultado["rec_texts"],
+                "rec_boxes": resultado["rec_boxes"],
+                "rec_scores": [] if np.isnan(scores).any() else scores.tolist(),
+            },
+        )
+    return len(tokens)
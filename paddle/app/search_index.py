@@ -0,0 +1,211 @@
+"""
+Índice de búsqueda de texto completo (SQLite FTS5) sobre los resultados OCR
+
+Una fila del índice = una fila extraída de una página. Se llena mientras
+process_ocr_background termina páginas y se consulta con /api/search.
+Las filas viven en una tabla normal (`filas`, indexada por proyecto) y
+FTS5 indexa su texto como contenido externo, así reprocesar un proyecto
+borra solo sus filas sin recorrer todo el índice.
+
+Un reproceso indexa bajo una clave temporal (`.indexando/<proyecto>`) y
+solo al terminar reemplaza las filas anteriores; si falla, las anteriores
+siguen intactas.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS filas (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    pagina TEXT NOT NULL,
+    fila INTEGER NOT NULL,
+    texto TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS filas_project ON filas(project);
+CREATE VIRTUAL TABLE IF NOT EXISTS filas_fts USING fts5(
+    texto,
+    content='filas',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS filas_ai AFTER INSERT ON filas BEGIN
+    INSERT INTO filas_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS filas_ad AFTER DELETE ON filas BEGIN
+    INSERT INTO filas_fts(filas_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+END;
+"""
+
+# Separador entre celdas al indexar una fila
+SEPARADOR = " | "
+
+# Prefijo de las filas de un reproceso en curso (no es un nombre de carpeta
+# válido, así que no choca con ningún proyecto)
+PREFIJO_TEMPORAL = ".indexando/"
+
+# Índices cuyo esquema y modo WAL ya se aplicaron en este proceso
+_inicializados = set()
+_inicializados_lock = threading.Lock()
+
+
+def conectar(db_path) -> sqlite3.Connection:
+    """
+    Abre el índice; el esquema y el modo WAL (persistente en el archivo)
+    se aplican solo la primera vez por proceso
+    """
+    db_path = str(db_path)
+    if db_path not in _inicializados:
+        with _inicializados_lock:
+            if db_path not in _inicializados:
+                Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(db_path, timeout=30)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(ESQUEMA)
+                finally:
+                    conn.close()
+                _inicializados.add(db_path)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def texto_fila(celdas) -> str:
+    """Une las celdas no vacías de una fila del DataFrame"""
+    return SEPARADOR.join(
+        str(c).strip() for c in celdas if not pd.isna(c) and str(c).strip()
+    )
+
+
+def consulta_fts(q: str) -> str:
+    """
+    Convierte texto libre en una consulta FTS5 segura
+
+    Cada palabra va entre comillas (frase), así "CR-V 2023" busca la
+    frase `cr v` y `2023` sin interpretar `-` u otros operadores. Un `*`
+    final en una palabra se respeta como prefijo.
+    """
+    terminos = []
+    for palabra in q.split():
+        prefijo = palabra.endswith("*")
+        palabra = palabra.rstrip("*").replace('"', '""')
+        if re.search(r"\w", palabra):
+            terminos.append(f'"{palabra}"' + ("*" if prefijo else ""))
+    return " ".join(terminos)
+
+
+class IndexadorProyecto:
+    """
+    Indexa las filas de un proyecto a medida que se procesan sus páginas
+
+    Las páginas se confirman una por una bajo una clave temporal (una sola
+    transacción para todo el trabajo bloquearía a los demás escritores del
+    índice); `cerrar` reemplaza de una vez las filas anteriores del
+    proyecto y `descartar` borra las temporales.
+    """
+
+    def __init__(self, db_path, project: str):
+        self.project = project
+        self.clave = PREFIJO_TEMPORAL + project
+        self.conn = conectar(db_path)
+        # Restos de un reproceso interrumpido (p. ej. reinicio del servicio)
+        with self.conn:
+            self.conn.execute("DELETE FROM filas WHERE project = ?", (self.clave,))
+
+    def agregar_pagina(self, pagina: str, df: pd.DataFrame):
+        """Indexa las filas de una página (una transacción por página)"""
+        registros = []
+        for fila, celdas in enumerate(df.itertuples(index=False, name=None)):
+            texto = texto_fila(celdas)
+            if texto:
+                registros.append((self.clave, pagina, fila, texto))
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO filas(project, pagina, fila, texto) VALUES (?, ?, ?, ?)",
+                registros,
+            )
+
+    def cerrar(self):
+        """Reemplaza las filas anteriores del proyecto por las nuevas y cierra"""
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM filas WHERE project = ?", (self.project,))
+                # Solo cambia `project`; el texto indexado en FTS5 es el mismo
+                self.conn.execute(
+                    "UPDATE filas SET project = ? WHERE project = ?",
+                    (self.project, self.clave),
+                )
+        finally:
+            self.conn.close()
+
+    def descartar(self):
+        """Borra las filas del trabajo fallido (las anteriores se conservan) y cierra"""
+        try:
+            self.conn.rollback()
+            with self.conn:
+                self.conn.execute("DELETE FROM filas WHERE project = ?", (self.clave,))
+        finally:
+            self.conn.close()
+
+
+def buscar(
+    db_path, q: str, limite: int = 50, project: Optional[str] = None
+) -> List[dict]:
+    """
+    Busca filas que contengan todos los términos de `q`
+
+    Args:
+        db_path: Ruta del índice SQLite
+        q: Texto libre (p. ej. "CR-V 2023")
+        limite: Máximo de resultados
+        project: Restringir a un proyecto
+
+    Returns:
+        Lista de {project, pagina, fila, texto, resaltado, score}, mejor primero
+    """
+    consulta = consulta_fts(q)
+    if not consulta or not Path(db_path).exists():
+        return []
+
+    sql = """
+        SELECT f.project, f.pagina, f.fila, f.texto,
+               highlight(filas_fts, 0, '[', ']'), bm25(filas_fts)
+        FROM filas_fts JOIN filas f ON f.id = filas_fts.rowid
+        WHERE filas_fts MATCH ? AND f.project NOT GLOB ?
+    """
+    params = [consulta, PREFIJO_TEMPORAL + "*"]
+    if project:
+        sql += " AND f.project = ?"
+        params.append(project)
+    sql += " ORDER BY bm25(filas_fts) LIMIT ?"
+    params.append(limite)
+
+    conn = conectar(db_path)
+    try:
+        filas = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "project": project,
+            "pagina": pagina,
+            "fila": fila,
+            "texto": texto,
+            "resaltado": resaltado,
+            "score": round(-score, 4),
+        }
+        for project, pagina, fila, texto, resaltado, score in filas
+    ]
@@ -0,0 +1,176 @@
+"""
+Sugerencia automática de líneas de división a partir de cajas OCR
+
+Las columnas de una lista de precios dejan huecos verticales donde casi
+ninguna caja de texto cubre la coordenada X. Se arma un histograma de
+cobertura en X (cuántas cajas cubren cada píxel), se buscan los huecos
+interiores y se propone un corte en el centro de cada uno.
+
+Las cajas se toman del OCR ya guardado del proyecto, así que sugerir no
+vuelve a correr el modelo.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ocr_store import AlmacenOCR
+
+# Ancho mínimo (px a 150 DPI) de un hueco para considerarlo columna
+GAP_MIN = 12
+
+# Fracción de la cobertura máxima tolerada dentro de un hueco
+# (encabezados o títulos que cruzan columnas)
+TOLERANCIA = 0.05
+
+# Fuentes de cajas en orden de preferencia para fuente="auto"
+FUENTES = ("ocr_tokens", "ocr_grabado", "deteccion")
+
+
+def cobertura_x(boxes: np.ndarray):
+    """
+    Cuántas cajas cubren cada columna de píxeles
+
+    Returns:
+        (cobertura, x_base): arreglo de conteos y la X del primer elemento
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    x_base = int(np.floor(boxes[:, 0].min()))
+    inicio = np.floor(boxes[:, 0]).astype(np.int64) - x_base
+    fin = np.maximum(np.ceil(boxes[:, 2]).astype(np.int64) - x_base, inicio + 1)
+
+    # Suma de diferencias: +1 donde empieza cada caja, -1 donde termina
+    delta = np.zeros(fin.max() + 1, dtype=np.int64)
+    np.add.at(delta, inicio, 1)
+    np.add.at(delta, fin, -1)
+    return np.cumsum(delta[:-1]), x_base
+
+
+def sugerir_cortes(
+    boxes, gap_min: float = GAP_MIN, tolerancia: float = TOLERANCIA
+) -> List[float]:
+    """
+    Propone cortes en X para una página
+
+    Args:
+        boxes: Cajas [x_min, y_min, x_max, y_max] en coordenadas de la página
+        gap_min: Ancho mínimo de un hueco en px
+        tolerancia: Fracción de la cobertura máxima que aún cuenta como hueco
+
+    Returns:
+        Lista ordenada de posiciones X (centro de cada hueco interior)
+    """
+    if len(boxes) < 2:
+        return []
+
+    cobertura, x_base = cobertura_x(boxes)
+    hueco = cobertura <= tolerancia * cobertura.max()
+
+    # Inicios y fines de las rachas de hueco (las orillas siempre tienen
+    # cobertura, así que todo hueco encontrado es interior)
+    bordes = np.diff(np.concatenate(([0], hueco.astype(np.int8), [0])))
+    inicios = np.flatnonzero(bordes == 1)
+    fines = np.flatnonzero(bordes == -1)
+
+    anchos = fines - inicios
+    centros = x_base + (inicios + fines) / 2
+    return [round(float(c), 1) for c in centros[anchos >= gap_min]]
+
+
+def _cajas_ocr_grabado(carpeta: Path) -> Dict[str, np.ndarray]:
+    """Cajas por imagen desde `ocr_grabado/` (solo grabaciones de página completa)"""
+    cajas = {}
+    for path in sorted(carpeta.glob("*.json")):
+        if path.stem.startswith("sha1-"):
+            continue
+        with open(path) as f:
+            cajas[path.stem] = np.asarray(json.load(f)["rec_boxes"])
+    return cajas
+
+
+def _cajas_deteccion(carpeta: Path) -> Dict[str, np.ndarray]:
+    """Cajas de la vista previa de detección, llevadas a coordenadas de originales/"""
+    with open(carpeta / "cajas.json") as f:
+        imagenes = json.load(f)["imagenes"]
+    return {
+        imagen: np.asarray(det.get("boxes", []), dtype=np.float64).reshape(-1, 4)
+        * det.get("escala_originales", 1.0)
+        for imagen, det in imagenes.items()
+    }
+
+
+def cajas_proyecto(project_path: Path, fuente: str = "auto"):
+    """
+    Cajas OCR por imagen de un proyecto
+
+    Args:
+        project_path: Carpeta del proyecto
+        fuente: "ocr_tokens", "ocr_grabado", "deteccion" o "auto" (la
+            primera disponible; `ocr_tokens` solo si viene de una corrida
+            sobre la página completa)
+
+    Returns:
+        (fuente_usada, {imagen: boxes})
+    """
+    if fuente != "auto" and fuente not in FUENTES:
+        raise ValueError(
+            f"Fuente de cajas desconocida: '{fuente}'. Disponibles: auto, {', '.join(FUENTES)}"
+        )
+
+    fuentes = FUENTES if fuente == "auto" else (fuente,)
+    for nombre in fuentes:
+        carpeta = project_path / nombre
+        if not carpeta.exists() or (
+            nombre == "deteccion" and not (carpeta / "cajas.json").exists()
+        ):
+            continue
+        if nombre == "ocr_tokens":
+            almacen = AlmacenOCR(carpeta)
+            # Con ROI o en modo columnas los huecos de cobertura en X salen
+            # de los recortes, no de la página
+            if not almacen.pagina_completa:
+                if fuente == "auto":
+                    continue
+                raise ValueError(
+                    "ocr_tokens viene de una corrida con roi/roi_banda o en modo "
+                    "columnas; usa fuente=ocr_grabado o deteccion"
+                )
+            return nombre, {
+                pagina: almacen.boxes[slice(*almacen.rango_pagina(pagina))]
+                for pagina in almacen.paginas
+            }
+        if nombre == "deteccion":
+            return nombre, _cajas_deteccion(carpeta)
+        return nombre, _cajas_ocr_grabado(carpeta)
+
+    raise FileNotFoundError(
+        f"El proyecto no tiene cajas OCR guardadas ({', '.join(fuentes)})"
+    )
+
+
+def sugerir_lineas_proyecto(
+    project_path: Path,
+    fuente: str = "auto",
+    gap_min: float = GAP_MIN,
+    tolerancia: float = TOLERANCIA,
+    line_gap: Optional[float] = None,
+) -> dict:
+    """
+    Sugiere cortes para todas las páginas de un proyecto
+
+    Returns:
+        Dict en formato lines.json: {"lines": {imagen: [x, ...]}, "line_gap", ...}
+    """
+    fuente_usada, cajas = cajas_proyecto(project_path, fuente)
+    lines = {
+        imagen: sugerir_cortes(boxes, gap_min=gap_min, tolerancia=tolerancia)
+        for imagen, boxes in cajas.items()
+    }
+    return {
+        "lines": lines,
+        "line_gap": line_gap if line_gap is not None else 6.5,
+        "total_lines": sum(len(v) for v in lines.values()),
+        "fuente": fuente_usada,
+    }
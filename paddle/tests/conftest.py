@@ -0,0 +1,9 @@
+"""
+Las pruebas importan los módulos de app/ igual que el servicio (el
+contenedor corre con app/ como carpeta de trabajo)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
@@ -0,0 +1,42 @@
+"""Agrupación adaptativa de cajas en filas"""
+
+import numpy as np
+
+from ocr_processor import agrupar_filas_adaptativo
+
+
+def test_filas_regulares():
+    # Tres filas de texto de 20 px, con ruido vertical de unos píxeles
+    y_min = [100, 103, 98, 140, 142, 180, 177]
+    y_max = [y + 20 for y in y_min]
+    filas = agrupar_filas_adaptativo(y_min, y_max)
+    np.testing.assert_array_equal(filas, [0, 0, 0, 1, 1, 2, 2])
+
+
+def test_no_depende_de_la_escala():
+    y_min = np.array([100, 103, 140, 142, 180])
+    y_max = y_min + 20
+    base = agrupar_filas_adaptativo(y_min, y_max)
+    for escala in (0.25, 3.0):
+        np.testing.assert_array_equal(agrupar_filas_adaptativo(y_min * escala, y_max * escala), base)
+
+
+def test_fila_inclinada_sin_cajas_encimadas():
+    # Una fila que baja 6 px por columna: el salto entre vecinas es chico
+    x_min = np.arange(6) * 100
+    y_min = 100 + np.arange(6) * 6
+    filas = agrupar_filas_adaptativo(y_min, y_min + 20, x_min, x_min + 80)
+    assert set(filas) == {0}
+
+
+def test_filas_encadenadas_en_la_misma_columna():
+    # Dos renglones de una misma columna separados solo 9 px (< media altura)
+    y_min = np.array([100, 109, 118, 127])
+    x_min = np.array([0, 0, 0, 0])
+    filas = agrupar_filas_adaptativo(y_min, y_min + 20, x_min, x_min + 50)
+    assert len(set(filas)) > 1
+    assert list(filas) == sorted(filas)
+
+
+def test_sin_cajas():
+    assert len(agrupar_filas_adaptativo([], [])) == 0
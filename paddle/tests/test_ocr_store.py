@@ -0,0 +1,74 @@
+"""Almacén binario de tokens OCR"""
+
+import numpy as np
+import pytest
+
+from ocr_store import AlmacenOCR, EscritorOCR
+
+
+def test_ida_y_vuelta(tmp_path):
+    carpeta = tmp_path / "ocr_tokens"
+    escritor = EscritorOCR(carpeta, metadatos={"roi": False})
+    escritor.agregar_pagina(
+        "img_001.jpg",
+        {
+            "rec_texts": ["Número", "ÁRBOL", ""],
+            "rec_boxes": [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]],
+            "rec_scores": [0.5, 0.25, 1.0],
+            "cols": [0, 1, 1],
+        },
+    )
+    escritor.agregar_pagina("img_002.jpg", {"rec_texts": [], "rec_boxes": []})
+    escritor.agregar_pagina("img_003.jpg", {"rec_texts": ["fin"], "rec_boxes": [[0, 0, 1, 1]]})
+    escritor.cerrar()
+
+    almacen = AlmacenOCR(carpeta)
+    assert almacen.paginas == ["img_001.jpg", "img_002.jpg", "img_003.jpg"]
+    assert almacen.metadatos == {"roi": False}
+    assert len(almacen) == 4
+
+    pagina = almacen.pagina("img_001.jpg")
+    assert pagina["rec_texts"] == ["Número", "ÁRBOL", ""]
+    np.testing.assert_array_equal(pagina["rec_boxes"][1], [5, 6, 7, 8])
+    np.testing.assert_allclose(pagina["rec_scores"], [0.5, 0.25, 1.0])
+    np.testing.assert_array_equal(pagina["cols"], [0, 1, 1])
+
+    assert almacen.pagina("img_002.jpg")["rec_texts"] == []
+
+    # Sin scores ni columnas: NaN y -1
+    ultima = almacen.pagina("img_003.jpg")
+    assert ultima["rec_texts"] == ["fin"]
+    assert np.isnan(ultima["rec_scores"]).all()
+    np.testing.assert_array_equal(ultima["cols"], [-1])
+    assert almacen.texto(3) == "fin"
+
+
+def test_almacen_vacio(tmp_path):
+    escritor = EscritorOCR(tmp_path / "ocr_tokens")
+    escritor.cerrar()
+
+    almacen = AlmacenOCR(tmp_path / "ocr_tokens")
+    assert almacen.paginas == [] and len(almacen) == 0
+
+
+def test_descartar_conserva_el_almacen_anterior(tmp_path):
+    carpeta = tmp_path / "ocr_tokens"
+    escritor = EscritorOCR(carpeta)
+    escritor.agregar_pagina("img_001.jpg", {"rec_texts": ["uno"], "rec_boxes": [[0, 0, 1, 1]]})
+    escritor.cerrar()
+
+    fallido = EscritorOCR(carpeta)
+    fallido.agregar_pagina("img_001.jpg", {"rec_texts": ["otro"], "rec_boxes": [[0, 0, 1, 1]]})
+    fallido.descartar()
+
+    assert not (tmp_path / "ocr_tokens.tmp").exists()
+    assert AlmacenOCR(carpeta).pagina("img_001.jpg")["rec_texts"] == ["uno"]
+
+
+def test_version_no_soportada(tmp_path):
+    carpeta = tmp_path / "ocr_tokens"
+    EscritorOCR(carpeta).cerrar()
+    (carpeta / "indice.json").write_text('{"version": 99, "paginas": [], "tokens": 0}')
+
+    with pytest.raises(ValueError):
+        AlmacenOCR(carpeta)
@@ -0,0 +1,74 @@
+"""Overlays de líneas por proyecto"""
+
+import json
+import os
+
+import cv2
+import numpy as np
+
+import overlays
+
+
+def crear_proyecto(tmp_path, paginas=3):
+    for carpeta, ancho in (("originales", 1600), ("baja_calidad", 800)):
+        (tmp_path / carpeta).mkdir()
+        for i in range(1, paginas + 1):
+            img = np.full((ancho * 5 // 4, ancho, 3), 255, dtype=np.uint8)
+            cv2.imwrite(str(tmp_path / carpeta / f"img_{i:03d}.jpg"), img)
+    return {f"img_{i:03d}.jpg": [400.0, 800.0] for i in range(1, paginas + 1)}
+
+
+def test_firma(tmp_path):
+    lines = crear_proyecto(tmp_path, 1)
+    fuente = tmp_path / "baja_calidad" / "img_001.jpg"
+
+    firma = overlays.firma_overlay(fuente, lines["img_001.jpg"])
+    assert firma == overlays.firma_overlay(fuente, [800, 400])
+    assert firma != overlays.firma_overlay(fuente, [400.0, 801.0])
+
+    os.utime(fuente, ns=(0, 0))
+    assert firma != overlays.firma_overlay(fuente, lines["img_001.jpg"])
+
+
+def test_solo_redibuja_paginas_cambiadas(tmp_path):
+    lines = crear_proyecto(tmp_path)
+
+    resumen = overlays.renderizar_proyecto(tmp_path, lines, workers=1)
+    assert resumen["dibujadas"] == 3 and resumen["errores"] == {}
+
+    resumen = overlays.renderizar_proyecto(tmp_path, lines, workers=1)
+    assert resumen["dibujadas"] == 0 and resumen["sin_cambios"] == 3
+
+    lines["img_002.jpg"] = [100.0]
+    del lines["img_003.jpg"]
+    resumen = overlays.renderizar_proyecto(tmp_path, lines, workers=1)
+    assert resumen["dibujadas"] == 1 and resumen["sin_cambios"] == 1
+
+    carpeta = tmp_path / overlays.OVERLAY_DIR
+    assert sorted(p.name for p in carpeta.glob("*.jpg")) == ["img_001.jpg", "img_002.jpg"]
+    manifest = json.loads((carpeta / overlays.OVERLAY_MANIFEST).read_text())
+    assert manifest["imagenes"]["img_002.jpg"]["lineas"] == [100.0]
+
+
+def test_linea_escalada_a_la_vista_previa(tmp_path):
+    lines = crear_proyecto(tmp_path, 1)
+    overlays.renderizar_proyecto(tmp_path, lines, workers=1)
+
+    img = cv2.imread(str(tmp_path / overlays.OVERLAY_DIR / "img_001.jpg"))
+    assert img.shape[1] == overlays.ANCHO_PREVIEW
+    # Línea en x=400 de originales (1600 px) -> x=200 en la vista previa
+    verde = (img[:, :, 1] > 200) & (img[:, :, 0] < 80) & (img[:, :, 2] < 80)
+    columnas = np.flatnonzero(verde.any(axis=0))
+    assert columnas.min() >= 198 and columnas.max() <= 402
+
+
+def test_sin_baja_calidad_usa_originales(tmp_path):
+    lines = crear_proyecto(tmp_path, 1)
+    for path in (tmp_path / "baja_calidad").iterdir():
+        path.unlink()
+    (tmp_path / "baja_calidad").rmdir()
+
+    resumen = overlays.renderizar_proyecto(tmp_path, lines, workers=1)
+    assert resumen["dibujadas"] == 1
+    img = cv2.imread(str(tmp_path / overlays.OVERLAY_DIR / "img_001.jpg"))
+    assert img.shape[1] == overlays.ANCHO_PREVIEW
@@ -0,0 +1,63 @@
+"""Grupos de layout y su caché en plantillas.json"""
+
+import os
+
+import numpy as np
+from PIL import Image
+
+from plantillas import aplicar_plantillas, cargar_grupos_layout
+
+
+def pagina(path, columnas):
+    """Página blanca con bloques de tinta en las columnas indicadas (x0, x1)"""
+    img = np.full((400, 300), 255, dtype=np.uint8)
+    for x0, x1 in columnas:
+        img[50:350, x0:x1] = 0
+    Image.fromarray(img).save(path)
+
+
+def crear_proyecto(tmp_path):
+    originales = tmp_path / "originales"
+    originales.mkdir()
+    for i in (1, 2):
+        pagina(originales / f"img_00{i}.jpg", [(20, 120), (180, 280)])
+    pagina(originales / "img_003.jpg", [(20, 60), (100, 140), (200, 240)])
+    return originales
+
+
+def test_agrupa_por_columnas(tmp_path):
+    crear_proyecto(tmp_path)
+    grupos = cargar_grupos_layout(tmp_path, 0.9)
+
+    pagina_grupo = grupos["pagina_grupo"]
+    assert pagina_grupo["img_001.jpg"] == pagina_grupo["img_002.jpg"]
+    assert pagina_grupo["img_003.jpg"] != pagina_grupo["img_001.jpg"]
+
+    lines = aplicar_plantillas({"img_001.jpg": [150.0], "img_003.jpg": []}, pagina_grupo)
+    assert lines["img_002.jpg"] == [150.0]
+    assert not lines["img_003.jpg"]
+
+
+def test_cache_se_invalida_si_cambian_las_paginas(tmp_path):
+    originales = crear_proyecto(tmp_path)
+    primera = cargar_grupos_layout(tmp_path, 0.9)
+    assert cargar_grupos_layout(tmp_path, 0.9) == primera
+
+    # Se reemplaza una página: el plantillas.json anterior ya no sirve
+    pagina(originales / "img_002.jpg", [(20, 60), (100, 140), (200, 240)])
+    os.utime(originales / "img_002.jpg", ns=(0, 0))
+    grupos = cargar_grupos_layout(tmp_path, 0.9)
+    assert grupos["pagina_grupo"]["img_002.jpg"] == grupos["pagina_grupo"]["img_003.jpg"]
+
+    # Y se agrega otra
+    pagina(originales / "img_004.jpg", [(20, 120), (180, 280)])
+    grupos = cargar_grupos_layout(tmp_path, 0.9)
+    assert grupos["total_paginas"] == 4
+
+
+def test_cache_sin_firma_se_recalcula(tmp_path):
+    crear_proyecto(tmp_path)
+    (tmp_path / "plantillas.json").write_text(
+        '{"umbral": 0.9, "total_paginas": 1, "pagina_grupo": {"img_001.jpg": 0}}'
+    )
+    assert cargar_grupos_layout(tmp_path, 0.9)["total_paginas"] == 3
@@ -0,0 +1,67 @@
+"""Enderezado de páginas y mapeo de coordenadas"""
+
+import cv2
+import numpy as np
+import pytest
+
+from preprocesado import OPCIONES_DEFAULT, girar, preprocesar, resolver_opciones
+
+
+def pagina_con_renglones(angulo: float = 0.0):
+    """Página blanca con renglones de tinta, girada `angulo` grados"""
+    img = np.full((1100, 850, 3), 255, dtype=np.uint8)
+    for y in range(100, 1000, 40):
+        cv2.rectangle(img, (80, y), (770, y + 12), (0, 0, 0), -1)
+    if angulo:
+        img, _ = girar(img, angulo)
+    return img
+
+
+def test_resolver_opciones():
+    assert resolver_opciones(None) is None
+    assert resolver_opciones(False) is None
+    assert resolver_opciones(True) == OPCIONES_DEFAULT
+    assert resolver_opciones({"binarizar": True})["binarizar"] is True
+    with pytest.raises(ValueError):
+        resolver_opciones({"girar": 1})
+    with pytest.raises(ValueError):
+        resolver_opciones("si")
+
+
+@pytest.mark.parametrize("angulo", [-2.0, 1.5])
+def test_estima_y_corrige_la_inclinacion(angulo):
+    img = pagina_con_renglones(angulo)
+    _, transformacion = preprocesar(img, resolver_opciones(True))
+    assert transformacion.angulo == pytest.approx(-angulo, abs=0.15)
+
+
+def test_pagina_recta_no_se_gira():
+    _, transformacion = preprocesar(pagina_con_renglones(), resolver_opciones(True))
+    assert transformacion.identidad
+
+
+def test_cajas_ida_y_vuelta():
+    img = pagina_con_renglones(2.0)
+    _, transformacion = preprocesar(img, resolver_opciones(True))
+    assert not transformacion.identidad
+
+    # Una caja del marco original, llevada al enderezado y de regreso
+    cajas = np.array([[200.0, 300.0, 260.0, 320.0]])
+    esquinas = np.array([[200, 300], [260, 300], [260, 320], [200, 320]], dtype=np.float64)
+    enderezadas = esquinas @ transformacion.matriz[:, :2].T + transformacion.matriz[:, 2]
+    caja_enderezada = np.concatenate([enderezadas.min(axis=0), enderezadas.max(axis=0)])
+
+    regreso = transformacion.cajas_a_original([caja_enderezada])
+    # La caja envolvente crece con el giro, pero contiene a la original
+    assert np.all(regreso[0, :2] <= cajas[0, :2] + 0.5)
+    assert np.all(regreso[0, 2:] >= cajas[0, 2:] - 0.5)
+    np.testing.assert_allclose(regreso[0], cajas[0], atol=3)
+
+
+def test_mapear_cortes():
+    _, transformacion = preprocesar(pagina_con_renglones(2.0), resolver_opciones(True))
+    cortes = transformacion.mapear_cortes([100.0, 425.0, 700.0])
+    assert cortes == sorted(cortes)
+    # El desplazamiento horizontal es el mismo para todos los cortes
+    desplazamientos = np.diff(np.array(cortes) - [100.0, 425.0, 700.0])
+    np.testing.assert_allclose(desplazamientos, 0, atol=1.5)
@@ -0,0 +1,71 @@
+"""Reutilización de OCR entre proyectos con páginas idénticas"""
+
+import json
+
+import numpy as np
+
+from ocr_store import EscritorOCR
+from reuso_ocr import OCR_TOKENS_DIR, preparar_ocr_reutilizado, tokens_reutilizables
+
+PAGINA_COMPLETA = {"roi": False, "roi_banda": None, "modo": "pagina"}
+
+
+def crear_proyecto(projects_path, nombre, huellas, tokens=None, metadatos=None):
+    carpeta = projects_path / nombre
+    carpeta.mkdir(parents=True)
+    with open(carpeta / "huellas.json", "w") as f:
+        json.dump({"paginas": huellas}, f)
+
+    if tokens is not None:
+        escritor = EscritorOCR(carpeta / OCR_TOKENS_DIR, metadatos=metadatos)
+        for imagen, pagina in tokens.items():
+            escritor.agregar_pagina(imagen, pagina)
+        escritor.cerrar()
+    return carpeta
+
+
+def tokens_pagina(texto):
+    return {
+        "rec_texts": [texto, "123.45"],
+        "rec_boxes": [[10, 10, 80, 30], [100, 10, 160, 30]],
+        "rec_scores": [0.9, 0.8],
+    }
+
+
+def test_reutiliza_pagina_identica(tmp_path):
+    crear_proyecto(
+        tmp_path, "proyecto_a", {"img_001.jpg": "h1", "img_002.jpg": "h2"},
+        {"img_001.jpg": tokens_pagina("uno"), "img_002.jpg": tokens_pagina("dos")},
+        PAGINA_COMPLETA,
+    )
+    crear_proyecto(tmp_path, "proyecto_b", {"img_001.jpg": "h2", "img_002.jpg": "h3"})
+
+    tokens = tokens_reutilizables(tmp_path, "proyecto_b")
+    assert list(tokens) == ["img_001.jpg"]
+    assert tokens["img_001.jpg"]["rec_texts"] == ["dos", "123.45"]
+    np.testing.assert_allclose(tokens["img_001.jpg"]["rec_boxes"][1], [100, 10, 160, 30])
+
+    assert preparar_ocr_reutilizado(tmp_path, "proyecto_b") == 1
+    assert (tmp_path / "proyecto_b" / "ocr_reutilizado" / "img_001.jpg.json").exists()
+
+
+def test_no_reutiliza_corridas_con_roi(tmp_path):
+    tokens = {"img_001.jpg": tokens_pagina("uno")}
+    crear_proyecto(tmp_path, "proyecto_a", {"img_001.jpg": "h1"}, tokens,
+                   {**PAGINA_COMPLETA, "roi": True})
+    crear_proyecto(tmp_path, "proyecto_b", {"img_001.jpg": "h1"}, tokens,
+                   {**PAGINA_COMPLETA, "roi_banda": [0.1, 0.9]})
+    # Almacén anterior a los metadatos: no se sabe con qué región se corrió
+    crear_proyecto(tmp_path, "proyecto_c", {"img_001.jpg": "h1"}, tokens)
+    crear_proyecto(tmp_path, "proyecto_d", {"img_001.jpg": "h1"})
+
+    assert tokens_reutilizables(tmp_path, "proyecto_d") == {}
+
+
+def test_no_reutiliza_modo_columnas(tmp_path):
+    pagina = {**tokens_pagina("uno"), "cols": [0, 1]}
+    crear_proyecto(tmp_path, "proyecto_a", {"img_001.jpg": "h1"}, {"img_001.jpg": pagina},
+                   {**PAGINA_COMPLETA, "modo": "columnas"})
+    crear_proyecto(tmp_path, "proyecto_b", {"img_001.jpg": "h1"})
+
+    assert tokens_reutilizables(tmp_path, "proyecto_b") == {}
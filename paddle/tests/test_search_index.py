@@ -0,0 +1,84 @@
+"""Índice FTS5 de filas extraídas"""
+
+import pandas as pd
+
+import search_index
+
+
+def test_consulta_fts_entrecomilla_cada_palabra():
+    assert search_index.consulta_fts("CR-V 2023") == '"CR-V" "2023"'
+    assert search_index.consulta_fts('comilla"doble') == '"comilla""doble"'
+    assert search_index.consulta_fts("tor* OR") == '"tor"* "OR"'
+    assert search_index.consulta_fts("- * ()") == ""
+
+
+def indexar(db, project, filas):
+    indexador = search_index.IndexadorProyecto(db, project)
+    indexador.agregar_pagina("img_001.jpg", pd.DataFrame(filas))
+    indexador.cerrar()
+
+
+def test_buscar(tmp_path):
+    db = tmp_path / "busqueda.sqlite"
+    indexar(db, "p1", [["Honda", "CR-V 2023", "1"], ["Nissan", "Versa", None]])
+    indexar(db, "p2", [["Camión", "2023"]])
+
+    resultados = search_index.buscar(db, "cr-v 2023")
+    assert [(r["project"], r["fila"]) for r in resultados] == [("p1", 0)]
+    assert resultados[0]["texto"] == "Honda | CR-V 2023 | 1"
+
+    # Sin acentos, por prefijo y por proyecto
+    assert [r["project"] for r in search_index.buscar(db, "camion")] == ["p2"]
+    assert len(search_index.buscar(db, "2023")) == 2
+    assert len(search_index.buscar(db, "2023", project="p2")) == 1
+    assert [r["fila"] for r in search_index.buscar(db, "ver*")] == [1]
+
+    # Operadores FTS5 sueltos no rompen la consulta
+    assert search_index.buscar(db, 'NOT "') == []
+
+
+def test_reindexar_reemplaza_las_filas(tmp_path):
+    db = tmp_path / "busqueda.sqlite"
+    indexar(db, "p1", [["viejo"]])
+    indexar(db, "p1", [["nuevo"]])
+
+    assert search_index.buscar(db, "viejo") == []
+    assert len(search_index.buscar(db, "nuevo")) == 1
+
+
+def test_reproceso_fallido_conserva_las_filas_anteriores(tmp_path):
+    db = tmp_path / "busqueda.sqlite"
+    indexar(db, "p1", [["previo", "2023"], ["otra", "fila"]])
+    indexar(db, "p2", [["ajeno"]])
+
+    indexador = search_index.IndexadorProyecto(db, "p1")
+    indexador.agregar_pagina("img_001.jpg", pd.DataFrame([["parcial"]]))
+    # Mientras corre, la búsqueda sigue viendo solo las filas anteriores
+    assert search_index.buscar(db, "parcial") == []
+    assert len(search_index.buscar(db, "previo", project="p1")) == 1
+    indexador.descartar()
+
+    assert search_index.buscar(db, "parcial") == []
+    assert [r["texto"] for r in search_index.buscar(db, "previo")] == ["previo | 2023"]
+    assert len(search_index.buscar(db, "fila", project="p1")) == 1
+    assert len(search_index.buscar(db, "ajeno")) == 1
+
+
+def test_reproceso_interrumpido_se_limpia(tmp_path):
+    db = tmp_path / "busqueda.sqlite"
+    indexar(db, "p1", [["previo"]])
+
+    # El servicio se reinicia a mitad del trabajo: ni cerrar ni descartar
+    interrumpido = search_index.IndexadorProyecto(db, "p1")
+    interrumpido.agregar_pagina("img_001.jpg", pd.DataFrame([["huerfano"]]))
+    interrumpido.conn.close()
+
+    indexar(db, "p1", [["nuevo"]])
+    assert search_index.buscar(db, "huerfano") == []
+    assert search_index.buscar(db, "previo") == []
+    assert len(search_index.buscar(db, "nuevo")) == 1
+    conn = search_index.conectar(db)
+    try:
+        assert conn.execute("SELECT count(*) FROM filas").fetchone() == (1,)
+    finally:
+        conn.close()
@@ -0,0 +1,67 @@
+"""Sugerencia de líneas a partir de cajas OCR guardadas"""
+
+import json
+
+import pytest
+
+from ocr_store import EscritorOCR
+from sugerencia_lineas import cajas_proyecto, sugerir_cortes
+
+# Dos columnas: textos en x 100-300 y 500-700, hueco en 300-500
+CAJAS = [[100, 10 + 30 * i, 300, 30 + 30 * i] for i in range(10)] + [
+    [500, 10 + 30 * i, 700, 30 + 30 * i] for i in range(10)
+]
+
+
+def guardar_tokens(project_path, metadatos, cajas=CAJAS):
+    escritor = EscritorOCR(project_path / "ocr_tokens", metadatos=metadatos)
+    escritor.agregar_pagina("img_001.jpg", {"rec_texts": ["x"] * len(cajas), "rec_boxes": cajas})
+    escritor.cerrar()
+
+
+def guardar_deteccion(project_path):
+    (project_path / "deteccion").mkdir()
+    with open(project_path / "deteccion" / "cajas.json", "w") as f:
+        # Vista previa a la mitad de la escala de originales/
+        json.dump(
+            {"imagenes": {"img_001.jpg": {
+                "boxes": [[x0 / 2, y0 / 2, x1 / 2, y1 / 2] for x0, y0, x1, y1 in CAJAS],
+                "escala_originales": 2.0,
+            }}},
+            f,
+        )
+
+
+def test_sugiere_el_centro_del_hueco():
+    assert sugerir_cortes(CAJAS) == [400.0]
+
+
+def test_usa_tokens_de_pagina_completa(tmp_path):
+    guardar_tokens(tmp_path, {"roi": False, "roi_banda": None, "modo": "pagina"})
+    guardar_deteccion(tmp_path)
+
+    fuente, cajas = cajas_proyecto(tmp_path)
+    assert fuente == "ocr_tokens"
+    assert sugerir_cortes(cajas["img_001.jpg"]) == [400.0]
+
+
+@pytest.mark.parametrize(
+    "metadatos",
+    [
+        {"roi": True, "roi_banda": None, "modo": "pagina"},
+        {"roi": False, "roi_banda": [0, 300], "modo": "pagina"},
+        {"roi": False, "roi_banda": None, "modo": "columnas"},
+        {},
+    ],
+)
+def test_tokens_parciales_pasan_a_deteccion(tmp_path, metadatos):
+    # Con ROI solo quedó la primera columna: no hay hueco que sugerir
+    guardar_tokens(tmp_path, metadatos, CAJAS[:10])
+    guardar_deteccion(tmp_path)
+
+    fuente, cajas = cajas_proyecto(tmp_path)
+    assert fuente == "deteccion"
+    assert sugerir_cortes(cajas["img_001.jpg"]) == [400.0]
+
+    with pytest.raises(ValueError):
+        cajas_proyecto(tmp_path, "ocr_tokens")